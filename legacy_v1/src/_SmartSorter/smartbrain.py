@@ -1,4 +1,5 @@
 import argparse
+import json
 import os
 import sys
 import sqlite3
@@ -6,9 +7,22 @@ import subprocess
 from pathlib import Path
 from datetime import datetime
 
-from PIL import Image, ExifTags
+from PIL import Image
 import imagehash
 from PyPDF2 import PdfReader
+
+# Shared implementations come from the v2 Core of this repository
+# (INTELIOMNI_ROOT = the checkout, when this script runs from elsewhere)
+OMNI_ROOT = Path(os.environ.get("INTELIOMNI_ROOT") or Path(__file__).resolve().parents[3])
+if str(OMNI_ROOT) not in sys.path:
+    sys.path.insert(0, str(OMNI_ROOT))
+
+from v2_core.engines.dedup.exact_dup_engine import ExactDupEngine, full_digest
+from v2_core.system.index.metadata_index import MetadataIndex
+from v2_core.system.mover.move_engine import MoveEngine, SourceKept
+from v2_core.system.mover.name_registry import NameRegistry
+from v2_core.system.rules.keywords import KeywordMatcher
+from v2_core.system.scanner.scanner import iter_files
 from tqdm import tqdm
 
 # Optional imports (may fail gracefully)
@@ -49,6 +63,39 @@ CATEGORY_DIRS = {
 }
 
 
+# --------------- KEYWORD MATCHING ---------------
+
+# category -> substrings (up to 3 letters: whole words only, see the v2
+# keywords.py); extend / replace per category with
+# <root>/_SmartSorter/keywords.json: {"name": {...}, "path": {...}}
+NAME_KEYWORDS = {
+    "Studies": STUDY_KEYWORDS,
+}
+PATH_KEYWORDS = {
+    "Installers": ["\\installers\\"],
+    "Projects": ["\\dev\\", "\\minecraft", "battery_pro", "uilnes", "embassy_contact_scraper"],
+    "Backups": ["backup", "whatsapp", "recover", "sdcard", "ouma hardeskyf"],
+}
+
+NAME_MATCHER = KeywordMatcher(NAME_KEYWORDS)
+PATH_MATCHER = KeywordMatcher(PATH_KEYWORDS)
+
+
+def load_keywords(root: Path):
+    """Rebuild the matchers with the categories from keywords.json (if any)."""
+    global NAME_MATCHER, PATH_MATCHER
+    config = root / "_SmartSorter" / "keywords.json"
+    if not config.exists():
+        return
+    try:
+        data = json.loads(config.read_text(encoding="utf-8-sig"))
+    except (OSError, ValueError) as e:
+        print(f"[WARN] keywords.json ignored: {e}")
+        return
+    NAME_MATCHER = KeywordMatcher({**NAME_KEYWORDS, **data.get("name", {})})
+    PATH_MATCHER = KeywordMatcher({**PATH_KEYWORDS, **data.get("path", {})})
+
+
 def parse_args():
     p = argparse.ArgumentParser()
     p.add_argument("--root", required=True, help="Path to Master_Cloud")
@@ -65,8 +112,9 @@ def get_env_tools():
 
 # --------------- SQLITE DB ---------------
 
-def init_db(db_path: Path) -> sqlite3.Connection:
-    conn = sqlite3.connect(db_path)
+def init_db(conn: sqlite3.Connection) -> sqlite3.Connection:
+    # `files` (+ content index columns) is created by the v2 Metadata Index;
+    # WAL + NORMAL are set there too, moves are group-committed by main()
     c = conn.cursor()
     c.execute("""
     CREATE TABLE IF NOT EXISTS moves (
@@ -80,18 +128,6 @@ def init_db(db_path: Path) -> sqlite3.Connection:
     )
     """)
     c.execute("""
-    CREATE TABLE IF NOT EXISTS files (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        path TEXT UNIQUE,
-        category TEXT,
-        hash TEXT,
-        person_id INTEGER,
-        created_ts TEXT,
-        device TEXT,
-        meta_json TEXT
-    )
-    """)
-    c.execute("""
     CREATE TABLE IF NOT EXISTS persons (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         name TEXT,
@@ -99,6 +135,12 @@ def init_db(db_path: Path) -> sqlite3.Connection:
     )
     """)
     c.execute("""
+    CREATE TABLE IF NOT EXISTS ocr_cache (
+        hash TEXT PRIMARY KEY,
+        studies INTEGER
+    )
+    """)
+    c.execute("""
     CREATE TABLE IF NOT EXISTS errors (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         ts TEXT,
@@ -110,12 +152,15 @@ def init_db(db_path: Path) -> sqlite3.Connection:
     return conn
 
 
+MOVE_COMMIT_BATCH = 500
+
+
 def db_log_move(conn, src: Path, dst: Path, category: str, h: str | None, notes: str = ""):
+    """Insert a move row; committed in batches of MOVE_COMMIT_BATCH by main()."""
     ts = datetime.now().isoformat(timespec="seconds")
     c = conn.cursor()
     c.execute("INSERT INTO moves(ts, src, dst, category, hash, notes) VALUES(?,?,?,?,?,?)",
               (ts, str(src), str(dst), category, h or "", notes))
-    conn.commit()
 
 
 def db_log_error(conn, context: str, msg: str):
@@ -132,21 +177,25 @@ def ensure_category_dirs(root: Path):
         (root / name).mkdir(parents=True, exist_ok=True)
 
 
+# Destination dirs are listed once per run; moves never replace a file
+# (a name taken since the listing gets the next name__N suffix)
+NAMES = NameRegistry()
+MOVER = MoveEngine(names=NAMES)
+
+
 def move_with_dedup(src: Path, dest_dir: Path) -> Path:
+    """Move src into dest_dir, avoid overwriting, return final path."""
     dest_dir.mkdir(parents=True, exist_ok=True)
-    target = dest_dir / src.name
-    if not target.exists():
-        src.replace(target)
-        return target
-    stem = target.stem
-    suffix = target.suffix
-    i = 1
-    while True:
-        cand = dest_dir / f"{stem}__{i}{suffix}"
-        if not cand.exists():
-            src.replace(cand)
-            return cand
-        i += 1
+    target = NAMES.reserve_path(dest_dir / src.name)
+    try:
+        return Path(MOVER.move(src, target))
+    except SourceKept as e:
+        # Copied into place, only the source could not be removed
+        print(f"[WARN] {e.strerror}: {src}", file=sys.stderr)
+        return Path(e.filename2)
+    except Exception:
+        NAMES.release(target)
+        raise
 
 
 def hash_image(path: Path):
@@ -157,6 +206,14 @@ def hash_image(path: Path):
         return None
 
 
+def iter_sizes(root: Path, skip_roots):
+    for p in iter_files(root, skip_roots):
+        try:
+            yield p, p.stat().st_size
+        except OSError:
+            continue
+
+
 # --------------- METADATA: EXIF / EXIFTOOL / FFPROBE / OCR ---------------
 
 def exiftool_metadata(exiftool_cmd: str, path: Path) -> dict:
@@ -207,29 +264,82 @@ def ffprobe_metadata(ffprobe_cmd: str, path: Path) -> dict:
         return {}
 
 
-def ocr_image_for_studies(path: Path) -> bool:
-    """Use Tesseract (if available) to detect study text inside images."""
+OCR_GATE_SIDE = 64
+OCR_SIDE = 1600
+# long / short side of screens (4:3 ... 21:9) and A-series paper
+SCREEN_RATIOS = (4 / 3, 3 / 2, 16 / 10, 16 / 9, 19.5 / 9, 20 / 9, 21 / 9, 2 ** 0.5)
+# share of the thumbnail covered by its most common colour
+DOMINANT_SCREEN = 0.25
+DOMINANT_OTHER = 0.45
+
+
+def looks_like_screenshot(path: Path, meta: dict) -> bool:
+    """Cheap gate before OCR: no camera model + flat colours (UI / text)."""
+    if meta.get("device", "UnknownDevice") != "UnknownDevice":
+        return False
+    try:
+        with Image.open(path) as img:
+            w, h = img.size
+            ratio = max(w, h) / max(1, min(w, h))
+            screen = any(abs(ratio - r) / r <= 0.03 for r in SCREEN_RATIOS)
+            # tiny thumbnail; JPEG decodes straight at 1/8 scale
+            img.draft("RGB", (OCR_GATE_SIDE * 2, OCR_GATE_SIDE * 2))
+            small = img.convert("RGB").resize((OCR_GATE_SIDE, OCR_GATE_SIDE), Image.NEAREST)
+    except Exception:
+        return False
+    buckets = {}
+    for count, (r, g, b) in small.getcolors(OCR_GATE_SIDE * OCR_GATE_SIDE):
+        key = (r >> 4, g >> 4, b >> 4)
+        buckets[key] = buckets.get(key, 0) + count
+    share = max(buckets.values()) / (OCR_GATE_SIDE * OCR_GATE_SIDE)
+    return share >= (DOMINANT_SCREEN if screen else DOMINANT_OTHER)
+
+
+def ocr_image_for_studies(conn, path: Path) -> bool:
+    """Tesseract on a downscaled grayscale copy, result cached by content hash."""
     if pytesseract is None:
         return False
     try:
-        img = Image.open(path)
+        key = full_digest(path).hex()
+    except OSError:
+        key = None
+    if key:
+        row = conn.execute("SELECT studies FROM ocr_cache WHERE hash=?", (key,)).fetchone()
+        if row is not None:
+            return bool(row[0])
+    try:
+        with Image.open(path) as img:
+            img.draft("L", (OCR_SIDE, OCR_SIDE))
+            img = img.convert("L")
+            img.thumbnail((OCR_SIDE, OCR_SIDE))
         text = pytesseract.image_to_string(img, lang="eng").lower()
-        for kw in STUDY_KEYWORDS:
-            if kw in text:
-                return True
     except Exception:
         return False
-    return False
+    studies = "Studies" in NAME_MATCHER.scan(text)
+    if key:
+        conn.execute("INSERT OR REPLACE INTO ocr_cache(hash, studies) VALUES(?,?)",
+                     (key, int(studies)))
+    return studies
+
+
+EXIF_IFD = 0x8769
+EXIF_WANTED = {0x010F: "Make", 0x0110: "Model", 0x0132: "DateTime"}
+EXIF_SUB_WANTED = {0x9003: "DateTimeOriginal"}
+
+
+def exif_wanted(exif) -> dict:
+    """Only the tags the sorter uses, instead of a dict of every tag."""
+    md = {name: exif.get(tag) for tag, name in EXIF_WANTED.items()}
+    sub = exif.get_ifd(EXIF_IFD)
+    md.update({name: sub.get(tag) for tag, name in EXIF_SUB_WANTED.items()})
+    return md
 
 
 def exif_basic_from_pillow(path: Path):
     try:
-        img = Image.open(path)
-        exif = img._getexif() or {}
-        md = {}
-        for tag_id, value in exif.items():
-            tag = ExifTags.TAGS.get(tag_id, tag_id)
-            md[tag] = value
+        # header only: no pixel decode, file closed right away
+        with Image.open(path) as img:
+            md = exif_wanted(img.getexif())
         dt_str = md.get("DateTimeOriginal") or md.get("DateTime")
         year = None
         month = None
@@ -261,11 +371,10 @@ def classify_doc_by_content_pdf(file_path: Path) -> str | None:
         return None
     try:
         reader = PdfReader(str(file_path))
-        text_low = ""
+        # Page by page: stop extracting at the first keyword hit
         for page in reader.pages[:3]:
-            text_low += (page.extract_text() or "").lower() + " "
-        for kw in STUDY_KEYWORDS:
-            if kw in text_low:
+            text_low = (page.extract_text() or "").lower()
+            if "Studies" in NAME_MATCHER.scan(text_low):
                 return "Studies"
     except Exception:
         return None
@@ -274,10 +383,12 @@ def classify_doc_by_content_pdf(file_path: Path) -> str | None:
 
 def classify_file(root: Path, file_path: Path) -> str:
     ext = file_path.suffix.lower()
-    full = str(file_path).lower()
-    name = file_path.name.lower()
+    # one pass over the path / name for all keyword categories
+    # path below root only: the folders above it say nothing about the file
+    path_hits = PATH_MATCHER.scan(os.sep + str(file_path.relative_to(root)))
+    name_hits = NAME_MATCHER.scan(file_path.name)
 
-    if ext in INSTALLER_EXT or "\\installers\\" in full:
+    if ext in INSTALLER_EXT or "Installers" in path_hits:
         return "Installers"
 
     if ext in IMAGE_EXT:
@@ -288,17 +399,16 @@ def classify_file(root: Path, file_path: Path) -> str:
         return "Videos"
 
     if ext in DOC_EXT:
-        for kw in STUDY_KEYWORDS:
-            if kw in name:
-                return "Studies"
+        if "Studies" in name_hits:
+            return "Studies"
         cat = classify_doc_by_content_pdf(file_path)
         if cat:
             return cat
 
-    if ext in CODE_EXT or any(k in full for k in ["\\dev\\", "\\minecraft", "battery_pro", "uilnes", "embassy_contact_scraper"]):
+    if ext in CODE_EXT or "Projects" in path_hits:
         return "Projects"
 
-    if any(k in full for k in ["backup", "whatsapp", "recover", "sdcard", "ouma hardeskyf"]):
+    if "Backups" in path_hits:
         return "Backups"
 
     if ext in DOC_EXT:
@@ -317,65 +427,88 @@ def main():
         sys.exit(1)
 
     tools = get_env_tools()
-    db_path = root / "_SmartSorter" / "smartbrain.db"
-    conn = init_db(db_path)
+    # SMARTBRAIN_DB: share one database with the v2 Metadata Index
+    # (relative paths resolve against the checkout, as in the v2 Core)
+    index = MetadataIndex(os.environ.get("SMARTBRAIN_DB") or root / "_SmartSorter" / "smartbrain.db")
+    conn = init_db(index.conn)
 
+    load_keywords(root)
     ensure_category_dirs(root)
 
     category_paths = [root / d for d in CATEGORY_DIRS.values()]
     skip_roots = category_paths + [root / "_SortLogs", root / "_SmartSorter"]
 
-    all_files: list[Path] = []
-    for dirpath, dirnames, filenames in os.walk(root):
-        current_dir = Path(dirpath)
-        # skip category / system dirs
-        if any(str(current_dir).startswith(str(s)) for s in skip_roots):
-            dirnames[:] = []
-            continue
-        for name in filenames:
-            all_files.append(current_dir / name)
+    # streamed: files are sorted while the walk is still running
+    all_files = iter_files(root, skip_roots)
 
-    print(f"[SmartBrain] Found {len(all_files)} files to consider.")
+    # exact duplicates (all categories) from a size-first pre-pass
+    exact_dups = ExactDupEngine().find(iter_sizes(root, skip_roots))
+    print(f"[SmartBrain] {len(exact_dups)} exact duplicates found")
+    dup_dir = root / CATEGORY_DIRS["Archive"] / "Duplicates"
 
     seen_hashes = {}
 
-    for p in tqdm(all_files, desc="SmartBrain sorting"):
+    for n, p in enumerate(tqdm(all_files, desc="SmartBrain sorting"), 1):
         ext = p.suffix.lower()
 
+        try:
+            st = p.stat()
+        except OSError as e:
+            db_log_error(conn, "STAT", f"{p}: {e}")
+            continue
+
+        if p in exact_dups:
+            try:
+                final = move_with_dedup(p, dup_dir)
+                db_log_move(conn, p, final, "Archive", None, notes=f"duplicate of {exact_dups[p]}")
+            except Exception as e:
+                db_log_error(conn, "MOVE", f"{p}: {e}")
+            continue
+
+        # unchanged since a previous run -> reuse hash / category / EXIF
+        cached = index.get(p, st)
+        meta = dict(cached["meta"]) if cached else {}
+
         img_hash = None
         # duplicate detection for images
         if ext in IMAGE_EXT:
-            img_hash = hash_image(p)
+            img_hash = cached["hash"] if cached and cached["hash"] else hash_image(p)
             if img_hash is not None:
                 if img_hash in seen_hashes:
                     # duplicate → Archive/Duplicates
-                    dup_dir = root / CATEGORY_DIRS["Archive"] / "Duplicates"
                     final = move_with_dedup(p, dup_dir)
                     db_log_move(conn, p, final, "Archive", img_hash, notes="duplicate")
                     continue
                 else:
                     seen_hashes[img_hash] = p
 
-        # classify
-        cat = classify_file(root, p)
-        dest_base = root / CATEGORY_DIRS.get(cat, CATEGORY_DIRS["Archive"])
+        # rows written by the v2 index carry its own type names, not categories
+        if cached and cached["category"] in CATEGORY_DIRS:
+            cat = cached["category"]
+        else:
+            # classify
+            cat = classify_file(root, p)
+
+            # extra: for images, send study-looking screenshots to Studies
+            # (camera photos / busy images skip OCR entirely)
+            if cat == "Photos" and pytesseract is not None and ext in IMAGE_EXT:
+                if "year" not in meta:
+                    meta["year"], meta["month"], meta["device"] = exif_basic_from_pillow(p)
+                try:
+                    if looks_like_screenshot(p, meta) and ocr_image_for_studies(conn, p):
+                        cat = "Studies"
+                except Exception as e:
+                    db_log_error(conn, "OCR_STUDIES", f"{p}: {e}")
 
-        # extra: for images, send study-looking screenshots to Studies
-        if cat == "Photos" and pytesseract is not None:
-            try:
-                if ocr_image_for_studies(p):
-                    dest_base = root / CATEGORY_DIRS["Studies"]
-                    cat = "Studies"
-            except Exception as e:
-                db_log_error(conn, "OCR_STUDIES", f"{p}: {e}")
+        dest_base = root / CATEGORY_DIRS.get(cat, CATEGORY_DIRS["Archive"])
 
         # refine destination structure
         if cat == "Photos" and ext in IMAGE_EXT:
-            year, month, device = exif_basic_from_pillow(p)
-            dest = dest_base / str(year) / f"{month:02d}" / device
+            if "year" not in meta:
+                meta["year"], meta["month"], meta["device"] = exif_basic_from_pillow(p)
+            dest = dest_base / str(meta["year"]) / f"{meta['month']:02d}" / meta["device"]
         elif cat == "Videos" and ext in VIDEO_EXT:
-            ts = p.stat().st_mtime
-            dt = datetime.fromtimestamp(ts)
+            dt = datetime.fromtimestamp(st.st_mtime)
             dest = dest_base / str(dt.year) / f"{dt.month:02d}"
         else:
             dest = dest_base
@@ -383,10 +516,16 @@ def main():
         try:
             final = move_with_dedup(p, dest)
             db_log_move(conn, p, final, cat, img_hash)
+            index.put(final, st, category=cat, file_hash=img_hash,
+                      device=meta.get("device"), meta=meta)
         except Exception as e:
             print(f"[ERROR] Failed to move {p}: {e}")
             db_log_error(conn, "MOVE", f"{p}: {e}")
 
+        if n % MOVE_COMMIT_BATCH == 0:
+            conn.commit()
+
+    index.close()
     print("[SmartBrain] Done.")
 
 
@@ -1,4 +1,5 @@
 import argparse
+import json
 import os
 import sys
 import csv
@@ -6,10 +7,22 @@ import time
 from datetime import datetime
 from pathlib import Path
 
-from PIL import Image, ExifTags
+from PIL import Image
 import imagehash
 from PyPDF2 import PdfReader
 
+# Shared implementations come from the v2 Core of this repository
+# (INTELIOMNI_ROOT = the checkout, when this script runs from elsewhere)
+OMNI_ROOT = Path(os.environ.get("INTELIOMNI_ROOT") or Path(__file__).resolve().parents[3])
+if str(OMNI_ROOT) not in sys.path:
+    sys.path.insert(0, str(OMNI_ROOT))
+
+from v2_core.engines.dedup.exact_dup_engine import ExactDupEngine
+from v2_core.system.mover.move_engine import MoveEngine, SourceKept
+from v2_core.system.mover.name_registry import NameRegistry
+from v2_core.system.rules.keywords import KeywordMatcher
+from v2_core.system.scanner.scanner import iter_files
+
 
 def parse_args():
     p = argparse.ArgumentParser(description="Smart Master_Cloud sorter")
@@ -43,6 +56,41 @@ CATEGORY_DIRS = {
 }
 
 
+# --------------- KEYWORD MATCHING ---------------
+
+# category -> substrings (up to 3 letters: whole words only, see the v2
+# keywords.py); extend / replace per category with
+# <root>/_SmartSorter/keywords.json: {"name": {...}, "path": {...}}
+NAME_KEYWORDS = {
+    "Studies": STUDY_KEYWORDS,
+}
+PATH_KEYWORDS = {
+    "Installers": ["\\installers\\"],
+    "Projects": [
+        "\\dev\\", "\\minecraft", "battery_pro", "uilnes", "embassy_contact_scraper", "lunospot", "lunobot",
+    ],
+    "Backups": ["backup", "whatsapp", "recover", "sdcard", "ouma hardeskyf"],
+}
+
+NAME_MATCHER = KeywordMatcher(NAME_KEYWORDS)
+PATH_MATCHER = KeywordMatcher(PATH_KEYWORDS)
+
+
+def load_keywords(root: Path):
+    """Rebuild the matchers with the categories from keywords.json (if any)."""
+    global NAME_MATCHER, PATH_MATCHER
+    config = root / "_SmartSorter" / "keywords.json"
+    if not config.exists():
+        return
+    try:
+        data = json.loads(config.read_text(encoding="utf-8-sig"))
+    except (OSError, ValueError) as e:
+        print(f"[WARN] keywords.json ignored: {e}")
+        return
+    NAME_MATCHER = KeywordMatcher({**NAME_KEYWORDS, **data.get("name", {})})
+    PATH_MATCHER = KeywordMatcher({**PATH_KEYWORDS, **data.get("path", {})})
+
+
 def ensure_category_dirs(root: Path):
     for name in CATEGORY_DIRS.values():
         (root / name).mkdir(parents=True, exist_ok=True)
@@ -69,17 +117,6 @@ def write_move_log(log_path: Path, src: Path, dst: Path):
         ])
 
 
-def is_under_any(path: Path, roots):
-    """Check if path is under any of the given root directories."""
-    for r in roots:
-        try:
-            path.relative_to(r)
-            return True
-        except ValueError:
-            continue
-    return False
-
-
 def classify_doc_by_content(file_path: Path) -> str | None:
     """Extra brain for docs: use PDF text to detect Studies."""
     suffix = file_path.suffix.lower()
@@ -88,13 +125,10 @@ def classify_doc_by_content(file_path: Path) -> str | None:
 
     try:
         reader = PdfReader(str(file_path))
-        text_chunks = []
+        # Page by page: stop extracting at the first keyword hit
         for page in reader.pages[:3]:
-            t = page.extract_text() or ""
-            text_chunks.append(t.lower())
-        content = " ".join(text_chunks)
-        for kw in STUDY_KEYWORDS:
-            if kw in content:
+            t = (page.extract_text() or "").lower()
+            if "Studies" in NAME_MATCHER.scan(t):
                 return "Studies"
     except Exception:
         # If PDF is weird, silently ignore and let normal classification handle it
@@ -106,11 +140,13 @@ def classify_doc_by_content(file_path: Path) -> str | None:
 def classify_file(root: Path, file_path: Path) -> str:
     """Return one of CATEGORY_DIRS keys."""
     ext = file_path.suffix.lower()
-    full_lower = str(file_path).lower()
-    name_lower = file_path.name.lower()
+    # one pass over the path / name for all keyword categories
+    # path below root only: the folders above it say nothing about the file
+    path_hits = PATH_MATCHER.scan(os.sep + str(file_path.relative_to(root)))
+    name_hits = NAME_MATCHER.scan(file_path.name)
 
     # 1) Installers
-    if ext in INSTALLER_EXT or "\\installers\\" in full_lower:
+    if ext in INSTALLER_EXT or "Installers" in path_hits:
         return "Installers"
 
     # 2) Photos
@@ -123,22 +159,19 @@ def classify_file(root: Path, file_path: Path) -> str:
 
     # 4) Studies (by name first)
     if ext in DOC_EXT:
-        for kw in STUDY_KEYWORDS:
-            if kw in name_lower:
-                return "Studies"
+        if "Studies" in name_hits:
+            return "Studies"
         # if not in name, try PDF content sniffing
         cat = classify_doc_by_content(file_path)
         if cat:
             return cat
 
     # 5) Projects (code / dev / specific dirs)
-    if ext in CODE_EXT or any(key in full_lower for key in [
-        "\\dev\\", "\\minecraft", "battery_pro", "uilnes", "embassy_contact_scraper", "lunospot", "lunobot"
-    ]):
+    if ext in CODE_EXT or "Projects" in path_hits:
         return "Projects"
 
     # 6) Backups / dumps
-    if any(key in full_lower for key in ["backup", "whatsapp", "recover", "sdcard", "ouma hardeskyf"]):
+    if "Backups" in path_hits:
         return "Backups"
 
     # 7) Generic docs
@@ -149,36 +182,46 @@ def classify_file(root: Path, file_path: Path) -> str:
     return "Archive"
 
 
+# Destination dirs are listed once per run; moves never replace a file
+# (a name taken since the listing gets the next name__N suffix)
+NAMES = NameRegistry()
+MOVER = MoveEngine(names=NAMES)
+
+
 def move_with_dedup(src: Path, dest_dir: Path) -> Path:
     """Move src into dest_dir, avoid overwriting, return final path."""
     dest_dir.mkdir(parents=True, exist_ok=True)
-    target = dest_dir / src.name
+    target = NAMES.reserve_path(dest_dir / src.name)
+    try:
+        return Path(MOVER.move(src, target))
+    except SourceKept as e:
+        # Copied into place, only the source could not be removed
+        print(f"[WARN] {e.strerror}: {src}", file=sys.stderr)
+        return Path(e.filename2)
+    except Exception:
+        NAMES.release(target)
+        raise
+
+
+EXIF_IFD = 0x8769
+EXIF_WANTED = {0x010F: "Make", 0x0110: "Model", 0x0132: "DateTime"}
+EXIF_SUB_WANTED = {0x9003: "DateTimeOriginal"}
 
-    if not target.exists():
-        src.replace(target)
-        return target
 
-    # If filename exists, append counter
-    stem = target.stem
-    suffix = target.suffix
-    counter = 1
-    while True:
-        candidate = dest_dir / f"{stem}__{counter}{suffix}"
-        if not candidate.exists():
-            src.replace(candidate)
-            return candidate
-        counter += 1
+def exif_wanted(exif) -> dict:
+    """Only the tags the sorter uses, instead of a dict of every tag."""
+    md = {name: exif.get(tag) for tag, name in EXIF_WANTED.items()}
+    sub = exif.get_ifd(EXIF_IFD)
+    md.update({name: sub.get(tag) for tag, name in EXIF_SUB_WANTED.items()})
+    return md
 
 
 def get_exif_datetime_and_device(image_path: Path):
     """Return (year, month, device_name or 'Unknown') from EXIF if possible."""
     try:
-        img = Image.open(image_path)
-        exif = img._getexif() or {}
-        exif_data = {}
-        for tag_id, value in exif.items():
-            tag = ExifTags.TAGS.get(tag_id, tag_id)
-            exif_data[tag] = value
+        # header only: no pixel decode, file closed right away
+        with Image.open(image_path) as img:
+            exif_data = exif_wanted(img.getexif())
 
         # DateTimeOriginal or DateTime
         dt_str = exif_data.get("DateTimeOriginal") or exif_data.get("DateTime")
@@ -221,6 +264,14 @@ def hash_image(path: Path):
         return None
 
 
+def iter_sizes(root: Path, skip_roots):
+    for p in iter_files(root, skip_roots):
+        try:
+            yield p, p.stat().st_size
+        except OSError:
+            continue
+
+
 def main():
     args = parse_args()
     root = Path(args.root).expanduser().resolve()
@@ -229,6 +280,7 @@ def main():
         print(f"Root path not found: {root}")
         sys.exit(1)
 
+    load_keywords(root)
     ensure_category_dirs(root)
     log_path = init_log(root)
     print(f"[INFO] Logging moves to: {log_path}")
@@ -237,42 +289,34 @@ def main():
     category_paths = [root / d for d in CATEGORY_DIRS.values()]
     skip_roots = category_paths + [root / "_SortLogs", root / "_SmartSorter"]
 
+    # Exact duplicates (all categories) from a size-first pre-pass
+    exact_dups = ExactDupEngine().find(iter_sizes(root, skip_roots))
+    print(f"[INFO] {len(exact_dups)} exact duplicates found")
+    dup_dir = root / CATEGORY_DIRS["Archive"] / "Duplicates"
+
     # For duplicate detection: map hash -> first file seen
     seen_hashes = {}
 
-    all_files: list[Path] = []
-    for dirpath, dirnames, filenames in os.walk(root):
-        current_dir = Path(dirpath)
-
-        # skip category & system folders
-        if is_under_any(current_dir, skip_roots):
-            # prevent walking deeper
-            dirnames[:] = []
-            continue
-
-        for name in filenames:
-            p = current_dir / name
-            all_files.append(p)
-
-    total = len(all_files)
-    print(f"[INFO] Found {total} files to consider.")
-
+    # streamed: files are sorted while the walk is still running
     processed = 0
-    for p in all_files:
+    for p in iter_files(root, skip_roots):
         processed += 1
-        if processed % 50 == 0 or processed == total:
-            percent = (processed / total) * 100
-            print(f"[INFO] {processed}/{total} ({percent:.1f}%)")
+        if processed % 50 == 0:
+            print(f"[INFO] {processed} files processed")
 
         ext = p.suffix.lower()
 
-        # Duplicate detection only for images
+        if p in exact_dups:
+            final = move_with_dedup(p, dup_dir)
+            write_move_log(log_path, p, final)
+            continue
+
+        # Perceptual duplicate detection for images
         if ext in IMAGE_EXT:
             h = hash_image(p)
             if h is not None:
                 if h in seen_hashes:
                     # we found a near-duplicate: send to Archive/Duplicates
-                    dup_dir = root / CATEGORY_DIRS["Archive"] / "Duplicates"
                     final = move_with_dedup(p, dup_dir)
                     write_move_log(log_path, p, final)
                     continue
@@ -302,6 +346,7 @@ def main():
         except Exception as e:
             print(f"[ERROR] Failed to move {p}: {e}", file=sys.stderr)
 
+    print(f"[INFO] {processed} files processed")
     print("[DONE] Smart sorting complete.")
 
 
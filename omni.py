@@ -3,9 +3,12 @@ InteliOmniSorter - CLI Launcher (Phase 9)
 
 Provides:
 - sort command
+- watch (continuous sorting of new files in the inbox folders)
+- apply / plan-diff (move plans written by `sort --plan`)
 - rollback preview
 - rollback apply
-- automatic loading of engines via Automount V2
+- report (aggregates of the per-run decision records)
+- lazy loading of engines via the cached Automount registry
 """
 
 import argparse
@@ -28,25 +31,31 @@ import importlib.util
 # Universal Automount Loader (works everywhere)
 # -------------------------------------------------------
 AUTO_PATH = ROOT / "v2_core" / "system" / "automount" / "automount.py"
+AUTO_NAME = "v2_core.system.automount.automount"
 
-spec = importlib.util.spec_from_file_location("automount", AUTO_PATH)
-automount = importlib.util.module_from_spec(spec)
-spec.loader.exec_module(automount)
+if AUTO_NAME in sys.modules:
+    automount = sys.modules[AUTO_NAME]
+else:
+    # Registered under its import name so engines importing automount
+    # share the same (memoized) registry instead of rescanning.
+    spec = importlib.util.spec_from_file_location(AUTO_NAME, AUTO_PATH)
+    automount = importlib.util.module_from_spec(spec)
+    sys.modules[AUTO_NAME] = automount
+    spec.loader.exec_module(automount)
 
 mount_all = automount.mount_all
 
+# Discovery only - modules are imported when first touched
 REGISTRY = mount_all()
 
-# Engines
-SortEngine = None
-RollbackEngine = None
 
-# Detect engines
-if "sort_engine" in REGISTRY["engines"]:
-    SortEngine = REGISTRY["engines"]["sort_engine"].SortEngine
+def get_engine(section, name, attr):
+    """Resolve a class from the registry, importing its module on demand."""
+    mod = REGISTRY[section].get(name)
+    if mod is None:
+        return None
+    return getattr(mod, attr, None)
 
-if "rollback_engine" in REGISTRY["system"]:
-    RollbackEngine = REGISTRY["system"]["rollback_engine"].RollbackEngine
 
 # -------------------------------------------------------
 # CLI
@@ -57,13 +66,91 @@ def cli():
 
     # SORT
     sort_cmd = sub.add_parser("sort")
-    sort_cmd.add_argument("--input", required=True, help="Folder to sort")
+    sort_cmd.add_argument("--input", help="Folder to sort")
+    sort_cmd.add_argument("--resume", nargs="?", const="latest", metavar="RUN_ID",
+                          help="Continue an interrupted run (default: the latest unfinished one)")
+    sort_cmd.add_argument("--no-checkpoint", action="store_true",
+                          help="Don't keep a resumable checkpoint of the run")
+    sort_cmd.add_argument("--plan", metavar="FILE",
+                          help="Classify only: write the moves to a plan file (see apply)")
     sort_cmd.add_argument("--simulate", action="store_true", help="Simulated run")
+    sort_cmd.add_argument("--workers", type=int, default=None,
+                          help="Classifier workers (0 = one per CPU core; default: one per "
+                               "core when the faces / PDF / OCR engines are enabled, else 1)")
+    sort_cmd.add_argument("--no-dedup", action="store_true",
+                          help="Skip exact + near-duplicate detection")
+    sort_cmd.add_argument("--verbose", action="store_true",
+                          help="Print one line per file (the run report always has them)")
+    sort_cmd.add_argument("--no-report", action="store_true",
+                          help="Don't write the per-file run report")
+    sort_cmd.add_argument("--async", dest="async_io", action="store_true",
+                          help="asyncio pipeline: overlap I/O across many files "
+                               "(network shares); uses the limits below instead of --workers")
+    sort_cmd.add_argument("--disk-limit", type=int, default=0,
+                          help="Async: concurrent filesystem calls (default 32)")
+    sort_cmd.add_argument("--cpu-limit", type=int, default=0,
+                          help="Async: concurrent extractor calls (default: CPU cores)")
+    sort_cmd.add_argument("--tool-limit", type=int, default=0,
+                          help="Async: concurrent external tool processes (default 4)")
+    sort_cmd.add_argument("--profile", action="store_true",
+                          help="Per-stage latency histograms + files/s, bytes/s at the end")
+    sort_cmd.add_argument("--pstats", metavar="FILE",
+                          help="Profile: also write a cProfile dump (pstats / snakeviz)")
+    sort_cmd.add_argument("--chrome-trace", metavar="FILE",
+                          help="Profile: also write the stage spans as a Chrome trace "
+                               "(chrome://tracing, Perfetto)")
+
+    # WATCH
+    watch_cmd = sub.add_parser("watch")
+    watch_cmd.add_argument("--input", required=True, nargs="+", help="Inbox folder(s) to watch")
+    watch_cmd.add_argument("--simulate", action="store_true", help="Simulated run")
+    watch_cmd.add_argument("--workers", type=int, default=None,
+                           help="Classifier workers (0 = one per CPU core; default: one per "
+                                "core when the faces / PDF / OCR engines are enabled, else 1)")
+    watch_cmd.add_argument("--settle", type=float, default=2.0,
+                           help="Seconds a file's size / mtime must stay unchanged "
+                                "(files closed after writing are sorted right away)")
+    watch_cmd.add_argument("--poll", action="store_true",
+                           help="Poll directories instead of using inotify")
+    watch_cmd.add_argument("--existing", action="store_true",
+                           help="Also sort files already in the inbox at start")
+    watch_cmd.add_argument("--no-dedup", action="store_true",
+                           help="Skip exact + near-duplicate detection")
+    watch_cmd.add_argument("--verbose", action="store_true",
+                           help="Print one line per file (the run report always has them)")
+    watch_cmd.add_argument("--no-report", action="store_true",
+                           help="Don't write the per-file run report")
+
+    # APPLY
+    apply_cmd = sub.add_parser("apply")
+    apply_cmd.add_argument("plan", help="Plan file written by sort --plan")
+    apply_cmd.add_argument("--simulate", action="store_true", help="Simulated run")
+    apply_cmd.add_argument("--verbose", action="store_true",
+                           help="Print one line per file (the run report always has them)")
+    apply_cmd.add_argument("--no-report", action="store_true",
+                           help="Don't write the per-file run report")
+
+    # PLAN DIFF
+    diff_cmd = sub.add_parser("plan-diff")
+    diff_cmd.add_argument("old", help="Older plan file")
+    diff_cmd.add_argument("new", help="Newer plan file")
+    diff_cmd.add_argument("--top", type=int, default=10, help="Rows per table")
+
+    # REPORT
+    report_cmd = sub.add_parser("report")
+    report_cmd.add_argument("--run", help="Run id (prefix) or report file, default: latest run")
+    report_cmd.add_argument("--by", default="rule",
+                            choices=["rule", "type", "ext", "outcome", "destination"],
+                            help="Group files / bytes by this column")
+    report_cmd.add_argument("--top", type=int, default=10, help="Rows per table")
+    report_cmd.add_argument("--list", action="store_true", help="List available runs")
 
     # ROLLBACK
     rb_cmd = sub.add_parser("rollback")
     rb_cmd.add_argument("--preview", action="store_true")
     rb_cmd.add_argument("--apply", action="store_true")
+    rb_cmd.add_argument("--workers", type=int, default=8,
+                        help="Concurrent restores for independent chains")
 
     args = parser.parse_args()
 
@@ -71,18 +158,100 @@ def cli():
     # SORT
     # -------------------------
     if args.command == "sort":
+        SortEngine = get_engine("engines", "sort_engine", "SortEngine")
+        if not SortEngine:
+            print("[ERROR] SortEngine not found in REGISTRY.")
+            return
+
+        if not args.input and not args.resume:
+            print("[ERROR] Use --input FOLDER or --resume [RUN_ID].")
+            return
+
+        limits = {"disk": args.disk_limit, "cpu": args.cpu_limit, "tools": args.tool_limit}
+        eng = SortEngine(simulated=args.simulate, workers=args.workers,
+                         dedup=not args.no_dedup, report=not args.no_report,
+                         verbose=args.verbose, async_io=args.async_io, limits=limits,
+                         checkpoint=not args.no_checkpoint, plan=args.plan,
+                         profile=args.profile, pstats=args.pstats,
+                         chrome_trace=args.chrome_trace)
+        eng.run(args.input, resume=args.resume)
+        return
+
+    # -------------------------
+    # WATCH
+    # -------------------------
+    if args.command == "watch":
+        SortEngine = get_engine("engines", "sort_engine", "SortEngine")
+        if not SortEngine:
+            print("[ERROR] SortEngine not found in REGISTRY.")
+            return
+
+        eng = SortEngine(simulated=args.simulate, workers=args.workers,
+                         dedup=not args.no_dedup, report=not args.no_report,
+                         verbose=args.verbose)
+        eng.watch(args.input, settle=args.settle, poll=args.poll, existing=args.existing)
+        return
+
+    # -------------------------
+    # APPLY
+    # -------------------------
+    if args.command == "apply":
+        SortEngine = get_engine("engines", "sort_engine", "SortEngine")
         if not SortEngine:
             print("[ERROR] SortEngine not found in REGISTRY.")
             return
 
-        eng = SortEngine(simulated=args.simulate)
-        eng.run(args.input)
+        # Phashes come from the plan; nothing is classified
+        eng = SortEngine(simulated=args.simulate, report=not args.no_report,
+                         verbose=args.verbose, checkpoint=False)
+        eng.apply(args.plan)
+        return
+
+    # -------------------------
+    # PLAN DIFF
+    # -------------------------
+    if args.command == "plan-diff":
+        plans = REGISTRY["system"].get("move_plan")
+        if plans is None:
+            print("[ERROR] Move plan module not loaded.")
+            return
+        try:
+            diff = plans.diff_plans(args.old, args.new)
+        except plans.PlanError as e:
+            print(f"[ERROR] {e}")
+            return
+        plans.print_diff(args.old, args.new, diff, top=args.top)
+        return
+
+    # -------------------------
+    # REPORT
+    # -------------------------
+    if args.command == "report":
+        report = REGISTRY["system"].get("run_report")
+        if report is None:
+            print("[ERROR] Run report module not loaded.")
+            return
+
+        if args.list:
+            for path in report.list_reports():
+                print(f"  {path.name}")
+            return
+
+        path = report.find_report(args.run)
+        if path is None:
+            print("[ERROR] No run report found.")
+            return
+
+        columns = report.read_report(path)
+        summary = report.summarize(columns, by=args.by, top=args.top)
+        report.print_summary(path, summary, by=args.by, top=args.top)
         return
 
     # -------------------------
     # ROLLBACK
     # -------------------------
     if args.command == "rollback":
+        RollbackEngine = get_engine("system", "rollback_engine", "RollbackEngine")
         if not RollbackEngine:
             print("[ERROR] RollbackEngine not loaded.")
             return
@@ -90,11 +259,11 @@ def cli():
         rb = RollbackEngine()
 
         if args.preview:
-            rb.rollback(dry_run=True)
+            rb.rollback(dry_run=True, workers=args.workers)
             return
 
         if args.apply:
-            rb.rollback(dry_run=False)
+            rb.rollback(dry_run=False, workers=args.workers)
             return
 
         print("[ERROR] Use --preview or --apply for rollback.")
@@ -0,0 +1,29 @@
+"""
+Shared test setup: the repository root is importable (v2_core.*), run
+checkpoints go to the test's tmp_path instead of the repository root.
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+
+@pytest.fixture
+def root():
+    """Repository root."""
+    return ROOT
+
+
+@pytest.fixture(autouse=True)
+def checkpoint_db(tmp_path, monkeypatch):
+    """Run checkpoint database of this test."""
+    from v2_core.system.checkpoint import checkpoint
+
+    db = tmp_path / "run_checkpoints.db"
+    monkeypatch.setattr(checkpoint, "DEFAULT_DB", str(db))
+    return db
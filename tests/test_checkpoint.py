@@ -0,0 +1,77 @@
+"""
+Checkpointed runs: a move only starts once its destination is committed.
+"""
+
+import sqlite3
+from pathlib import Path
+
+from v2_core.engines.sorter.sort_engine import SortEngine
+from v2_core.system.checkpoint import checkpoint
+
+
+def committed_final(db, path):
+    conn = sqlite3.connect(str(db))
+    try:
+        row = conn.execute("SELECT final FROM files WHERE path=?", (str(path),)).fetchone()
+    finally:
+        conn.close()
+    return row[0] if row else None
+
+
+def test_moves_start_after_group_commit(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    inbox = tmp_path / "in"
+    inbox.mkdir()
+    files = [inbox / f"f{i}.txt" for i in range(3)]
+    for f in files:
+        f.write_text(f.name)
+
+    eng = SortEngine(simulated=False, workers=1, use_index=False, report=False, dedup=False)
+    eng.open_checkpoint(inbox)
+    eng.checkpoint.discovered(files)
+    eng.checkpoint.flush()
+    db = eng.checkpoint.db_path
+
+    dsts = [eng.safe_move(str(f), str(tmp_path / "out" / f.name)) for f in files]
+    # Held: nothing moved, nothing committed per file
+    assert all(f.exists() for f in files)
+    assert committed_final(db, files[0]) is None
+
+    eng.release_moves()
+    eng.close(completed=False)
+    for f, dst in zip(files, dsts):
+        assert not f.exists() and Path(dst).exists()
+        assert committed_final(db, f) == dst
+
+
+def test_in_flight_originals_count_for_near_dups(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    eng = SortEngine(simulated=False, workers=1, use_index=False, report=False, dedup=False)
+    src = tmp_path / "a.txt"
+    src.write_text("a")
+    eng.open_checkpoint(tmp_path)
+
+    dst = eng.safe_move(str(src), str(tmp_path / "out" / "a.txt"))
+    assert eng.alive(dst) and not Path(dst).exists()
+    eng.close(completed=False)
+    assert eng.alive(dst) and Path(dst).exists()
+    assert not eng.in_flight
+
+
+def test_db_resolves_against_root_not_cwd(tmp_path, monkeypatch, root):
+    monkeypatch.chdir(tmp_path)
+    assert checkpoint.resolve_db("run_checkpoints.db") == root / "run_checkpoints.db"
+    assert checkpoint.resolve_db(tmp_path / "x.db") == tmp_path / "x.db"
+
+
+def test_simulated_runs_keep_no_checkpoint(tmp_path, monkeypatch, checkpoint_db):
+    monkeypatch.chdir(tmp_path)
+    inbox = tmp_path / "in"
+    inbox.mkdir()
+    (inbox / "a.txt").write_text("a")
+
+    eng = SortEngine(simulated=True, workers=1, use_index=False, report=False, dedup=False)
+    eng.run(inbox)
+    assert eng.checkpoint is None and not checkpoint_db.exists()
+    assert (inbox / "a.txt").exists()
+    assert eng.open_resume("latest") is None
@@ -0,0 +1,110 @@
+"""
+Header-only EXIF reader against Pillow: JPEG, TIFF, PNG, WebP, truncated and malformed files.
+"""
+
+import random
+import struct
+
+import pytest
+
+Image = pytest.importorskip("PIL.Image")
+from PIL import features
+
+from v2_core.system.metadata import exif_reader
+from v2_core.system.metadata.exif_reader import read_exif, exif_tags
+
+FORMATS = [("jpg", "JPEG"), ("tif", "TIFF"), ("png", "PNG"), ("webp", "WEBP")]
+
+
+def make_exif():
+    exif = Image.Exif()
+    exif[0x010F] = "Canon"
+    exif[0x0110] = "Canon EOS 80D"
+    exif[0x0112] = 6
+    exif[0x0132] = "2021:05:06 07:08:09"
+    exif.get_ifd(0x8769)[0x9003] = "2020:01:02 03:04:05"
+    gps = exif.get_ifd(0x8825)
+    gps[1], gps[2] = "S", (33.0, 55.0, 30.0)
+    gps[3], gps[4] = "E", (18.0, 25.0, 12.0)
+    return exif
+
+
+def write_image(tmp_path, ext, fmt):
+    if fmt == "WEBP" and not features.check("webp"):
+        pytest.skip("Pillow without WebP")
+    path = tmp_path / f"photo.{ext}"
+    Image.new("RGB", (64, 48), (200, 30, 30)).save(path, fmt, exif=make_exif().tobytes())
+    return path
+
+
+def pillow_exif(path):
+    """The tags read_exif() decodes, as Pillow reads them."""
+    with Image.open(path) as img:
+        exif = img.getexif()
+        sub = exif.get_ifd(0x8769)
+        gps = exif.get_ifd(0x8825)
+    meta = {name: exif[tag] for tag, name in exif_reader.IFD0_TAGS.items() if tag in exif}
+    meta.update({name: sub[tag] for tag, name in exif_reader.EXIF_TAGS.items() if tag in sub})
+    if gps:
+        meta["GPS"] = [exif_reader.gps_degrees([float(x) for x in gps[2]], gps[1]),
+                       exif_reader.gps_degrees([float(x) for x in gps[4]], gps[3])]
+    return meta
+
+
+@pytest.mark.parametrize("ext, fmt", FORMATS)
+def test_matches_pillow(tmp_path, ext, fmt):
+    path = write_image(tmp_path, ext, fmt)
+    meta = read_exif(path)
+    assert meta == pillow_exif(path)
+    assert meta["DateTimeOriginal"] == "2020:01:02 03:04:05"
+    assert meta["GPS"] == [-33.925, 18.42]
+    assert exif_tags(path) == {"year": 2020, "month": "01", "day": "02",
+                               "camera": "Canon EOS 80D", "orientation": 6,
+                               "gps": [-33.925, 18.42]}
+
+
+def test_small_head_seeks_to_far_values(tmp_path, monkeypatch):
+    path = write_image(tmp_path, "jpg", "JPEG")
+    expected = read_exif(path)
+    # Everything past the first bytes comes from seeks
+    monkeypatch.setattr(exif_reader, "HEAD", 16)
+    assert read_exif(path) == expected
+
+
+@pytest.mark.parametrize("ext, fmt", FORMATS)
+def test_truncated_files_never_raise(tmp_path, ext, fmt):
+    data = write_image(tmp_path, ext, fmt).read_bytes()
+    cut = tmp_path / f"cut.{ext}"
+    full = read_exif(tmp_path / f"photo.{ext}")
+    for size in range(0, min(len(data), 2048), 7):
+        cut.write_bytes(data[:size])
+        meta = read_exif(cut)
+        # Whatever is returned was really in the file
+        assert all(full.get(k) == v for k, v in meta.items()), size
+
+
+def test_malformed_sub_ifd_pointer(tmp_path):
+    # IFD0 with ExifIFD given as two LONGs (a list) and a bogus GPS pointer
+    entries = [(0x010F, 2, 4, b"Sony"), (0x8769, 4, 2, 8), (0x8825, 4, 1, 0xFFFFFF00)]
+    ifd = struct.pack("<H", len(entries))
+    for tag, typ, n, value in entries:
+        if isinstance(value, bytes):
+            ifd += struct.pack("<HHL4s", tag, typ, n, value)
+        else:
+            ifd += struct.pack("<HHLL", tag, typ, n, value)
+    path = tmp_path / "bad.tif"
+    path.write_bytes(b"II*\0" + struct.pack("<L", 8) + ifd + b"\0" * 4)
+    assert read_exif(path) == {"Make": "Sony"}
+
+
+@pytest.mark.parametrize("ext, fmt", FORMATS)
+def test_corrupted_bytes_never_raise(tmp_path, ext, fmt):
+    data = bytearray(write_image(tmp_path, ext, fmt).read_bytes())
+    bad = tmp_path / f"bad.{ext}"
+    rng = random.Random(1)
+    for _ in range(300):
+        mutated = bytearray(data)
+        for _ in range(rng.randint(1, 8)):
+            mutated[rng.randrange(min(len(mutated), 512))] = rng.randrange(256)
+        bad.write_bytes(mutated)
+        assert isinstance(exif_tags(bad), dict)
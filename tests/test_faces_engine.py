@@ -0,0 +1,45 @@
+"""
+Faces Engine: a broken process pool fails one batch, the embedding store saves as one file.
+"""
+
+import os
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from v2_core.engines.faces import faces_engine
+from v2_core.engines.faces.faces_engine import EmbeddingStore, FacesEngine
+
+
+def test_broken_pool_fails_batch_and_recovers(tmp_path):
+    eng = FacesEngine(workers=1, store=tmp_path / "emb", db_path=tmp_path / "faces.db")
+    eng.start()
+    broken = eng.pool
+    # A worker dying breaks the pool for every later submit
+    with pytest.raises(Exception):
+        broken.submit(os._exit, 1).result(timeout=30)
+
+    # The batch fails either on submit or through its future; the next
+    # submit at the latest finds the pool broken and replaces it
+    assert eng.encode(tmp_path / "a.jpg") is None
+    assert eng.encode(tmp_path / "b.jpg") is None
+    assert eng.pool is not broken
+    assert eng.pool.submit(os.getpid).result(timeout=30) != os.getpid()
+    # Every in-flight slot was given back
+    for _ in range(eng.workers * 2):
+        assert eng.inflight.acquire(timeout=1)
+    for _ in range(eng.workers * 2):
+        eng.inflight.release()
+    eng.close()
+
+
+def test_embedding_store_single_file(tmp_path):
+    store = EmbeddingStore(tmp_path / "emb")
+    store.put("k1", np.ones((2, faces_engine.DIM), dtype=np.float32), [3, 4])
+    store.save()
+    assert sorted(os.listdir(tmp_path)) == ["emb.npz"]
+
+    again = EmbeddingStore(tmp_path / "emb")
+    vectors, persons = again.get("k1")
+    assert vectors.shape == (2, faces_engine.DIM) and persons == [3, 4]
@@ -0,0 +1,51 @@
+"""
+Keyword matching: one automaton, short keywords as whole words, paths below the input folder.
+"""
+
+import os
+import random
+
+from v2_core.system.rules.keywords import KeywordMatcher, STUDY_KEYWORDS, contains
+from v2_core.system.rules.rule_engine import RuleEngine
+
+
+def test_short_keywords_are_whole_words():
+    m = KeywordMatcher({"Studies": STUDY_KEYWORDS, "Backups": ["backup"]})
+    for text in ("page.pdf", "image.png", "classes.docx", "associate.txt", "mydvd.iso"):
+        assert m.scan(text) == [], text
+    for text in ("age_2024.pdf", "SOC 101 notes.pdf", "CLS-essay.docx", "unisa.pdf"):
+        assert m.scan(text) == ["Studies"], text
+    # Long keywords still match inside words
+    assert m.scan("old_backups.zip") == ["Backups"]
+    assert m.find("ANH notes, exam prep, anhx") == ["anh", "exam"]
+
+
+def test_matcher_agrees_with_contains():
+    rng = random.Random(7)
+    words = ["age", "cls", "ab", "exam", "backup", "a-b", "x", "ba"]
+    m = KeywordMatcher([(w, [w]) for w in words])
+    for _ in range(2000):
+        text = "".join(rng.choice("abgexmcls- _.kup1") for _ in range(rng.randint(0, 14)))
+        assert m.scan(text) == [w for w in words if contains(text, w)], text
+        assert set(m.find(text)) == {w for w in words if contains(text, w)}, text
+
+
+def test_path_keywords_see_the_path_below_the_input_folder(tmp_path):
+    from v2_core.engines.sorter.sort_engine import SortEngine
+
+    root = tmp_path / "backups" / "inbox"
+    eng = SortEngine(simulated=True, workers=1, use_index=False, report=False, dedup=False)
+    eng.input_roots = [os.path.abspath(root)]
+    assert eng.rel_path(root / "dev" / "main.py") == os.sep + os.path.join("dev", "main.py")
+
+    rules = RuleEngine(tmp_path / "rules.json")
+    rules.rules = [
+        {"name": "Backups", "path_keywords": ["backup"], "target": "sorted/backups/"},
+        {"name": "Projects", "path_keywords": ["/dev/", "\\dev\\"], "target": "sorted/projects/"},
+    ]
+    for path, target in ((root / "photo.jpg", None),
+                         (root / "dev" / "main.py", "sorted/projects/"),
+                         (root / "phone_backup" / "a.txt", "sorted/backups/")):
+        rel = eng.rel_path(path)
+        assert rules.evaluate({}, path.name, rel) == target, rel
+        assert rules.evaluate_interpreted({}, path.name, rel) == target, rel
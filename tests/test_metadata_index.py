@@ -0,0 +1,55 @@
+"""
+Metadata Index in a smartbrain.db shared with legacy smartbrain.py.
+"""
+
+import os
+import json
+import sqlite3
+
+from v2_core.system.index.metadata_index import MetadataIndex, resolve_db
+
+
+def test_db_path(monkeypatch, tmp_path, root):
+    monkeypatch.setenv("SMARTBRAIN_DB", "custom/smartbrain.db")
+    assert resolve_db() == root / "custom" / "smartbrain.db"
+    monkeypatch.setenv("SMARTBRAIN_DB", str(tmp_path / "x.db"))
+    assert resolve_db() == tmp_path / "x.db"
+    assert resolve_db("v2_core/temp/a.db") == root / "v2_core" / "temp" / "a.db"
+
+
+def test_legacy_columns_survive(tmp_path):
+    photo = tmp_path / "photo.jpg"
+    photo.write_bytes(b"jpeg")
+    st = os.stat(photo)
+    db = tmp_path / "smartbrain.db"
+
+    # Row as legacy smartbrain.py wrote it before it used the index
+    index = MetadataIndex(db)
+    index.conn.execute(
+        "INSERT INTO files(path, category, hash, meta_json, st_dev, st_ino, st_size, st_mtime_ns) "
+        "VALUES(?,?,?,?,?,?,?,?)",
+        (str(photo), "Photos", "abcd", json.dumps({"year": 2024}), st.st_dev, st.st_ino,
+         st.st_size, st.st_mtime_ns),
+    )
+    index.put(photo, st, tags={"ext": ".jpg", "type": "image"}, category="image")
+    assert index.get(photo, st)["tags"]["type"] == "image"
+    index.close()
+
+    row = sqlite3.connect(db).execute(
+        "SELECT category, hash, meta_json FROM files WHERE path=?", (str(photo),)).fetchone()
+    assert row == ("Photos", "abcd", json.dumps({"year": 2024}))
+
+
+def test_v2_tags_survive_legacy_put(tmp_path):
+    photo = tmp_path / "photo.jpg"
+    photo.write_bytes(b"jpeg")
+    st = os.stat(photo)
+
+    index = MetadataIndex(tmp_path / "smartbrain.db")
+    index.put(photo, st, tags={"type": "image"}, category="image")
+    # Legacy smartbrain.py stores its own columns only
+    index.put(photo, st, category="Photos", file_hash="abcd", meta={"year": 2024})
+    cached = index.get(photo, st)
+    index.close()
+    assert cached["tags"] == {"type": "image"}
+    assert (cached["hash"], cached["meta"]) == ("abcd", {"year": 2024})
@@ -0,0 +1,92 @@
+"""
+Metadata Service against a fake exiftool (-stay_open protocol, local script).
+"""
+
+import sys
+import stat
+import threading
+
+import pytest
+
+from v2_core.system.metadata.metadata_service import ExifTool, MetadataService
+
+FAKE_EXIFTOOL = """#!{python}
+import sys, json, time
+args = []
+for line in sys.stdin:
+    line = line.rstrip("\\n")
+    if line.startswith("-execute"):
+        files = [a for a in args if not a.startswith("-") and a not in ("filename=utf8", "True")]
+        if any("hang" in f for f in files):
+            time.sleep(30)
+        if any("garbage" in f for f in files):
+            print(json.dumps({{"not": "a list"}}))
+        else:
+            print(json.dumps([{{"SourceFile": f, "Make": "Canon", "Model": "Canon EOS 80D"}}
+                              for f in files]))
+        print("{{ready%s}}" % line[8:], flush=True)
+        args = []
+    elif line == "False" and args and args[-1] == "-stay_open":
+        break
+    else:
+        args.append(line)
+"""
+
+
+@pytest.fixture
+def fake_exiftool(tmp_path):
+    script = tmp_path / "exiftool"
+    script.write_text(FAKE_EXIFTOOL.format(python=sys.executable))
+    script.chmod(script.stat().st_mode | stat.S_IXUSR)
+    return str(script)
+
+
+def call(fn, *args, timeout=10):
+    """fn(*args) on a thread; fails the test instead of hanging it."""
+    result = {}
+    thread = threading.Thread(target=lambda: result.setdefault("value", fn(*args)), daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "caller blocked"
+    return result["value"]
+
+
+def test_camera_tags_batched(fake_exiftool, tmp_path):
+    paths = [str(tmp_path / f"img{i}.jpg") for i in range(20)]
+    with MetadataService(exiftool=fake_exiftool, ffprobe="/nonexistent") as service:
+        futures = [service.submit_exif(p) for p in paths]
+        results = [f.result(10) for f in futures]
+        assert all(r["Make"] == "Canon" for r in results)
+        assert call(service.tags, paths[0], "image") == {"camera": "Canon EOS 80D"}
+
+
+def test_hung_exiftool_is_restarted(fake_exiftool, tmp_path):
+    tool = ExifTool(fake_exiftool, timeout=1.0)
+    try:
+        assert call(tool.get, str(tmp_path / "hang.jpg")) == {}
+        assert tool.restarts == 1
+        assert call(tool.get, str(tmp_path / "ok.jpg"))["Model"] == "Canon EOS 80D"
+    finally:
+        tool.close()
+
+
+def test_exiftool_that_cannot_start(tmp_path):
+    script = tmp_path / "exiftool"
+    script.write_text("not executable")
+    script.chmod(0o644)
+    tool = ExifTool(str(script), timeout=1.0)
+    try:
+        assert call(tool.get, str(tmp_path / "a.jpg")) == {}
+        assert call(tool.get, str(tmp_path / "b.jpg")) == {}
+    finally:
+        tool.close()
+
+
+def test_unexpected_output(fake_exiftool, tmp_path):
+    tool = ExifTool(fake_exiftool, timeout=2.0)
+    try:
+        assert call(tool.get, str(tmp_path / "garbage.jpg")) == {}
+        assert call(tool.get, str(tmp_path / "ok.jpg"))["Make"] == "Canon"
+    finally:
+        tool.close()
+
@@ -0,0 +1,86 @@
+"""
+Move Engine never replaces a file that appeared after its name was reserved.
+"""
+
+import os
+import errno
+import threading
+from pathlib import Path
+
+import pytest
+
+from v2_core.system.mover import move_engine
+from v2_core.system.mover.move_engine import MoveEngine, SourceKept
+from v2_core.system.mover.name_registry import NameRegistry
+
+
+@pytest.fixture(params=["renameat2", "link"])
+def engine(request, monkeypatch):
+    if request.param == "link":
+        monkeypatch.setattr(move_engine, "_renameat2", None)
+    names = NameRegistry()
+    return names, MoveEngine(names=names)
+
+
+def test_target_created_after_listing(engine, tmp_path):
+    names, mover = engine
+    (tmp_path / "dst").mkdir()
+    for name in ("a.txt", "b.txt"):
+        (tmp_path / name).write_text("incoming")
+
+    mover.move(tmp_path / "a.txt", names.reserve_path(tmp_path / "dst" / "a.txt"))
+    # Someone else writes b.txt after the registry listed dst/
+    (tmp_path / "dst" / "b.txt").write_text("user file")
+    reserved = names.reserve_path(tmp_path / "dst" / "b.txt")
+
+    final = mover.move(tmp_path / "b.txt", reserved)
+    assert Path(final).name == "b__1.txt"
+    assert (tmp_path / "dst" / "b.txt").read_text() == "user file"
+    assert Path(final).read_text() == "incoming"
+    assert not (tmp_path / "b.txt").exists()
+
+
+def test_collision_without_registry_fails(tmp_path):
+    (tmp_path / "a.txt").write_text("incoming")
+    (tmp_path / "b.txt").write_text("user file")
+    with pytest.raises(FileExistsError):
+        MoveEngine().move(tmp_path / "a.txt", tmp_path / "b.txt")
+    assert (tmp_path / "b.txt").read_text() == "user file"
+
+
+def cross_device(mover, monkeypatch):
+    """Every destination looks like another filesystem: copy path."""
+    monkeypatch.setattr(mover, "dir_device", lambda directory: -1)
+    return mover
+
+
+def test_pool_copies_report_on_submitting_thread(tmp_path, monkeypatch):
+    mover = cross_device(MoveEngine(large_file=1), monkeypatch)
+    seen = []
+    for i in range(4):
+        (tmp_path / f"{i}.bin").write_bytes(b"x" * 100)
+        mover.submit(tmp_path / f"{i}.bin", tmp_path / f"{i}.out",
+                     lambda src, dst, error: seen.append((threading.current_thread(), error)))
+    mover.close()
+    assert len(seen) == 4
+    assert all(t is threading.main_thread() and e is None for t, e in seen)
+
+
+def test_source_kept_is_not_a_failure(tmp_path, monkeypatch):
+    mover = cross_device(MoveEngine(), monkeypatch)
+    src = tmp_path / "a.txt"
+    src.write_text("data")
+    real_unlink = os.unlink
+
+    def unlink(path, *args, **kwargs):
+        if os.fspath(path) == str(src):
+            raise PermissionError(errno.EACCES, "read-only source", str(src))
+        return real_unlink(path, *args, **kwargs)
+
+    monkeypatch.setattr(os, "unlink", unlink)
+    with pytest.raises(SourceKept) as info:
+        mover.move(src, tmp_path / "b.txt")
+    assert info.value.filename2 == str(tmp_path / "b.txt")
+    assert (tmp_path / "b.txt").read_text() == "data" and src.exists()
+    stats = mover.stats()
+    assert stats["copied"] == 1 and stats["kept"] == 1 and stats["failed"] == 0
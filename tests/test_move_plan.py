@@ -0,0 +1,99 @@
+"""
+Move plans: sort --plan / apply (stale sources skipped, names reserved at apply
+time) and plan-diff as a sort-merge join.
+"""
+
+import os
+import json
+from pathlib import Path
+
+import pytest
+
+from v2_core.engines.sorter.sort_engine import SortEngine
+from v2_core.system.plan import move_plan
+from v2_core.system.plan.move_plan import PlanWriter, diff_plans, read_plan, sorted_records
+
+
+def engine(**kw):
+    return SortEngine(workers=1, use_index=False, report=False, dedup=False, **kw)
+
+
+@pytest.fixture
+def inbox(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    root = tmp_path / "inbox"
+    for sub, text in (("a", "first"), ("b", "second"), ("c", "third")):
+        (root / sub).mkdir(parents=True)
+        (root / sub / ("note.txt" if sub != "c" else "stale.txt")).write_text(text)
+    return root
+
+
+def test_apply_skips_stale_sources_and_reserves_names_now(tmp_path, inbox):
+    plan = tmp_path / "out.plan"
+    engine(plan=plan).run(inbox)
+
+    _, records = read_plan(plan)
+    records = {Path(r["src"]).relative_to(inbox).as_posix(): r for r in records}
+    assert set(records) == {"a/note.txt", "b/note.txt", "c/stale.txt"}
+    target = Path(records["a/note.txt"]["dst"]).parent
+    # Routed destinations, not names reserved at plan time
+    assert {Path(r["dst"]).name for r in records.values()} == {"note.txt", "stale.txt"}
+    assert not target.exists()
+
+    # Meanwhile: the target folder gains a note.txt, one source changes
+    target.mkdir(parents=True)
+    (target / "note.txt").write_text("already sorted")
+    stale = inbox / "c" / "stale.txt"
+    stale.write_text("changed after the plan")
+    os.utime(stale, ns=(0, records["c/stale.txt"]["mtime_ns"] + 10**9))
+
+    engine(simulated=False, checkpoint=False).apply(plan)
+
+    assert (target / "note.txt").read_text() == "already sorted"
+    assert sorted((target / n).read_text() for n in ("note__1.txt", "note__2.txt")) == \
+        ["first", "second"]
+    assert stale.exists() and not (target / "stale.txt").exists()
+
+
+def write_plan(path, rows):
+    writer = PlanWriter(path, "run", path.parent)
+    for src, dst, rule, key in rows:
+        writer.add(src, dst, 1, 1, rule, "move", key=key)
+    writer.close()
+    return path
+
+
+@pytest.mark.parametrize("chunk", [2, move_plan.SORT_CHUNK])
+def test_diff_is_a_merge_join_on_src(tmp_path, chunk):
+    old = write_plan(tmp_path / "old.plan", [
+        ("/in/e", "/out/x/e", "r1", "k"),
+        ("/in/a", "/out/x/a", "r1", "k"),
+        ("/in/gone", "/out/x/gone", "r1", "k"),
+        ("/in/c", "/out/x/c", "r1", "k1"),
+        ("/in/d", "/out/x/d", "r2", "k"),
+    ])
+    new = write_plan(tmp_path / "new.plan", [
+        ("/in/d", "/out/y/d", "r3", "k"),
+        ("/in/c", "/out/x/c", "r1", "k2"),
+        ("/in/new", "/out/x/new", "r1", "k"),
+        ("/in/a", "/out/y/a", "r3", "k"),
+        ("/in/e", "/out/x/e", "r1", "k"),
+    ])
+
+    diff = diff_plans(old, new, chunk=chunk)
+    changes = diff["changes"]
+    assert (diff["old"], diff["new"], diff["unchanged"]) == (5, 5, 2)
+    assert [r["src"] for r in changes["added"]] == ["/in/new"]
+    assert [r["src"] for r in changes["removed"]] == ["/in/gone"]
+    assert [r["src"] for r in changes["content"]] == ["/in/c"]
+    assert [(a["src"], b["dst"]) for a, b in changes["moved"]] == \
+        [("/in/a", "/out/y/a"), ("/in/d", "/out/y/d")]
+    assert diff["by_rule"] == {("r1", "r3"): 1, ("r2", "r3"): 1}
+
+
+def test_sorted_records_spills_runs_and_keeps_the_last_per_src():
+    recs = [{"src": f"/in/{i % 7}", "n": i} for i in range(20)]
+    out = list(sorted_records(iter(recs), chunk=3))
+    assert [r["src"] for r in out] == sorted({r["src"] for r in recs})
+    assert [r["n"] for r in out] == [14, 15, 16, 17, 18, 19, 13]
+    assert json.loads(json.dumps(out)) == out
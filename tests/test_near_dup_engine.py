@@ -0,0 +1,61 @@
+"""
+Near-duplicate index: entries whose file is gone never match again.
+"""
+
+from pathlib import Path
+
+from v2_core.engines.dedup.near_dup_engine import NearDupIndex
+
+
+def test_dead_match_is_skipped_and_dropped(tmp_path):
+    kept = tmp_path / "kept.jpg"
+    kept.write_bytes(b"x")
+    index = NearDupIndex(threshold=6)
+    index.add(0xF0F0, str(tmp_path / "rolled_back.jpg"))
+    index.add(0xF0F1, str(kept))
+
+    # Closest entry (distance 0) no longer exists -> next live one
+    assert index.closest(0xF0F0) == (str(kept), 1)
+    assert len(index) == 1
+    kept.unlink()
+    assert index.closest(0xF0F0) is None
+    assert len(index) == 0
+
+
+def test_prune_and_save_compact(tmp_path):
+    index = NearDupIndex(threshold=6)
+    for i in range(10):
+        path = tmp_path / f"img{i}.jpg"
+        if i % 2:
+            path.write_bytes(b"x")
+        index.add(i << 20, str(path))
+
+    assert index.prune() == 5
+    base = tmp_path / "index"
+    index.save(base)
+    loaded = NearDupIndex.load(base)
+    assert len(loaded) == 5
+    assert all(ident.endswith(("1.jpg", "3.jpg", "5.jpg", "7.jpg", "9.jpg")) for ident in loaded.ids)
+
+
+def test_sorted_original_is_absolute_final_path(tmp_path, monkeypatch):
+    from v2_core.engines.sorter.sort_engine import SortEngine
+
+    monkeypatch.chdir(tmp_path)
+    eng = SortEngine(simulated=False, workers=1, use_index=False, report=False, dedup=False)
+    eng.near_dups = NearDupIndex(threshold=6)
+    src = tmp_path / "a.jpg"
+    src.write_bytes(b"jpeg")
+    eng.open_checkpoint(tmp_path)
+
+    # Relative target, taken by someone else before the held move starts
+    reserved = eng.safe_move(str(src), "out/a.jpg",
+                             {"outcome": "moved", "tags": {"phash": 0xF0F0}})
+    assert reserved == str(tmp_path / "out" / "a.jpg")
+    assert eng.near_dups.closest(0xF0F0, alive=eng.alive) == (reserved, 0)
+    Path(reserved).write_bytes(b"user file")
+    eng.close(completed=False)
+
+    final = str(tmp_path / "out" / "a__1.jpg")
+    assert Path(final).read_bytes() == b"jpeg"
+    assert eng.near_dups.closest(0xF0F0) == (final, 0)
@@ -0,0 +1,64 @@
+"""
+Run Profiler: histograms, merged pstats dump and Chrome trace of a sort run.
+"""
+
+import json
+import pstats
+import threading
+
+from v2_core.engines.sorter.sort_engine import SortEngine
+from v2_core.system.profiler.profiler import Histogram, Profiler
+
+
+def test_histogram_percentiles():
+    hist = Histogram()
+    for ms in range(1, 101):
+        hist.add(ms / 1000)
+    s = hist.summary()
+    assert s["count"] == 100 and s["max_ms"] == 100
+    # Bucket upper edges: at most ~9% above the exact value
+    for q, exact in ((50, 50), (95, 95), (99, 99)):
+        assert exact <= s[f"p{q}_ms"] <= exact * 1.1
+    assert Histogram().percentile(50) == 0.0
+
+
+def test_thread_profiles_and_trace_are_written(tmp_path):
+    prof = Profiler(pstats_path=tmp_path / "run.pstats", trace_path=tmp_path / "run.json")
+    prof.start()
+
+    def work():
+        with prof.span("classify"):
+            sum(range(1000))
+
+    t = threading.Thread(target=prof.profiled(work), name="classifier-0")
+    t.start()
+    t.join()
+    with prof.span("move"):
+        pass
+    assert prof.stop() == [tmp_path / "run.pstats", tmp_path / "run.json"]
+
+    stats = pstats.Stats(str(tmp_path / "run.pstats"))
+    assert any(func[2] == "work" for func in stats.stats)
+    trace = json.loads((tmp_path / "run.json").read_text())["traceEvents"]
+    spans = {e["name"]: e for e in trace if e["ph"] == "X"}
+    names = {e["args"]["name"] for e in trace if e["ph"] == "M"}
+    assert set(spans) == {"classify", "move"} and "classifier-0" in names
+    assert spans["classify"]["tid"] != spans["move"]["tid"]
+
+
+def test_profiled_run_reports_stages(tmp_path, capsys):
+    inbox = tmp_path / "inbox"
+    inbox.mkdir()
+    for i in range(5):
+        (inbox / f"note{i}.txt").write_text("x" * i)
+
+    eng = SortEngine(simulated=True, workers=2, use_index=False, report=False, dedup=False,
+                     checkpoint=False, profile=True, chrome_trace=tmp_path / "trace.json")
+    eng.run(inbox)
+
+    s = eng.profiler.summary()
+    assert s["files"] == 5 and s["bytes"] == sum(range(5))
+    assert {"walk", "stat", "rules", "template"} <= set(s["stages"])
+    assert s["stages"]["stat"]["count"] == 5
+    assert "[Profile] 5 files" in capsys.readouterr().out
+    assert (tmp_path / "trace.json").exists()
@@ -0,0 +1,85 @@
+"""
+Rollback restores through the Move Engine (cross-device, never overwriting).
+"""
+
+import os
+import tempfile
+from pathlib import Path
+
+import pytest
+
+from v2_core.engines.dedup.near_dup_engine import NearDupIndex
+from v2_core.system.mover.move_engine import MoveEngine
+from v2_core.system.rollback import rollback_engine
+from v2_core.system.rollback.rollback_engine import RollbackEngine
+
+
+@pytest.fixture
+def other_device(tmp_path):
+    """A directory on another filesystem than tmp_path (tmpfs)."""
+    base = "/dev/shm"
+    if not os.path.isdir(base) or os.stat(base).st_dev == os.stat(tmp_path).st_dev:
+        pytest.skip("no second filesystem")
+    with tempfile.TemporaryDirectory(dir=base) as d:
+        yield Path(d)
+
+
+@pytest.fixture
+def journal(tmp_path, monkeypatch):
+    monkeypatch.setattr(rollback_engine, "NearDupIndex", None)
+    return RollbackEngine(tmp_path / "rollback_log.jsonl")
+
+
+def test_rollback_cross_device_move(tmp_path, other_device, journal):
+    src = other_device / "inbox" / "clip.bin"
+    src.parent.mkdir()
+    src.write_bytes(os.urandom(4096))
+    data = src.read_bytes()
+    dst = tmp_path / "sorted" / "clip.bin"
+    dst.parent.mkdir()
+
+    final = MoveEngine().move(src, dst)
+    assert final == str(dst) and not src.exists()
+    journal.record(src, final)
+
+    report = journal.rollback(dry_run=False, workers=1)
+    assert report["restored"] == 1 and report["errors"] == 0
+    assert src.read_bytes() == data
+    assert not dst.exists()
+    # No temp files left next to the restored file
+    assert os.listdir(src.parent) == ["clip.bin"]
+
+
+def test_rollback_never_overwrites(tmp_path, journal):
+    before = tmp_path / "a.txt"
+    after = tmp_path / "sorted" / "a.txt"
+    after.parent.mkdir()
+    after.write_text("sorted")
+    before.write_text("new file at the old place")
+    journal.record(before, after)
+
+    report = journal.rollback(dry_run=False, workers=1)
+    assert report["conflicts"] == 1 and report["restored"] == 0
+    assert before.read_text() == "new file at the old place"
+    assert after.read_text() == "sorted"
+
+
+def test_rollback_forgets_only_restored_near_dups(tmp_path, monkeypatch, journal):
+    index = NearDupIndex(threshold=6)
+    monkeypatch.setattr(rollback_engine, "NearDupIndex", type(
+        "Saved", (), {"load": staticmethod(lambda: index)}))
+    monkeypatch.setattr(index, "save", lambda: None)
+
+    before = tmp_path / "a.jpg"
+    after = tmp_path / "sorted" / "a.jpg"
+    after.parent.mkdir()
+    after.write_bytes(b"a")
+    journal.record(before, after)
+    index.add(0xF0F0, str(after))
+    # Not part of this rollback, even though its file is gone
+    index.add(0x0F0F, str(tmp_path / "sorted" / "moved_by_user.jpg"))
+
+    report = journal.rollback(dry_run=False, workers=1)
+    assert report["vacated"] == [str(after)]
+    assert index.closest(0xF0F0, alive=lambda p: True) is None
+    assert index.closest(0x0F0F, alive=lambda p: True) is not None
@@ -0,0 +1,74 @@
+"""
+Compiled rule index against the ordered interpreter (evaluate_interpreted).
+"""
+
+import random
+
+import pytest
+
+from v2_core.system.rules.rule_engine import RuleEngine
+
+WORDS = ["", "age", "AGE", "exam", "unisa", "soc", "page", "2024", "ass1", "Exam Paper"]
+TEXTS = ["", "age_2024.pdf", "page.pdf", "Exam Paper 1.pdf", "SOC 101", "unisa/ass1",
+         "/backup/photos/img.jpg", "/Studies/UNISA/notes.txt", "classes.doc"]
+FOUND = ["age", "EXAM", "", 2024, None, 1.5, "soc", "unisa"]
+
+
+def engine(rules):
+    eng = RuleEngine(config_path="tests/no_rules.json")
+    eng.rules = rules
+    return eng
+
+
+def random_rule(rng, i):
+    rule = {"target": f"Sorted/{i}"}
+    if rng.random() < 0.3:
+        rule["type"] = rng.choice(["image", "document", "video"])
+    if rng.random() < 0.3:
+        rule["ext"] = rng.sample([".jpg", ".pdf", ".txt", ".JPG"], rng.randint(0, 2))
+    if rng.random() < 0.2:
+        rule["camera"] = rng.choice(["Canon EOS 80D", None])
+    if rng.random() < 0.2:
+        rule["faces"] = rng.sample(["alice", "bob"], rng.randint(1, 2))
+    for key in ("keywords", "content_keywords", "path_keywords"):
+        if rng.random() < 0.4:
+            rule[key] = rng.sample(WORDS, rng.randint(0, 3))
+    return rule
+
+
+def random_tags(rng):
+    tags = {"type": rng.choice(["image", "document", "video"]),
+            "ext": rng.choice([".jpg", ".pdf", ".txt", ".JPG"])}
+    if rng.random() < 0.5:
+        tags["camera"] = rng.choice(["Canon EOS 80D", "Pixel 7"])
+    if rng.random() < 0.5:
+        tags["faces"] = rng.sample(["alice", "bob", "carol"], rng.randint(0, 2))
+    if rng.random() < 0.6:
+        tags["keywords"] = rng.sample(FOUND, rng.randint(0, 3))
+    return tags
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_compiled_matches_interpreted(seed):
+    rng = random.Random(seed)
+    eng = engine([random_rule(rng, i) for i in range(rng.randint(1, 12))])
+    for _ in range(200):
+        tags = random_tags(rng)
+        name, path = rng.choice(TEXTS), rng.choice(TEXTS)
+        assert eng.evaluate(tags, name, path) == eng.evaluate_interpreted(tags, name, path), \
+            (eng.rules, tags, name, path)
+
+
+def test_empty_keyword_matches_everything():
+    eng = engine([{"keywords": [""], "target": "Any"},
+                  {"path_keywords": [""], "target": "AnyPath"}])
+    assert eng.evaluate({"type": "image", "ext": ".jpg"}, "", "") == "Any"
+    eng.rules = eng.rules[1:]
+    assert eng.evaluate({"type": "image", "ext": ".jpg"}, "x.jpg", "") == "AnyPath"
+
+
+def test_non_str_content_keywords_compare_as_str():
+    eng = engine([{"content_keywords": ["2024"], "target": "Year"},
+                  {"keywords": ["none"], "target": "None"}])
+    assert eng.evaluate({"ext": ".pdf", "keywords": [2024]}) == "Year"
+    assert eng.evaluate({"ext": ".pdf", "keywords": [None]}) == "None"
@@ -0,0 +1,24 @@
+"""
+Sort Engine: registry modules are looked up on first use, not at import.
+"""
+
+import sys
+import subprocess
+
+PROBE = """
+import sys
+import v2_core.engines.sorter.sort_engine as se
+lazy = ("rule_engine", "rollback_engine", "faces_engine", "watcher", "profiler", "checkpoint")
+print(sorted(m.rsplit(".", 1)[1] for m in sys.modules if m.rsplit(".", 1)[-1] in lazy))
+se.resolve_engines()
+print(se.RuleEngine.__name__, "watcher.watcher" in " ".join(sys.modules))
+print(se.checkpoint_mod.__name__, se.metadata_mod.__name__)
+"""
+
+
+def test_import_loads_no_registry_modules(root):
+    out = subprocess.run([sys.executable, "-c", PROBE], cwd=root, capture_output=True,
+                         text=True, check=True).stdout.splitlines()
+    out = [line for line in out if not line.startswith("[AutoMount]")]
+    assert out == ["[]", "RuleEngine False",
+                   "v2_core.system.checkpoint.checkpoint v2_core.system.metadata.metadata_service"]
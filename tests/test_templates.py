@@ -0,0 +1,44 @@
+"""
+Template validation knows every tag the classifier emits.
+"""
+
+
+import pytest
+
+Image = pytest.importorskip("PIL.Image")
+
+from v2_core.engines.sorter.sort_engine import SortEngine
+from v2_core.system.metadata import exif_reader, metadata_service
+from v2_core.system.rules.templates import KNOWN_TAGS, validate_template
+
+
+def test_producers_declare_their_tags(tmp_path):
+    path = tmp_path / "photo.jpg"
+    exif = Image.Exif()
+    exif[0x0110] = "Canon EOS 80D"
+    exif[0x0112] = 6
+    exif.get_ifd(0x8769)[0x9003] = "2020:01:02 03:04:05"
+    gps = exif.get_ifd(0x8825)
+    gps[1], gps[2], gps[3], gps[4] = "N", (1.0, 0.0, 0.0), "E", (2.0, 0.0, 0.0)
+    Image.new("RGB", (8, 8)).save(path, "JPEG", exif=exif.tobytes())
+
+    assert set(exif_reader.exif_tags(path)) == set(exif_reader.TAGS)
+    service = metadata_service.sorter_tags({"Model": "X"}, {"duration": "1.5", "v_codec": "h264"})
+    assert set(service) == set(metadata_service.TAGS)
+
+    eng = SortEngine(simulated=True, workers=1, use_index=False, report=False, dedup=False)
+    try:
+        tags = eng.classify(path)
+    finally:
+        eng.close(completed=False)
+    assert "orientation" in tags and set(tags) <= KNOWN_TAGS
+
+
+@pytest.mark.parametrize("tag", ["orientation", "gps", "duration", "v_codec",
+                                 "keywords", "phash", "faces", "person"])
+def test_emitted_tags_validate(tag):
+    assert validate_template(f"Sorted/{{{tag}}}/{{year}}") == []
+
+
+def test_unknown_tag_is_reported():
+    assert validate_template("Sorted/{lens}/{year}") == ["lens"]
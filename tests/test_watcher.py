@@ -0,0 +1,91 @@
+"""
+Inbox Watcher: debounce / settle, partial files, inotify and polling backends.
+"""
+
+import os
+import time
+
+import pytest
+
+from v2_core.system.watcher.watcher import Settler, Watcher, wanted
+
+
+def collect(watcher, expected, timeout=10.0):
+    """Batches until every expected path came out (or timeout)."""
+    deadline = time.monotonic() + timeout
+    seen = []
+    for batch in watcher.batches(stop=lambda: time.monotonic() > deadline or
+                                 set(expected) <= set(seen)):
+        seen.extend(str(p) for p in batch)
+    return seen
+
+
+def test_settle_waits_for_unchanged_size_and_mtime(tmp_path):
+    path = tmp_path / "clip.mp4"
+    path.write_bytes(b"a")
+    settler = Settler(settle=2.0)
+    settler.touch(str(path))
+
+    assert settler.poll(now=0.0) == []
+    assert settler.poll(now=1.0) == []
+    # Still growing: the clock restarts
+    path.write_bytes(b"ab")
+    assert settler.poll(now=1.5) == []
+    assert settler.poll(now=3.0) == []
+    assert settler.poll(now=3.5) == [str(path)]
+    assert len(settler) == 0
+
+
+def test_done_is_ready_at_once_and_gone_files_drop(tmp_path):
+    done, gone = tmp_path / "a.jpg", tmp_path / "b.jpg"
+    done.write_bytes(b"a")
+    gone.write_bytes(b"b")
+    settler = Settler(settle=60.0)
+    settler.touch(str(done))
+    settler.touch(str(gone))
+    settler.done(str(done))
+    gone.unlink()
+
+    assert settler.poll(now=0.0) == [str(done)]
+    # A write after close does not re-queue a path that is already ready
+    settler.done(str(done))
+    settler.touch(str(done))
+    assert settler.poll(now=0.0) == [str(done)]
+    assert len(settler) == 0
+
+
+def test_partial_and_hidden_files_are_ignored():
+    assert wanted("photo.jpg")
+    assert not wanted("photo.jpg.part")
+    assert not wanted("movie.mp4.crdownload")
+    assert not wanted(".photo.jpg")
+
+
+@pytest.mark.parametrize("poll", [False, True])
+def test_watcher_yields_finished_files(tmp_path, poll):
+    inbox, sorted_dir = tmp_path / "inbox", tmp_path / "inbox" / "Sorted"
+    sorted_dir.mkdir(parents=True)
+    old = inbox / "old.jpg"
+    old.write_bytes(b"old")
+
+    with Watcher([inbox], skip=[sorted_dir], settle=0.2, poll=poll, interval=0.05) as watcher:
+        if not poll and watcher.mode != "inotify":
+            pytest.skip("no inotify")
+        time.sleep(0.05)
+        new = inbox / "sub" / "new.jpg"
+        new.parent.mkdir()
+        new.write_bytes(b"new")
+        (inbox / "new.jpg.part").write_bytes(b"partial")
+        (sorted_dir / "placed.jpg").write_bytes(b"sorted")
+
+        seen = collect(watcher, [str(new)])
+
+    assert seen == [str(new)]
+    assert str(old) not in seen
+
+
+def test_watcher_existing_queues_files_already_there(tmp_path):
+    old = tmp_path / "old.jpg"
+    old.write_bytes(b"old")
+    with Watcher([tmp_path], settle=0.1, poll=True, interval=0.05, existing=True) as watcher:
+        assert collect(watcher, [str(old)]) == [str(old)]
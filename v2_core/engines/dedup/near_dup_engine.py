@@ -0,0 +1,251 @@
+"""
+InteliOmniSorter - Near-Duplicate Engine
+
+Perceptual-hash duplicate detection:
+- 64-bit image hashes stored as integers in a compact array('Q')
+- Hamming distance <= k queries via multi-index hashing: the hash is cut
+  into k+1 blocks, a match within k bits must agree exactly on at least
+  one block, so only those buckets are verified (pigeonhole)
+- configurable threshold, batch queries
+- index persisted between runs (v2_core/temp/near_dup_index.*)
+- entries are absolute destination paths: a match whose file is gone
+  (deleted / moved by the user) is skipped and dropped, prune() drops all
+  of them at once; rollback removes the paths it restored
+
+Hashing needs Pillow + imagehash (optional, engine is a no-op without them).
+"""
+
+REGISTER = {
+    "name": "near_dup_engine",
+    "type": "engine"
+}
+
+import os
+import threading
+from array import array
+from pathlib import Path
+
+try:
+    from PIL import Image
+    import imagehash
+except Exception:
+    Image = None
+    imagehash = None
+
+ROOT = Path(__file__).resolve().parents[3]
+
+DEFAULT_INDEX = ROOT / "v2_core" / "temp" / "near_dup_index"
+DEFAULT_THRESHOLD = 6
+HASH_BITS = 64
+
+IMAGE_EXT = {".jpg", ".jpeg", ".png", ".gif", ".heic", ".webp", ".tif", ".tiff", ".bmp"}
+
+
+# --------------------------------------------------------
+# Hashing
+# --------------------------------------------------------
+def image_hash(path):
+    """64-bit difference hash as int, or None (not an image / no Pillow)."""
+    if imagehash is None:
+        return None
+    try:
+        with Image.open(path) as img:
+            h = imagehash.dhash(img, hash_size=8)
+        return int(str(h), 16)
+    except Exception:
+        return None
+
+
+def hamming(a, b):
+    return (a ^ b).bit_count()
+
+
+def block_layout(blocks, bits=HASH_BITS):
+    """[(shift, mask)] cutting `bits` into `blocks` near-equal pieces."""
+    layout = []
+    base, extra = divmod(bits, blocks)
+    shift = 0
+    for i in range(blocks):
+        width = base + (1 if i < extra else 0)
+        layout.append((shift, (1 << width) - 1))
+        shift += width
+    return layout
+
+
+class NearDupIndex:
+    """Multi-index hash table over 64-bit perceptual hashes."""
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD):
+        self.threshold = threshold
+        self.layout = block_layout(threshold + 1)
+        self.hashes = array("Q")
+        self.ids = []
+        self.positions = {}     # ident -> [slot]; dropped slots keep ids[i] = None
+        self.dropped = 0
+        self.tables = [dict() for _ in self.layout]
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.hashes) - self.dropped
+
+    # --------------------------------------------------------
+    # Insert / query
+    # --------------------------------------------------------
+    def _insert(self, h, ident):
+        i = len(self.hashes)
+        self.hashes.append(h)
+        self.ids.append(ident)
+        self.positions.setdefault(ident, []).append(i)
+        for table, (shift, mask) in zip(self.tables, self.layout):
+            key = (h >> shift) & mask
+            bucket = table.get(key)
+            if bucket is None:
+                table[key] = array("I", (i,))
+            else:
+                bucket.append(i)
+        return i
+
+    def add(self, h, ident):
+        with self.lock:
+            return self._insert(h, ident)
+
+    def _remove(self, ident):
+        # Slots stay in the bucket tables, queries skip them; save() compacts
+        for i in self.positions.pop(ident, ()):
+            self.ids[i] = None
+            self.dropped += 1
+
+    def remove(self, ident):
+        with self.lock:
+            self._remove(ident)
+
+    def rename(self, ident, new_ident):
+        """Same file under a new path (e.g. re-suffixed by the mover)."""
+        with self.lock:
+            slots = self.positions.pop(ident, None)
+            if slots:
+                for i in slots:
+                    self.ids[i] = new_ident
+                self.positions.setdefault(new_ident, []).extend(slots)
+
+    def _query(self, h, k):
+        ids = self.ids
+        if k > self.threshold:
+            # Index built for a smaller radius -> linear scan
+            return [(ids[i], d) for i, x in enumerate(self.hashes)
+                    if ids[i] is not None and (d := hamming(h, x)) <= k]
+
+        seen = set()
+        found = []
+        hashes = self.hashes
+        for table, (shift, mask) in zip(self.tables, self.layout):
+            bucket = table.get((h >> shift) & mask)
+            if not bucket:
+                continue
+            for i in bucket:
+                if i in seen:
+                    continue
+                seen.add(i)
+                d = (h ^ hashes[i]).bit_count()
+                if d <= k and ids[i] is not None:
+                    found.append((ids[i], d))
+
+        found.sort(key=lambda item: item[1])
+        return found
+
+    def query(self, h, k=None):
+        """[(ident, distance)] for every stored hash within k bits, closest first."""
+        with self.lock:
+            return self._query(h, self.threshold if k is None else k)
+
+    def query_batch(self, hashes, k=None):
+        k = self.threshold if k is None else k
+        with self.lock:
+            return [self._query(h, k) for h in hashes]
+
+    def closest(self, h, k=None, alive=os.path.exists):
+        """(ident, distance) of the closest match still alive, None; dead matches are dropped."""
+        with self.lock:
+            for ident, d in self._query(h, self.threshold if k is None else k):
+                if alive(ident):
+                    return ident, d
+                self._remove(ident)
+            return None
+
+    def prune(self, alive=os.path.exists):
+        """Drop every entry whose file is gone; returns how many."""
+        with self.lock:
+            dead = [ident for ident in self.positions if not alive(ident)]
+            for ident in dead:
+                self._remove(ident)
+            return len(dead)
+
+    def find_or_add(self, h, ident, k=None):
+        """Closest near-duplicate ident, or None after storing h under ident."""
+        with self.lock:
+            found = self._query(h, self.threshold if k is None else k)
+            if found:
+                return found[0][0]
+            self._insert(h, ident)
+            return None
+
+    # --------------------------------------------------------
+    # Persistence
+    # --------------------------------------------------------
+    def save(self, base=DEFAULT_INDEX):
+        base = Path(base)
+        base.parent.mkdir(parents=True, exist_ok=True)
+        with self.lock:
+            tmp_h = base.with_suffix(".hashes.tmp")
+            tmp_i = base.with_suffix(".ids.tmp")
+            live = [i for i, ident in enumerate(self.ids) if ident is not None]
+            hashes = self.hashes if len(live) == len(self.ids) else array(
+                "Q", (self.hashes[i] for i in live))
+            with open(tmp_h, "wb") as f:
+                hashes.tofile(f)
+            with open(tmp_i, "w", encoding="utf-8") as f:
+                for i in live:
+                    f.write(str(self.ids[i]).replace("\n", " ") + "\n")
+            os.replace(tmp_h, base.with_suffix(".hashes"))
+            os.replace(tmp_i, base.with_suffix(".ids"))
+
+    @classmethod
+    def load(cls, base=DEFAULT_INDEX, threshold=DEFAULT_THRESHOLD):
+        index = cls(threshold)
+        base = Path(base)
+        hpath, ipath = base.with_suffix(".hashes"), base.with_suffix(".ids")
+        if not (hpath.exists() and ipath.exists()):
+            return index
+
+        hashes = array("Q")
+        with open(hpath, "rb") as f:
+            hashes.frombytes(f.read())
+        with open(ipath, "r", encoding="utf-8") as f:
+            ids = [line.rstrip("\n") for line in f]
+
+        if len(ids) != len(hashes):
+            print("[NearDup] Index files out of sync, starting empty.")
+            return index
+
+        for h, ident in zip(hashes, ids):
+            index._insert(h, ident)
+        return index
+
+
+if __name__ == "__main__":
+    import random
+    import time
+
+    rng = random.Random(7)
+    index = NearDupIndex()
+    n = 200_000
+    start = time.perf_counter()
+    for i in range(n):
+        index.add(rng.getrandbits(64), f"img_{i}")
+    print(f"NearDup: inserted {n} hashes in {time.perf_counter() - start:.2f}s")
+
+    probes = [index.hashes[rng.randrange(n)] ^ (1 << rng.randrange(64)) for _ in range(1000)]
+    start = time.perf_counter()
+    results = index.query_batch(probes)
+    print(f"NearDup: 1000 queries in {time.perf_counter() - start:.3f}s, "
+          f"{sum(1 for r in results if r)} matched")
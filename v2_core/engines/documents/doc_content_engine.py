@@ -0,0 +1,222 @@
+"""
+InteliOmniSorter - Document Content Engine
+
+PDF text for content-based classification:
+- extraction runs in a process pool, one PDF per task: a caller blocks on
+  its file, so the pool only keeps as many cores busy as there are
+  `producers` (classifier workers, set by the sort pipeline) and is sized
+  to match
+- per-file limits in the workers: wall-clock timeout (SIGALRM timer) and
+  address-space cap (RLIMIT_AS), POSIX only
+- page by page, stops at the first page with a keyword hit (one
+  Aho–Corasick pass per page, however long the keyword list)
+- results (snippet + matched keywords) cached in the Metadata Index by
+  content hash, so copies and re-runs are never parsed again
+- a crashed worker only fails its own file, the pool is rebuilt
+
+Needs PyPDF2 (or pypdf); AVAILABLE is False without it.
+"""
+
+REGISTER = {
+    "name": "doc_content_engine",
+    "type": "engine"
+}
+
+import os
+import sys
+import signal
+import hashlib
+import threading
+from pathlib import Path
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Windows: no SIGALRM timer, no RLIMIT_AS -> workers run unlimited
+TIMER = hasattr(signal, "setitimer")
+
+try:
+    from PyPDF2 import PdfReader
+except ImportError:
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        PdfReader = None
+
+try:
+    from v2_core.engines.dedup.exact_dup_engine import full_digest
+    from v2_core.system.rules.keywords import KeywordMatcher, STUDY_KEYWORDS, WHOLE_WORD_MAX
+except ImportError:
+    from engines.dedup.exact_dup_engine import full_digest
+    from system.rules.keywords import KeywordMatcher, STUDY_KEYWORDS, WHOLE_WORD_MAX
+
+AVAILABLE = PdfReader is not None
+
+ROOT = Path(__file__).resolve().parents[3]
+
+DOC_EXT = {".pdf"}
+
+MAX_PAGES = 3
+TIMEOUT = 10.0
+MEMORY_MB = 1024
+SNIPPET_CHARS = 2000
+
+
+class ExtractTimeout(Exception):
+    pass
+
+
+# --------------------------------------------------------
+# Worker side
+# --------------------------------------------------------
+def _on_alarm(signum, frame):
+    raise ExtractTimeout()
+
+
+def _init_worker(root, memory_mb):
+    if root not in sys.path:
+        sys.path.insert(0, root)
+    if resource is not None and memory_mb:
+        limit = memory_mb * 1024 * 1024
+        _, hard = resource.getrlimit(resource.RLIMIT_AS)
+        if hard != resource.RLIM_INFINITY:
+            limit = min(limit, hard)
+        resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+    if TIMER:
+        signal.signal(signal.SIGALRM, _on_alarm)
+    # Ctrl-C (watch mode) is handled by the parent, which shuts the pool down
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+@lru_cache(maxsize=8)
+def keyword_matcher(keywords):
+    # Built once per worker process and keyword set
+    return KeywordMatcher([("doc", keywords)])
+
+
+def extract_text(path, keywords, max_pages=MAX_PAGES, timeout=TIMEOUT,
+                 snippet_chars=SNIPPET_CHARS):
+    """Worker entry: {"snippet", "keywords", "pages", "status"}."""
+    matcher = keyword_matcher(tuple(keywords))
+    chunks, found, pages, status = [], [], 0, "ok"
+    if TIMER:
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        reader = PdfReader(path)
+        for page in reader.pages[:max_pages]:
+            text = (page.extract_text() or "").lower()
+            pages += 1
+            chunks.append(text)
+            found = matcher.find(text)
+            if found:
+                break
+    except ExtractTimeout:
+        status = "timeout"
+    except MemoryError:
+        status = "memory"
+    except Exception:
+        status = "error"
+    finally:
+        if TIMER:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+    return {
+        "snippet": " ".join(chunks)[:snippet_chars],
+        "keywords": found,
+        "pages": pages,
+        "status": status,
+    }
+
+
+# --------------------------------------------------------
+# Engine
+# --------------------------------------------------------
+class DocContentEngine:
+    engine_name = "doc_content_engine"
+
+    def __init__(self, keywords=STUDY_KEYWORDS, index=None, workers=None, max_pages=MAX_PAGES,
+                 timeout=TIMEOUT, memory_mb=MEMORY_MB):
+        self.keywords = [k.lower() for k in keywords]
+        self.index = index
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pages = max_pages
+        self.timeout = timeout
+        self.memory_mb = memory_mb
+
+        # Early exit depends on the keyword list (and how it matches) -> part of the cache key
+        self.signature = hashlib.blake2b(
+            "\n".join([str(max_pages), f"w{WHOLE_WORD_MAX}", *self.keywords]).encode("utf-8"),
+            digest_size=4
+        ).hexdigest()
+
+        self.pool = None
+        self.lock = threading.Lock()
+        # Threads that call scan() concurrently (set by the sort pipeline), None = unknown
+        self.producers = None
+        self.counters = {"files": 0, "cached": 0, "extracted": 0, "timeout": 0,
+                         "memory": 0, "error": 0, "crashed": 0}
+
+    def count(self, key):
+        with self.lock:
+            self.counters[key] += 1
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counters)
+
+    def _pool(self):
+        with self.lock:
+            if self.pool is None:
+                # More processes than concurrent callers would never get work
+                self.pool = ProcessPoolExecutor(
+                    min(self.workers, self.producers or self.workers),
+                    initializer=_init_worker,
+                    initargs=(str(ROOT), self.memory_mb),
+                )
+            return self.pool
+
+    def _reset(self, broken):
+        with self.lock:
+            if self.pool is broken:
+                self.pool = None
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def extract(self, path):
+        pool = self._pool()
+        try:
+            future = pool.submit(extract_text, str(path), self.keywords, self.max_pages,
+                                 self.timeout)
+            return future.result()
+        except BrokenProcessPool:
+            # Worker killed (segfault, OOM killer) -> fresh pool for the next file
+            self._reset(pool)
+            return {"snippet": "", "keywords": [], "pages": 0, "status": "crashed"}
+
+    def scan(self, path):
+        """Cached text scan of one document."""
+        self.count("files")
+        key = f"{full_digest(path).hex()}:{self.signature}"
+        if self.index:
+            cached = self.index.get_text(key)
+            if cached is not None:
+                self.count("cached")
+                return cached
+
+        result = self.extract(path)
+        self.count("extracted" if result["status"] == "ok" else result["status"])
+        # Crashes are not cached: might be transient
+        if self.index and result["status"] != "crashed":
+            self.index.put_text(key, result["snippet"], result["keywords"],
+                                result["pages"], result["status"])
+        return result
+
+    def close(self):
+        with self.lock:
+            pool, self.pool = self.pool, None
+        if pool:
+            pool.shutdown(wait=True)
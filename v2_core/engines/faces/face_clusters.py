@@ -0,0 +1,485 @@
+"""
+InteliOmniSorter - Face Clusters
+
+Incremental clustering of face embeddings (clusters = rows of `persons`):
+- new faces join the nearest cluster centroid within `tolerance`, found
+  through an inverted-file ANN index (coarse k-means lists, nprobe lists
+  searched), otherwise they start a new cluster
+- running-mean centroids, no full recompute per batch
+- periodic re-clustering in a background thread: exact centroids from the
+  embedding store, near-identical clusters merged (the older id survives,
+  the merged id is kept as an alias), ANN index rebuilt
+- cluster ids surface as `faces` tags (person name or person_<id>)
+
+Needs numpy.
+"""
+
+REGISTER = {
+    "name": "face_clusters",
+    "type": "engine"
+}
+
+import math
+import sqlite3
+import threading
+from pathlib import Path
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+ROOT = Path(__file__).resolve().parents[3]
+
+
+try:
+    from v2_core.system.index.metadata_index import DEFAULT_DB
+except ImportError:
+    DEFAULT_DB = ROOT / "v2_core" / "temp" / "smartbrain.db"
+
+DIM = 128
+TOLERANCE = 0.6
+MERGE_TOLERANCE = 0.35
+REBUILD_EVERY = 5000
+NPROBE = 8
+BRUTE_FORCE = 4096
+CHUNK = 4096
+
+PERSONS_TABLE = """
+CREATE TABLE IF NOT EXISTS persons (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT,
+    notes TEXT
+)
+"""
+
+PERSON_COLUMNS = {
+    "embedding": "BLOB",
+    "face_count": "INTEGER",
+    "merged_into": "INTEGER",
+}
+
+
+def sqdist(a, b):
+    """Squared euclidean distances, (len(a), len(b))."""
+    d = (a * a).sum(1)[:, None] + (b * b).sum(1)[None, :] - 2.0 * (a @ b.T)
+    return np.maximum(d, 0.0, out=d)
+
+
+def nearest_rows(queries, vectors):
+    rows = np.empty(len(queries), dtype=np.int64)
+    for start in range(0, len(queries), CHUNK):
+        rows[start:start + CHUNK] = sqdist(queries[start:start + CHUNK], vectors).argmin(1)
+    return rows
+
+
+def kmeans(vectors, k, iters=6, sample=20000, seed=7):
+    rng = np.random.default_rng(seed)
+    if len(vectors) > sample:
+        vectors = vectors[rng.choice(len(vectors), sample, replace=False)]
+    centers = vectors[rng.choice(len(vectors), k, replace=False)].copy()
+    for _ in range(iters):
+        assign = nearest_rows(vectors, centers)
+        sums = np.zeros_like(centers)
+        np.add.at(sums, assign, vectors)
+        counts = np.bincount(assign, minlength=k)
+        filled = counts > 0
+        centers[filled] = sums[filled] / counts[filled, None]
+    return centers
+
+
+# --------------------------------------------------------
+# ANN index
+# --------------------------------------------------------
+class IVFIndex:
+    """Inverted file over row numbers; below BRUTE_FORCE rows callers scan everything."""
+
+    def __init__(self, nprobe=NPROBE):
+        self.nprobe = nprobe
+        self.coarse = None
+        self.lists = []
+        self.arrays = []
+
+    def build(self, vectors):
+        self.coarse = None
+        self.lists = []
+        self.arrays = []
+        if len(vectors) < BRUTE_FORCE:
+            return
+        nlist = int(math.sqrt(len(vectors)))
+        self.coarse = kmeans(vectors, nlist)
+        assign = nearest_rows(vectors, self.coarse)
+        self.lists = [[] for _ in range(nlist)]
+        for row, lst in enumerate(assign.tolist()):
+            self.lists[lst].append(row)
+        self.arrays = [None] * nlist
+
+    def add(self, row, vector):
+        if self.coarse is not None:
+            j = int(sqdist(vector[None, :], self.coarse).argmin())
+            self.lists[j].append(row)
+            self.arrays[j] = None
+
+    def members(self, j):
+        if self.arrays[j] is None:
+            self.arrays[j] = np.array(self.lists[j], dtype=np.int64)
+        return self.arrays[j]
+
+    def search(self, queries, vectors, exclude=None):
+        """
+        (row, squared distance) of the nearest vector per query among the
+        nprobe closest lists. One matrix product per list, not per query.
+        exclude: row per query to skip (the query itself).
+        """
+        rows = np.full(len(queries), -1, dtype=np.int64)
+        best = np.full(len(queries), np.inf, dtype=np.float32)
+        probe = min(self.nprobe, len(self.coarse))
+        nearest = np.argpartition(sqdist(queries, self.coarse), probe - 1, axis=1)[:, :probe]
+
+        flat = nearest.ravel()
+        order = np.argsort(flat, kind="stable")
+        lists, starts = np.unique(flat[order], return_index=True)
+        owners = order // probe
+        for j, group in zip(lists, np.split(owners, starts[1:])):
+            members = self.members(int(j))
+            if not len(members):
+                continue
+            d = sqdist(queries[group], vectors[members])
+            if exclude is not None:
+                d[members[None, :] == exclude[group][:, None]] = np.inf
+            k = d.argmin(1)
+            dk = d[np.arange(len(group)), k]
+            better = dk < best[group]
+            best[group[better]] = dk[better]
+            rows[group[better]] = members[k[better]]
+        return rows, best
+
+
+# --------------------------------------------------------
+# Clusters
+# --------------------------------------------------------
+class FaceClusters:
+    engine_name = "face_clusters"
+
+    def __init__(self, db_path=DEFAULT_DB, tolerance=TOLERANCE, merge_tolerance=MERGE_TOLERANCE,
+                 rebuild_every=REBUILD_EVERY, nprobe=NPROBE):
+        db_path = Path(db_path)
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.tolerance = tolerance
+        self.merge_tolerance = merge_tolerance
+        self.rebuild_every = rebuild_every
+
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.migrate()
+
+        self.ids = []
+        self.row_of = {}
+        self.names = {}
+        self.aliases = {}
+        self.centroids = np.empty((0, DIM), dtype=np.float32)
+        self.counts = np.empty(0, dtype=np.int64)
+        self.size = 0
+        self.dirty = set()
+        self.merged = {}
+        self.ivf = IVFIndex(nprobe)
+        self.added = 0
+        self.worker = None
+        self.load()
+
+    def __len__(self):
+        return self.size
+
+    # --------------------------------------------------------
+    # Persistence (persons table)
+    # --------------------------------------------------------
+    def migrate(self):
+        self.conn.execute(PERSONS_TABLE)
+        existing = {row[1] for row in self.conn.execute("PRAGMA table_info(persons)")}
+        for col, kind in PERSON_COLUMNS.items():
+            if col not in existing:
+                self.conn.execute(f"ALTER TABLE persons ADD COLUMN {col} {kind}")
+        self.conn.commit()
+
+    def load(self):
+        rows = self.conn.execute(
+            "SELECT id, name, embedding, face_count, merged_into FROM persons "
+            "WHERE embedding IS NOT NULL ORDER BY id"
+        ).fetchall()
+        active = [r for r in rows if r[4] is None]
+        self.aliases = {r[0]: r[4] for r in rows if r[4] is not None}
+        self.names = {r[0]: r[1] for r in rows if r[1]}
+        self.ids = [r[0] for r in active]
+        self.row_of = {pid: i for i, pid in enumerate(self.ids)}
+        self.size = len(active)
+        if active:
+            self.centroids = np.stack([np.frombuffer(r[2], dtype=np.float32) for r in active])
+            self.counts = np.array([r[3] or 1 for r in active], dtype=np.int64)
+        self.ivf.build(self.centroids[:self.size])
+
+    def flush(self):
+        with self.lock:
+            self.conn.executemany(
+                "UPDATE persons SET embedding=?, face_count=? WHERE id=?",
+                [(self.centroids[j].tobytes(), int(self.counts[j]), self.ids[j])
+                 for j in self.dirty if j < self.size],
+            )
+            self.conn.executemany(
+                "UPDATE persons SET merged_into=? WHERE id=?",
+                [(target, pid) for pid, target in self.merged.items()],
+            )
+            self.conn.commit()
+            self.dirty.clear()
+            self.merged.clear()
+
+    def close(self):
+        if self.worker:
+            self.worker.join()
+        self.flush()
+        self.conn.close()
+
+    # --------------------------------------------------------
+    # Labels
+    # --------------------------------------------------------
+    def resolve(self, person_id):
+        while person_id in self.aliases:
+            person_id = self.aliases[person_id]
+        return person_id
+
+    def label(self, person_id):
+        person_id = self.resolve(person_id)
+        return self.names.get(person_id) or f"person_{person_id}"
+
+    # --------------------------------------------------------
+    # Assignment
+    # --------------------------------------------------------
+    def _grow(self, extra):
+        if self.size + extra <= len(self.centroids):
+            return
+        capacity = max(1024, 2 * (self.size + extra))
+        grown = np.empty((capacity, DIM), dtype=np.float32)
+        grown[:self.size] = self.centroids[:self.size]
+        self.centroids = grown
+        counts = np.zeros(capacity, dtype=np.int64)
+        counts[:self.size] = self.counts[:self.size]
+        self.counts = counts
+
+    def _new_cluster(self, encoding):
+        cur = self.conn.execute(
+            "INSERT INTO persons(name, notes, embedding, face_count) VALUES(NULL, ?, ?, 0)",
+            ("auto: face cluster", encoding.astype(np.float32).tobytes()),
+        )
+        self._grow(1)
+        row = self.size
+        self.centroids[row] = encoding
+        self.counts[row] = 0
+        self.ids.append(cur.lastrowid)
+        self.row_of[cur.lastrowid] = row
+        self.size += 1
+        self.ivf.add(row, self.centroids[row])
+        return row
+
+    def _nearest(self, queries):
+        """(row, squared distance) of the closest centroid per query, row -1 if none."""
+        rows = np.full(len(queries), -1, dtype=np.int64)
+        best = np.full(len(queries), np.inf, dtype=np.float32)
+        if self.size == 0:
+            return rows, best
+        centroids = self.centroids[:self.size]
+
+        if self.ivf.coarse is None:
+            d = sqdist(queries, centroids)
+            rows = d.argmin(1)
+            return rows, d[np.arange(len(queries)), rows]
+        return self.ivf.search(queries, centroids)
+
+    def match(self, encodings):
+        """Cluster (person) id per encoding; unknown faces start new clusters."""
+        if len(encodings) == 0:
+            return []
+        encodings = np.asarray(encodings, dtype=np.float32)
+        limit = self.tolerance ** 2
+        with self.lock:
+            rows, best = self._nearest(encodings)
+            out = [int(r) if d <= limit else None for r, d in zip(rows, best)]
+
+            # Unmatched: check clusters opened earlier in this batch, then open one
+            fresh = []
+            for i, row in enumerate(out):
+                if row is not None:
+                    continue
+                if fresh:
+                    d = ((self.centroids[fresh] - encodings[i]) ** 2).sum(1)
+                    j = int(d.argmin())
+                    if d[j] <= limit:
+                        out[i] = fresh[j]
+                        continue
+                out[i] = self._new_cluster(encodings[i])
+                fresh.append(out[i])
+
+            # Running-mean centroid update
+            for i, j in enumerate(out):
+                n = self.counts[j]
+                self.centroids[j] = (self.centroids[j] * n + encodings[i]) / (n + 1)
+                self.counts[j] = n + 1
+                self.dirty.add(j)
+
+            self.added += len(encodings)
+            return [self.ids[j] for j in out]
+
+    # --------------------------------------------------------
+    # Background re-clustering
+    # --------------------------------------------------------
+    def maybe_recluster(self, store):
+        """Start a background re-cluster after every `rebuild_every` new faces."""
+        with self.lock:
+            if self.added < self.rebuild_every or (self.worker and self.worker.is_alive()):
+                return False
+            self.added = 0
+            self.worker = threading.Thread(target=self.recluster, args=(store,),
+                                           name="omni-face-clusters", daemon=True)
+            self.worker.start()
+            return True
+
+    def recluster(self, store):
+        vectors, persons = store.snapshot()
+        with self.lock:
+            size0 = self.size
+            ids0 = list(self.ids[:size0])
+            row_of = dict(self.row_of)
+            aliases = dict(self.aliases)
+            centroids = self.centroids[:size0].copy()
+            counts = self.counts[:size0].copy()
+
+        def resolve(pid):
+            while pid in aliases:
+                pid = aliases[pid]
+            return pid
+
+        # 1) Exact centroids from every stored face
+        if len(persons):
+            uniq, inverse = np.unique(persons, return_inverse=True)
+            lookup = np.array([row_of.get(resolve(int(u)), -1) for u in uniq], dtype=np.int64)
+            rows = lookup[inverse]
+            valid = np.nonzero((rows >= 0) & (rows < size0))[0]
+            if len(valid):
+                # Sort by cluster, then one reduceat instead of a scatter-add
+                order = valid[np.argsort(rows[valid], kind="stable")]
+                filled, starts, seen = np.unique(rows[order], return_index=True,
+                                                 return_counts=True)
+                sums = np.add.reduceat(vectors[order].astype(np.float64), starts, axis=0)
+                centroids[filled] = (sums / seen[:, None]).astype(np.float32)
+
+        # 2) Merge clusters that drifted onto each other (older id survives)
+        parent = list(range(size0))
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        limit = self.merge_tolerance ** 2
+        ivf = IVFIndex(self.ivf.nprobe)
+        ivf.build(centroids)
+        for start in range(0, size0, CHUNK):
+            block = centroids[start:start + CHUNK]
+            own = np.arange(start, start + len(block))
+            if ivf.coarse is None:
+                d = sqdist(block, centroids)
+                d[np.arange(len(block)), own] = np.inf
+                rows = d.argmin(1)
+                best = d[np.arange(len(block)), rows]
+            else:
+                rows, best = ivf.search(block, centroids, exclude=own)
+            for i in np.nonzero(best <= limit)[0]:
+                a, b = find(start + int(i)), find(int(rows[i]))
+                if a != b:
+                    parent[max(a, b)] = min(a, b)
+
+        counts0 = counts.copy()
+        keep = [i for i in range(size0) if find(i) == i]
+        merged = {ids0[i]: ids0[find(i)] for i in range(size0) if find(i) != i}
+        if merged:
+            weights = counts.astype(np.float64)[:, None]
+            sums = np.zeros((size0, DIM), dtype=np.float64)
+            total = np.zeros(size0, dtype=np.int64)
+            roots = np.array([find(i) for i in range(size0)], dtype=np.int64)
+            np.add.at(sums, roots, centroids * weights)
+            np.add.at(total, roots, counts)
+            has = total > 0
+            centroids[has] = (sums[has] / total[has, None]).astype(np.float32)
+            counts = total
+
+        final = centroids[keep]
+        ivf.build(final)
+
+        # 3) Swap in; clusters opened meanwhile are appended unchanged
+        with self.lock:
+            later = self.size - size0
+            new_size = len(keep) + later
+            cent = np.empty((max(1024, 2 * new_size), DIM), dtype=np.float32)
+            cnt = np.zeros(len(cent), dtype=np.int64)
+            cent[:len(keep)] = final
+            # + faces matched while this ran
+            cnt[:len(keep)] = [counts[i] + self.counts[i] - counts0[i] for i in keep]
+            cent[len(keep):new_size] = self.centroids[size0:self.size]
+            cnt[len(keep):new_size] = self.counts[size0:self.size]
+
+            self.ids = [ids0[i] for i in keep] + self.ids[size0:self.size]
+            self.row_of = {pid: i for i, pid in enumerate(self.ids)}
+            self.centroids, self.counts, self.size = cent, cnt, new_size
+            for row in range(len(keep), new_size):
+                ivf.add(row, cent[row])
+            self.ivf = ivf
+            self.aliases.update(merged)
+            self.merged.update(merged)
+            self.dirty = set(range(new_size))
+
+        if merged:
+            print(f"[FaceClusters] Re-cluster: {len(merged)} merged, {new_size} clusters")
+
+
+if __name__ == "__main__":
+    import time
+    import tempfile
+
+    class _Store:
+        def __init__(self):
+            self.vectors, self.persons = [], []
+            self.lock = threading.Lock()
+
+        def append(self, faces, ids):
+            with self.lock:
+                self.vectors.append(faces)
+                self.persons.append(np.array(ids, dtype=np.int64))
+
+        def snapshot(self):
+            with self.lock:
+                return np.vstack(self.vectors), np.concatenate(self.persons)
+
+    rng = np.random.default_rng(1)
+    people = rng.normal(size=(20000, DIM)).astype(np.float32) * 0.25
+    n_faces, batch = 500_000, 1000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        clusters = FaceClusters(Path(tmp) / "bench.db", rebuild_every=100_000)
+        store = _Store()
+        start = time.perf_counter()
+        for b in range(n_faces // batch):
+            who = rng.integers(0, len(people), batch)
+            faces = people[who] + rng.normal(size=(batch, DIM)).astype(np.float32) * 0.02
+            t = time.perf_counter()
+            ids = clusters.match(faces)
+            last = time.perf_counter() - t
+            store.append(faces, ids)
+            clusters.maybe_recluster(store)
+        clusters.worker.join()
+        print(f"FaceClusters: {n_faces} faces -> {len(clusters)} clusters "
+              f"in {time.perf_counter() - start:.1f}s, last batch of {batch}: {last * 1000:.0f} ms")
+
+        start = time.perf_counter()
+        clusters.recluster(store)
+        print(f"FaceClusters: re-cluster in {time.perf_counter() - start:.1f}s")
+        clusters.close()
@@ -1,10 +1,363 @@
-# InteliOmniSorter V2 - Faces engine placeholder
-# Real implementation will use face_recognition and clustering.
+"""
+InteliOmniSorter - Faces Engine
+
+- images are downsampled before detection (JPEG draft mode + thumbnail)
+- detection + 128-d encodings run in batches on a CPU process pool (HOG model)
+- a batch only waits (LINGER) for more images while some of the `producers`
+  (classifier workers feeding the engine) are not blocked on it already;
+  a single caller is dispatched at once
+- EmbeddingStore: NumPy float32 matrix keyed by content hash, a file is
+  never encoded twice; vectors, person ids and keys are saved as one .npz
+- a broken process pool fails the batch (no faces) and is replaced
+- FaceClusters: incremental clustering into the `persons` table (ANN
+  lookup, background re-clustering), cluster ids become `faces` tags
+- throughput per core reported when the engine closes
+
+Needs face_recognition (dlib), numpy and Pillow; AVAILABLE is False without them.
+"""
 
-def analyze_image(path):
-    print("FacesEngine: placeholder analysis for", path)
-    return None
 REGISTER = {
     "name": "faces_engine",
     "type": "engine"
 }
+
+import os
+import sys
+import json
+import time
+import queue
+import hashlib
+import threading
+from pathlib import Path
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+try:
+    import face_recognition
+except ImportError:
+    face_recognition = None
+
+try:
+    from v2_core.engines.faces.face_clusters import FaceClusters
+except ImportError:
+    from face_clusters import FaceClusters
+
+AVAILABLE = np is not None and Image is not None and face_recognition is not None
+
+ROOT = Path(__file__).resolve().parents[3]
+
+DEFAULT_STORE = ROOT / "v2_core" / "temp" / "face_embeddings"
+
+try:
+    from v2_core.system.index.metadata_index import DEFAULT_DB
+except ImportError:
+    DEFAULT_DB = ROOT / "v2_core" / "temp" / "smartbrain.db"
+
+DIM = 128
+MAX_SIDE = 800
+BATCH = 16
+LINGER = 0.02
+
+IMAGE_EXT = {".jpg", ".jpeg", ".png", ".bmp", ".webp", ".tif", ".tiff"}
+
+_STOP = object()
+
+
+def content_hash(path):
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(1024 * 1024)
+            if not block:
+                break
+            h.update(block)
+    return h.hexdigest()
+
+
+# --------------------------------------------------------
+# Worker side (process pool)
+# --------------------------------------------------------
+def _init_worker(root):
+    if root not in sys.path:
+        sys.path.insert(0, root)
+
+
+def load_downsampled(path, max_side=MAX_SIDE):
+    with Image.open(path) as img:
+        # JPEG decodes straight at 1/2, 1/4, 1/8 scale
+        img.draft("RGB", (max_side, max_side))
+        img = img.convert("RGB")
+        img.thumbnail((max_side, max_side))
+        return np.asarray(img)
+
+
+def detect_faces(path, max_side=MAX_SIDE, model="hog"):
+    """(n, 128) float32 encodings for one image, None if it can't be read."""
+    try:
+        pixels = load_downsampled(path, max_side)
+        boxes = face_recognition.face_locations(pixels, model=model)
+        encodings = face_recognition.face_encodings(pixels, boxes) if boxes else []
+    except Exception:
+        return None
+    return np.asarray(encodings, dtype=np.float32).reshape(-1, DIM)
+
+
+def encode_batch(paths, max_side=MAX_SIDE, model="hog"):
+    """Worker entry: encodings per path + CPU seconds spent."""
+    start = time.process_time()
+    out = [detect_faces(p, max_side, model) for p in paths]
+    return out, time.process_time() - start
+
+
+def analyze_image(path):
+    """Single image, no pool / store (kept for the V2 placeholder callers)."""
+    return detect_faces(path) if AVAILABLE else None
+
+
+# --------------------------------------------------------
+# Embedding store
+# --------------------------------------------------------
+class EmbeddingStore:
+    """Append-only float32 rows + {content_hash: [row, count]} + person id per row, one .npz."""
+
+    def __init__(self, base=DEFAULT_STORE):
+        self.base = Path(base)
+        self.vectors = np.empty((0, DIM), dtype=np.float32)
+        self.persons = np.empty(0, dtype=np.int64)
+        self.size = 0
+        self.keys = {}
+        self.lock = threading.Lock()
+        self.load()
+
+    def __len__(self):
+        return len(self.keys)
+
+    def load(self):
+        vec_path = self.base.with_suffix(".npz")
+        if not vec_path.exists():
+            return
+        try:
+            with np.load(vec_path) as data:
+                vectors, persons = data["vectors"], data["persons"]
+                if "keys" in data:
+                    keys = json.loads(str(data["keys"]))
+                else:
+                    # Older stores: keys in a .json next to the .npz
+                    with open(self.base.with_suffix(".json"), "r", encoding="utf-8") as f:
+                        keys = json.load(f)
+        except (OSError, ValueError, KeyError):
+            print("[Faces] Embedding store unreadable, starting empty.")
+            return
+        self.vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        self.persons = persons.astype(np.int64)
+        self.size = len(self.vectors)
+        self.keys = {k: tuple(v) for k, v in keys.items()}
+
+    def save(self):
+        self.base.parent.mkdir(parents=True, exist_ok=True)
+        with self.lock:
+            vectors = self.vectors[:self.size].copy()
+            persons = self.persons[:self.size].copy()
+            keys = dict(self.keys)
+
+        # One file, one replace: keys always match the rows they point at
+        tmp = self.base.with_suffix(".tmp.npz")
+        np.savez(tmp, vectors=vectors, persons=persons, keys=np.array(json.dumps(keys)))
+        os.replace(tmp, self.base.with_suffix(".npz"))
+
+    def get(self, key):
+        """(encodings, person ids) or None if the content was never encoded."""
+        with self.lock:
+            entry = self.keys.get(key)
+            if entry is None:
+                return None
+            row, count = entry
+            return self.vectors[row:row + count].copy(), self.persons[row:row + count].tolist()
+
+    def snapshot(self):
+        """(vectors, person ids) copies for background re-clustering."""
+        with self.lock:
+            return self.vectors[:self.size].copy(), self.persons[:self.size].copy()
+
+    def put(self, key, encodings, persons):
+        count = len(encodings)
+        with self.lock:
+            if self.size + count > len(self.vectors):
+                capacity = max(1024, 2 * (self.size + count))
+                grown = np.empty((capacity, DIM), dtype=np.float32)
+                grown[:self.size] = self.vectors[:self.size]
+                self.vectors = grown
+                ids = np.full(capacity, -1, dtype=np.int64)
+                ids[:self.size] = self.persons[:self.size]
+                self.persons = ids
+            row = self.size
+            self.vectors[row:row + count] = encodings
+            self.persons[row:row + count] = persons
+            self.size += count
+            self.keys[key] = (row, count)
+
+
+# --------------------------------------------------------
+# Engine
+# --------------------------------------------------------
+class FacesEngine:
+    engine_name = "faces_engine"
+
+    def __init__(self, workers=None, batch_size=BATCH, max_side=MAX_SIDE,
+                 store=DEFAULT_STORE, db_path=DEFAULT_DB, **cluster_options):
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.max_side = max_side
+
+        self.store = EmbeddingStore(store)
+        self.persons = FaceClusters(db_path, **cluster_options)
+
+        self.pool = None
+        self.requests = queue.Queue()
+        self.dispatcher = None
+        self.inflight = threading.BoundedSemaphore(self.workers * 2)
+        self.lock = threading.Lock()
+        # Threads that call faces() concurrently (set by the sort pipeline)
+        self.producers = 1
+        self.waiting = 0
+
+        self.started = time.monotonic()
+        self.counters = {"files": 0, "cached": 0, "encoded": 0, "faces": 0,
+                         "errors": 0, "cpu_seconds": 0.0}
+
+    def count(self, **deltas):
+        with self.lock:
+            for key, value in deltas.items():
+                self.counters[key] += value
+
+    # --------------------------------------------------------
+    # Batching
+    # --------------------------------------------------------
+    def start(self):
+        with self.lock:
+            if self.dispatcher is None:
+                self.pool = self.new_pool()
+                self.dispatcher = threading.Thread(target=self.dispatch,
+                                                   name="omni-faces", daemon=True)
+                self.dispatcher.start()
+
+    def new_pool(self):
+        return ProcessPoolExecutor(self.workers, initializer=_init_worker, initargs=(str(ROOT),))
+
+    def dispatch(self):
+        stopping = False
+        while not stopping:
+            item = self.requests.get()
+            if item is _STOP:
+                return
+            batch = [item]
+            try:
+                while len(batch) < self.batch_size:
+                    if self.waiting < self.producers:
+                        item = self.requests.get(timeout=LINGER)
+                    else:
+                        # Every producer is waiting: take what is queued, no more will come
+                        item = self.requests.get_nowait()
+                    if item is _STOP:
+                        stopping = True
+                        break
+                    batch.append(item)
+            except queue.Empty:
+                pass
+
+            # Bounded: at most 2 batches per worker queued in the pool
+            self.inflight.acquire()
+            try:
+                future = self.pool.submit(encode_batch, [p for p, _ in batch], self.max_side)
+            except BrokenProcessPool as e:
+                # A worker died (e.g. killed for memory): new pool first, then fail this batch
+                print(f"[Faces] Batch failed: {e}")
+                broken, self.pool = self.pool, self.new_pool()
+                broken.shutdown(wait=False)
+                self.inflight.release()
+                for _, waiter in batch:
+                    waiter.set_result(None)
+                continue
+            future.add_done_callback(lambda f, batch=batch: self.finish(f, batch))
+
+    def finish(self, future, batch):
+        self.inflight.release()
+        try:
+            results, cpu = future.result()
+        except Exception as e:
+            results, cpu = [None] * len(batch), 0.0
+            print(f"[Faces] Batch failed: {e}")
+        self.count(cpu_seconds=cpu)
+        for (_, waiter), encodings in zip(batch, results):
+            waiter.set_result(encodings)
+
+    def encode(self, path):
+        self.start()
+        waiter = Future()
+        with self.lock:
+            self.waiting += 1
+        try:
+            self.requests.put((str(path), waiter))
+            return waiter.result()
+        finally:
+            with self.lock:
+                self.waiting -= 1
+
+    # --------------------------------------------------------
+    # Public API
+    # --------------------------------------------------------
+    def faces(self, path):
+        """Person labels for an image (the `faces` tag)."""
+        self.count(files=1)
+        key = content_hash(path)
+        cached = self.store.get(key)
+        if cached is not None:
+            self.count(cached=1)
+            _, person_ids = cached
+        else:
+            encodings = self.encode(path)
+            if encodings is None:
+                self.count(errors=1)
+                return []
+            person_ids = self.persons.match(encodings)
+            self.store.put(key, encodings, person_ids)
+            self.persons.maybe_recluster(self.store)
+            self.count(encoded=1, faces=len(encodings))
+        return sorted({self.persons.label(p) for p in person_ids})
+
+    def stats(self):
+        with self.lock:
+            s = dict(self.counters)
+        s["elapsed"] = time.monotonic() - self.started
+        # Files per CPU-second inside the workers = throughput of one core
+        s["files_per_core_s"] = s["encoded"] / s["cpu_seconds"] if s["cpu_seconds"] else 0.0
+        s["workers"] = self.workers
+        return s
+
+    def report(self):
+        s = self.stats()
+        return (f"{s['files']} images ({s['encoded']} encoded, {s['cached']} cached, "
+                f"{s['errors']} failed), {s['faces']} faces, "
+                f"{s['files_per_core_s']:.2f} images/s per core x {s['workers']} workers")
+
+    def close(self):
+        with self.lock:
+            dispatcher, self.dispatcher = self.dispatcher, None
+        if dispatcher:
+            self.requests.put(_STOP)
+            dispatcher.join()
+            self.pool.shutdown(wait=True)
+            self.pool = None
+        self.store.save()
+        self.persons.close()
+        print(f"[Faces] {self.report()}")
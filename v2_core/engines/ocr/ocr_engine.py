@@ -0,0 +1,320 @@
+"""
+InteliOmniSorter - OCR Engine
+
+Screenshot / document text for content-based routing:
+- cheap gate first: camera photos (EXIF camera tag) never reach OCR; the
+  rest needs a flat-colour histogram on a 64px thumbnail (JPEG draft
+  decode), looser for screen / page aspect ratios
+- images that pass are downscaled to grayscale and OCR'd in batches, one
+  tesseract process per batch (language model loaded once, pages split on
+  the form feed), batches spread over a pool of workers
+- a batch only waits (LINGER) for more images while some of the `producers`
+  (classifier workers feeding the engine) are not blocked on it already;
+  a single caller is dispatched at once
+- results (snippet + matched keywords) cached in the Metadata Index by
+  content hash
+- gate decisions and OCR results reported when the engine closes
+
+Needs Pillow and the tesseract binary (SMARTBRAIN_TESSERACT or PATH);
+AVAILABLE is False without them.
+"""
+
+REGISTER = {
+    "name": "ocr_engine",
+    "type": "engine"
+}
+
+import os
+import queue
+import hashlib
+import tempfile
+import threading
+import subprocess
+from pathlib import Path
+from concurrent.futures import Future, ThreadPoolExecutor
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+try:
+    from v2_core.engines.dedup.exact_dup_engine import full_digest
+    from v2_core.system.metadata.metadata_service import find_tool
+    from v2_core.system.rules.keywords import KeywordMatcher, STUDY_KEYWORDS, WHOLE_WORD_MAX
+except ImportError:
+    from engines.dedup.exact_dup_engine import full_digest
+    from system.metadata.metadata_service import find_tool
+    from system.rules.keywords import KeywordMatcher, STUDY_KEYWORDS, WHOLE_WORD_MAX
+
+TESSERACT = find_tool("SMARTBRAIN_TESSERACT", "tesseract")
+
+AVAILABLE = Image is not None and TESSERACT is not None
+
+IMAGE_EXT = {".jpg", ".jpeg", ".png", ".bmp", ".webp", ".tif", ".tiff", ".gif"}
+
+# Gate
+GATE_SIDE = 64
+# long side / short side of screens (4:3 ... 21:9) and A-series paper
+SCREEN_RATIOS = (4 / 3, 3 / 2, 16 / 10, 16 / 9, 19.5 / 9, 20 / 9, 21 / 9, 2 ** 0.5)
+RATIO_TOLERANCE = 0.03
+# share of the 64px thumbnail covered by its most common (4-bit) colour
+DOMINANT_SCREEN = 0.25
+DOMINANT_OTHER = 0.45
+
+# OCR
+OCR_SIDE = 1600
+BATCH = 8
+LINGER = 0.02
+TIMEOUT = 30.0
+SNIPPET_CHARS = 2000
+
+_STOP = object()
+
+
+# --------------------------------------------------------
+# Gate
+# --------------------------------------------------------
+def screen_ratio(width, height):
+    if not width or not height:
+        return False
+    ratio = max(width, height) / min(width, height)
+    return any(abs(ratio - r) / r <= RATIO_TOLERANCE for r in SCREEN_RATIOS)
+
+
+def dominant_share(img):
+    """Share of the most common colour (4 bits per channel) in a tiny thumbnail."""
+    img.draft("RGB", (GATE_SIDE * 2, GATE_SIDE * 2))
+    small = img.convert("RGB").resize((GATE_SIDE, GATE_SIDE), Image.NEAREST)
+    buckets = {}
+    for count, (r, g, b) in small.getcolors(GATE_SIDE * GATE_SIDE):
+        key = (r >> 4, g >> 4, b >> 4)
+        buckets[key] = buckets.get(key, 0) + count
+    return max(buckets.values()) / (GATE_SIDE * GATE_SIDE)
+
+
+def gate(path, tags=None):
+    """(passed, reason): does this image look like a screenshot / document?"""
+    if tags and tags.get("camera"):
+        return False, "camera"
+    try:
+        with Image.open(path) as img:
+            screen = screen_ratio(*img.size)
+            share = dominant_share(img)
+    except Exception:
+        return False, "unreadable"
+    if share >= (DOMINANT_SCREEN if screen else DOMINANT_OTHER):
+        return True, "screen" if screen else "flat"
+    return False, "photo"
+
+
+# --------------------------------------------------------
+# OCR worker
+# --------------------------------------------------------
+def downscale(path, out_path, max_side=OCR_SIDE):
+    with Image.open(path) as img:
+        img.draft("L", (max_side, max_side))
+        img = img.convert("L")
+        img.thumbnail((max_side, max_side))
+        img.save(out_path, "PNG")
+
+
+def tesseract(cmd, images, lang="eng", timeout=TIMEOUT):
+    """Text per image from one tesseract run, None if the run failed."""
+    with tempfile.TemporaryDirectory(prefix="omni-ocr-") as tmp:
+        listing = Path(tmp) / "images.txt"
+        listing.write_text("\n".join(map(str, images)) + "\n", encoding="utf-8")
+        env = dict(os.environ, OMP_THREAD_LIMIT="1")  # one core per worker
+        try:
+            result = subprocess.run(
+                [cmd, str(listing), "stdout", "-l", lang],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                timeout=timeout * len(images),
+                env=env,
+            )
+        except (subprocess.TimeoutExpired, OSError):
+            return None
+    if result.returncode != 0:
+        return None
+    # Every page ends with a form feed
+    pages = result.stdout.decode("utf-8", "replace").split("\f")
+    if len(pages) != len(images) + 1:
+        return None
+    return pages[:-1]
+
+
+def ocr_batch(cmd, paths, max_side=OCR_SIDE, lang="eng", timeout=TIMEOUT):
+    """Text per path (None where the image could not be read / OCR'd)."""
+    with tempfile.TemporaryDirectory(prefix="omni-ocr-") as tmp:
+        scaled = {}
+        for i, path in enumerate(paths):
+            out = Path(tmp) / f"{i}.png"
+            try:
+                downscale(path, out, max_side)
+                scaled[i] = out
+            except Exception:
+                continue
+
+        order = sorted(scaled)
+        texts = tesseract(cmd, [scaled[i] for i in order], lang, timeout) if order else []
+        if texts is None and len(order) > 1:
+            # One bad image broke the batch -> one by one
+            texts = [(tesseract(cmd, [scaled[i]], lang, timeout) or [None])[0] for i in order]
+        elif texts is None:
+            texts = [None]
+
+    out = [None] * len(paths)
+    for i, text in zip(order, texts):
+        out[i] = text
+    return out
+
+
+# --------------------------------------------------------
+# Engine
+# --------------------------------------------------------
+class OCREngine:
+    engine_name = "ocr_engine"
+
+    def __init__(self, keywords=STUDY_KEYWORDS, index=None, workers=None, batch_size=BATCH,
+                 max_side=OCR_SIDE, timeout=TIMEOUT, lang="eng", tesseract=None):
+        self.cmd = tesseract or TESSERACT
+        self.keywords = [k.lower() for k in keywords]
+        self.matcher = KeywordMatcher([("ocr", self.keywords)])
+        self.index = index
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.max_side = max_side
+        self.timeout = timeout
+        self.lang = lang
+
+        self.signature = hashlib.blake2b(
+            "\n".join(["ocr", lang, str(max_side), f"w{WHOLE_WORD_MAX}", *self.keywords]).encode("utf-8"),
+            digest_size=4
+        ).hexdigest()
+
+        self.pool = None
+        self.requests = queue.Queue()
+        self.dispatcher = None
+        self.inflight = threading.BoundedSemaphore(self.workers * 2)
+        self.lock = threading.Lock()
+        # Threads that call scan() concurrently (set by the sort pipeline)
+        self.producers = 1
+        self.waiting = 0
+        self.counters = {"images": 0, "gated": 0, "cached": 0, "ocr": 0, "errors": 0,
+                         "batches": 0}
+        self.reasons = {}
+
+    def count(self, key, n=1):
+        with self.lock:
+            self.counters[key] += n
+
+    # --------------------------------------------------------
+    # Batching
+    # --------------------------------------------------------
+    def start(self):
+        with self.lock:
+            if self.dispatcher is None:
+                self.pool = ThreadPoolExecutor(self.workers, thread_name_prefix="omni-ocr")
+                self.dispatcher = threading.Thread(target=self.dispatch,
+                                                   name="omni-ocr-batch", daemon=True)
+                self.dispatcher.start()
+
+    def dispatch(self):
+        stopping = False
+        while not stopping:
+            item = self.requests.get()
+            if item is _STOP:
+                return
+            batch = [item]
+            try:
+                while len(batch) < self.batch_size:
+                    if self.waiting < self.producers:
+                        item = self.requests.get(timeout=LINGER)
+                    else:
+                        # Every producer is waiting: take what is queued, no more will come
+                        item = self.requests.get_nowait()
+                    if item is _STOP:
+                        stopping = True
+                        break
+                    batch.append(item)
+            except queue.Empty:
+                pass
+
+            # Bounded: at most 2 batches per worker waiting
+            self.inflight.acquire()
+            future = self.pool.submit(ocr_batch, self.cmd, [p for p, _ in batch],
+                                      self.max_side, self.lang, self.timeout)
+            future.add_done_callback(lambda f, batch=batch: self.finish(f, batch))
+
+    def finish(self, future, batch):
+        self.inflight.release()
+        self.count("batches")
+        try:
+            texts = future.result()
+        except Exception as e:
+            texts = [None] * len(batch)
+            print(f"[OCR] Batch failed: {e}")
+        for (_, waiter), text in zip(batch, texts):
+            waiter.set_result(text)
+
+    def ocr(self, path):
+        self.start()
+        waiter = Future()
+        with self.lock:
+            self.waiting += 1
+        try:
+            self.requests.put((str(path), waiter))
+            return waiter.result()
+        finally:
+            with self.lock:
+                self.waiting -= 1
+
+    # --------------------------------------------------------
+    # Public API
+    # --------------------------------------------------------
+    def scan(self, path, tags=None):
+        """Cached OCR of one image, None if the gate rejected it."""
+        self.count("images")
+        passed, reason = gate(path, tags)
+        with self.lock:
+            self.reasons[reason] = self.reasons.get(reason, 0) + 1
+        if not passed:
+            self.count("gated")
+            return None
+
+        key = f"{full_digest(path).hex()}:{self.signature}"
+        if self.index:
+            cached = self.index.get_text(key)
+            if cached is not None:
+                self.count("cached")
+                return cached
+
+        text = self.ocr(path)
+        if text is None:
+            self.count("errors")
+            result = {"snippet": "", "keywords": [], "pages": 0, "status": "error"}
+        else:
+            self.count("ocr")
+            text = text.lower()
+            result = {"snippet": text[:SNIPPET_CHARS], "keywords": self.matcher.find(text),
+                      "pages": 1, "status": "ok"}
+        if self.index:
+            self.index.put_text(key, result["snippet"], result["keywords"],
+                                result["pages"], result["status"])
+        return result
+
+    def stats(self):
+        with self.lock:
+            s = dict(self.counters)
+            s["gate"] = dict(self.reasons)
+        return s
+
+    def close(self):
+        with self.lock:
+            dispatcher, self.dispatcher = self.dispatcher, None
+        if dispatcher:
+            self.requests.put(_STOP)
+            dispatcher.join()
+            self.pool.shutdown(wait=True)
+            self.pool = None
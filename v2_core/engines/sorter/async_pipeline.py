@@ -0,0 +1,197 @@
+"""
+InteliOmniSorter - Async Sort Pipeline
+
+asyncio variant of the Sort Pipeline for high-latency storage (network
+shares), where most of the per-file time is spent waiting:
+- one event loop drives many files through their stages at once (bounded
+  window), so stat / open / read latencies overlap instead of adding up
+- blocking filesystem calls (walk, stat, header reads, index lookups) run
+  on a bounded "disk" executor
+- extractor work (faces, PDF text, OCR gate, hashing) on a bounded "cpu"
+  executor; heavy hashing goes on to the optional process pool
+- external tools are started with asyncio.create_subprocess_exec under the
+  "tools" limit, no thread is parked per running process
+- moves stay ordered: one mover thread consumes results in walk order
+
+Limits per resource class: {"disk": 32, "cpu": <cores>, "tools": 4}.
+"""
+
+import os
+import asyncio
+import itertools
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+try:
+    from v2_core.engines.sorter.pipeline import ROOT, _init_cpu_worker
+except ImportError:
+    from engines.sorter.pipeline import ROOT, _init_cpu_worker
+
+RESOURCES = ("disk", "cpu", "tools")
+WALK_CHUNK = 256
+
+
+def default_limits():
+    return {"disk": 32, "cpu": os.cpu_count() or 1, "tools": 4}
+
+
+def resolve_limits(limits=None):
+    """Defaults for missing / empty classes; unknown classes are an error."""
+    out = default_limits()
+    for name, value in (limits or {}).items():
+        if name not in out:
+            raise ValueError(f"unknown resource class: {name}")
+        if value:
+            out[name] = max(1, int(value))
+    return out
+
+
+# --------------------------------------------------------
+# Resource classes
+# --------------------------------------------------------
+class Resources:
+    """Bounded executors per resource class, awaitable from the event loop."""
+
+    def __init__(self, limits=None):
+        self.limits = resolve_limits(limits)
+        self.pools = {
+            name: ThreadPoolExecutor(self.limits[name], thread_name_prefix=f"omni-{name}")
+            for name in RESOURCES
+        }
+        self.tool_slots = None
+
+    def bind(self):
+        # asyncio primitives belong to the running loop
+        self.tool_slots = asyncio.Semaphore(self.limits["tools"])
+
+    async def disk(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.pools["disk"], fn, *args)
+
+    async def cpu(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.pools["cpu"], fn, *args)
+
+    async def tool(self, fn, *args):
+        """Blocking call into an external tool client."""
+        async with self.tool_slots:
+            return await asyncio.get_running_loop().run_in_executor(self.pools["tools"], fn, *args)
+
+    async def exec(self, cmd, timeout=None):
+        """(returncode, stdout) of a subprocess, None if it failed to start / timed out."""
+        async with self.tool_slots:
+            try:
+                proc = await asyncio.create_subprocess_exec(
+                    *cmd,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.DEVNULL,
+                )
+            except OSError:
+                return None
+            try:
+                stdout, _ = await asyncio.wait_for(proc.communicate(), timeout)
+            except asyncio.TimeoutError:
+                proc.kill()
+                await proc.wait()
+                return None
+            return proc.returncode, stdout
+
+    def close(self):
+        for pool in self.pools.values():
+            pool.shutdown(wait=True)
+
+
+# --------------------------------------------------------
+# Pipeline
+# --------------------------------------------------------
+class AsyncSortPipeline:
+    """
+    Ordered, bounded pipeline on one event loop:
+    walk (disk) -> classify (coroutine per file) -> move (single thread).
+    At most `window` files are in flight ahead of the mover.
+    """
+
+    def __init__(self, limits=None, cpu_workers=0, window=None):
+        self.resources = Resources(limits)
+        self.limits = self.resources.limits
+        self.workers = self.limits["disk"]
+        self.cpu_workers = cpu_workers
+        self.window = window or self.limits["disk"] * 4
+        self.mover = None
+        self.cpu_pool = None
+        self._cpu_lock = threading.Lock()
+
+    def __enter__(self):
+        self.mover = ThreadPoolExecutor(1, thread_name_prefix="omni-move")
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self.mover:
+            self.mover.shutdown(wait=True)
+            self.mover = None
+        self.resources.close()
+        if self.cpu_pool:
+            self.cpu_pool.shutdown(wait=True)
+            self.cpu_pool = None
+
+    # --------------------------------------------------------
+    # CPU-heavy calls (hashing), from a cpu executor thread
+    # --------------------------------------------------------
+    def cpu_call(self, fn, *args):
+        if not self.cpu_workers:
+            return fn(*args)
+        if self.cpu_pool is None:
+            with self._cpu_lock:
+                if self.cpu_pool is None:
+                    self.cpu_pool = ProcessPoolExecutor(
+                        self.cpu_workers,
+                        initializer=_init_cpu_worker,
+                        initargs=(str(ROOT),),
+                    )
+        return self.cpu_pool.submit(fn, *args).result()
+
+    # --------------------------------------------------------
+    # Run
+    # --------------------------------------------------------
+    def run(self, paths, classify, move):
+        """
+        classify(path, resources) is a coroutine, move(path, result) runs on
+        the mover thread, always in the order the walk produced the paths.
+        """
+        asyncio.run(self._run(iter(paths), classify, move))
+
+    async def _run(self, paths, classify, move):
+        res = self.resources
+        res.bind()
+        loop = asyncio.get_running_loop()
+
+        def next_chunk():
+            return list(itertools.islice(paths, WALK_CHUNK))
+
+        pending = deque()
+        ready = deque()
+        walking = True
+        try:
+            while True:
+                while walking and len(pending) < self.window:
+                    if not ready:
+                        ready.extend(await res.disk(next_chunk))
+                        if not ready:
+                            walking = False
+                            break
+                    path = ready.popleft()
+                    pending.append((path, asyncio.ensure_future(classify(path, res))))
+
+                if not pending:
+                    break
+
+                path, task = pending.popleft()
+                result = await task
+                await loop.run_in_executor(self.mover, move, path, result)
+        finally:
+            for _, task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*(t for _, t in pending), return_exceptions=True)
@@ -0,0 +1,160 @@
+"""
+InteliOmniSorter - Sort Pipeline
+
+Stages:
+- walker   : background thread feeding paths into a bounded queue
+- classify : thread pool (stat / EXIF / rule evaluation per file)
+- cpu pool : optional process pool for face + hash work
+- mover    : runs in the caller thread, consumes results in walk order
+
+With workers=1 everything runs inline, exactly like the old loop.
+"""
+
+import os
+import sys
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[3]
+
+_DONE = object()
+
+
+def resolve_workers(workers):
+    """0 / None -> one worker per CPU core."""
+    if not workers or workers < 1:
+        return os.cpu_count() or 1
+    return int(workers)
+
+
+def _init_cpu_worker(root):
+    # Spawned workers (Windows) need ROOT to import v2_core modules
+    if root not in sys.path:
+        sys.path.insert(0, root)
+
+
+class SortPipeline:
+    """
+    Ordered, bounded pipeline: walk -> classify (pool) -> move (caller).
+    At most `window` files are classified ahead of the mover.
+    """
+
+    def __init__(self, workers=1, cpu_workers=0, window=None):
+        self.workers = resolve_workers(workers)
+        self.cpu_workers = cpu_workers
+        self.window = window or self.workers * 4
+        self.pool = None
+        self.cpu_pool = None
+        self._cpu_lock = threading.Lock()
+
+    @property
+    def parallel(self):
+        return self.workers > 1
+
+    def __enter__(self):
+        if self.parallel:
+            self.pool = ThreadPoolExecutor(self.workers, thread_name_prefix="omni-classify")
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self.pool:
+            self.pool.shutdown(wait=True)
+            self.pool = None
+        if self.cpu_pool:
+            self.cpu_pool.shutdown(wait=True)
+            self.cpu_pool = None
+
+    # --------------------------------------------------------
+    # CPU-heavy calls (faces / hashing)
+    # --------------------------------------------------------
+    def cpu_call(self, fn, *args):
+        """Run fn in the process pool when enabled, otherwise inline."""
+        if not self.cpu_workers or not self.parallel:
+            return fn(*args)
+
+        if self.cpu_pool is None:
+            with self._cpu_lock:
+                if self.cpu_pool is None:
+                    self.cpu_pool = ProcessPoolExecutor(
+                        self.cpu_workers,
+                        initializer=_init_cpu_worker,
+                        initargs=(str(ROOT),),
+                    )
+        return self.cpu_pool.submit(fn, *args).result()
+
+    # --------------------------------------------------------
+    # Walker stage
+    # --------------------------------------------------------
+    def start_walker(self, paths, batch_size=64):
+        # Paths cross the queue in batches to keep lock traffic low
+        q = queue.Queue(maxsize=max(2, self.window * 2 // batch_size))
+        errors = []
+
+        def walk():
+            batch = []
+            try:
+                for p in paths:
+                    batch.append(p)
+                    if len(batch) >= batch_size:
+                        q.put(batch)
+                        batch = []
+            except Exception as e:
+                errors.append(e)
+            finally:
+                if batch:
+                    q.put(batch)
+                q.put(_DONE)
+
+        t = threading.Thread(target=walk, name="omni-walker", daemon=True)
+        t.start()
+        return q, errors
+
+    # --------------------------------------------------------
+    # Run
+    # --------------------------------------------------------
+    def run(self, paths, classify, move):
+        """
+        classify(path) runs on the pool, move(path, result) runs here,
+        always in the order the walker produced the paths.
+        """
+        if not self.parallel:
+            for p in paths:
+                move(p, classify(p))
+            return
+
+        q, errors = self.start_walker(paths)
+        pending = deque()
+        ready = deque()
+        walking = True
+
+        while True:
+            # Top up the window; only block when nothing is in flight
+            while len(pending) < self.window:
+                if not ready:
+                    if not walking:
+                        break
+                    try:
+                        batch = q.get(block=not pending)
+                    except queue.Empty:
+                        break
+                    if batch is _DONE:
+                        walking = False
+                        break
+                    ready.extend(batch)
+                item = ready.popleft()
+                pending.append((item, self.pool.submit(classify, item)))
+
+            if not pending:
+                break
+
+            path, future = pending.popleft()
+            move(path, future.result())
+
+        if errors:
+            raise errors[0]
@@ -5,6 +5,38 @@ InteliOmniSorter - Sort Engine (Phase 6 Integration)
 - Expands rule templates like {year}/{month}/{ext}
 - Uses rule-based destinations
 - Falls back to timeline sorting
+- Parallel classification pipeline (--workers N), ordered single mover
+- Skips re-extraction of unchanged files via the Metadata Index
+- EXIF date / camera from a header-only reader (no image decode)
+- Camera / video tags from the long-lived exiftool + ffprobe Metadata Service
+- Face person labels from the batched Faces Engine (`faces` tag), photos
+  with a known person fall back to sorted/people/{person}/
+- Moves through the Move Engine (rename fast path, cross-device copy)
+- PDF keywords from the Document Content Engine (process pool, page-limited,
+  cached by content hash), `keywords` tag; the keyword list comes from the
+  rules' `keywords` conditions
+- Screenshot / document images: gated, batched OCR (OCR Engine), camera
+  photos never reach Tesseract; matched words join the `keywords` tag
+- Never overwrites: colliding names get a free name__N suffix
+- Exact duplicates (size -> edge hash -> full hash, all file types) and
+  near-duplicate images (perceptual hash) go to sorted/duplicates/
+- Per-file decisions (rule, destination, outcome, extractor timings) go to
+  the columnar Run Report, not to the log; per-file lines only with verbose
+- Async mode (--async): one asyncio loop overlaps stat / reads / tool
+  calls across many files, bounded per resource class (disk, cpu, tools),
+  ffprobe via asyncio subprocesses; moves stay ordered
+- Run checkpoints: per-file states in SQLite (run_checkpoints.db in the
+  repository root); an interrupted run continues with --resume <run-id>,
+  without moving a file twice or classifying a file again; simulated
+  runs move nothing and keep no checkpoint
+- Move plans: --plan writes the decisions (src, dst, size, mtime, rule,
+  content key) instead of moving; apply() executes a plan later without
+  classifying, skipping sources that changed since
+- Watch mode: new files from the Inbox Watcher (inotify / polling) are
+  sorted in micro-batches with the engines kept open between batches
+- Profiling (--profile): per-stage latency histograms (walk, stat, each
+  extractor, rules, templates, move), files/s + bytes/s, optional pstats
+  dump and Chrome trace via the Run Profiler; off, a hook is a None check
 """
 
 REGISTER = {
@@ -13,8 +45,12 @@ REGISTER = {
 }
 
 import os
+import time
+import asyncio
 from pathlib import Path
 from datetime import datetime
+from collections import deque
+from contextlib import nullcontext
 
 # Load Automount V2
 try:
@@ -22,29 +58,183 @@ try:
 except:
     from system.automount.automount import mount_all
 
-REGISTRY = mount_all()
+try:
+    from v2_core.engines.sorter.pipeline import SortPipeline
+    from v2_core.engines.sorter.async_pipeline import AsyncSortPipeline
+except ImportError:
+    from engines.sorter.pipeline import SortPipeline
+    from engines.sorter.async_pipeline import AsyncSortPipeline
+
+try:
+    from v2_core.system.rules.templates import compile_template, intern_dir
+except ImportError:
+    from system.rules.templates import compile_template, intern_dir
+
+try:
+    from v2_core.system.scanner.scanner import iter_entries, iter_files, has_suffix
+except ImportError:
+    from system.scanner.scanner import iter_entries, iter_files, has_suffix
+
+try:
+    from v2_core.system.report.run_report import RunReport, FileTrace, new_run_id
+except ImportError:
+    from system.report.run_report import RunReport, FileTrace, new_run_id
+
+try:
+    from v2_core.engines.dedup.exact_dup_engine import full_digest
+except ImportError:
+    from engines.dedup.exact_dup_engine import full_digest
+
+try:
+    from v2_core.system.mover.move_engine import MoveEngine, SourceKept
+    from v2_core.system.mover.name_registry import NameRegistry
+except ImportError:
+    from system.mover.move_engine import MoveEngine, SourceKept
+    from system.mover.name_registry import NameRegistry
+
+# Registry entries, looked up on the first SortEngine(): Automount imports
+# a module when its entry is touched, so importing this one loads none of them
+RuleEngine = RollbackEngine = MetadataIndex = MetadataService = None
+FacesEngine = NearDupIndex = DocContentEngine = OCREngine = ExactDupEngine = None
+RunCheckpoint = None
+faces_mod = exif_mod = metadata_mod = near_dup_mod = docs_mod = ocr_mod = None
+plan_mod = checkpoint_mod = None
+_RESOLVED = False
+
+
+def registry_entry(section, name, attr=None, needs=None):
+    """Module (or its `attr`) from the registry; None if missing or `needs` is false."""
+    module = mount_all()[section].get(name)
+    if module is None or (needs and not getattr(module, needs, None)):
+        return None
+    return getattr(module, attr, None) if attr else module
+
+
+def resolve_engines():
+    global RuleEngine, RollbackEngine, MetadataIndex, MetadataService, FacesEngine
+    global NearDupIndex, DocContentEngine, OCREngine, ExactDupEngine
+    global RunCheckpoint, _RESOLVED
+    global faces_mod, exif_mod, metadata_mod, near_dup_mod, docs_mod, ocr_mod
+    global plan_mod, checkpoint_mod
+    if _RESOLVED:
+        return
+
+    # Rule Engine (wherever it is registered)
+    RuleEngine = (registry_entry("engines", "rule_engine", "RuleEngine")
+                  or registry_entry("plugins", "rule_engine", "RuleEngine")
+                  or registry_entry("system", "rule_engine", "RuleEngine"))
+    RollbackEngine = registry_entry("system", "rollback_engine", "RollbackEngine")
+    MetadataIndex = registry_entry("system", "metadata_index", "MetadataIndex")
+
+    # Faces Engine (needs face_recognition + numpy + Pillow)
+    faces_mod = registry_entry("engines", "faces_engine", needs="AVAILABLE")
+    FacesEngine = getattr(faces_mod, "FacesEngine", None)
+
+    # EXIF Reader (header only), Metadata Service (exiftool / ffprobe)
+    exif_mod = registry_entry("system", "exif_reader")
+    metadata_mod = registry_entry("system", "metadata_service")
+    MetadataService = getattr(metadata_mod, "MetadataService", None)
+
+    # Near-Duplicate Engine (needs Pillow + imagehash)
+    near_dup_mod = registry_entry("engines", "near_dup_engine", needs="imagehash")
+    NearDupIndex = getattr(near_dup_mod, "NearDupIndex", None)
+
+    # Document Content Engine (needs PyPDF2 / pypdf), OCR Engine (Pillow + tesseract)
+    docs_mod = registry_entry("engines", "doc_content_engine", needs="AVAILABLE")
+    DocContentEngine = getattr(docs_mod, "DocContentEngine", None)
+    ocr_mod = registry_entry("engines", "ocr_engine", needs="AVAILABLE")
+    OCREngine = getattr(ocr_mod, "OCREngine", None)
 
-# Get Rule Engine
-rule_engine_mod = (
-    REGISTRY["engines"].get("rule_engine") or
-    REGISTRY["plugins"].get("rule_engine") or
-    REGISTRY["system"].get("rule_engine")
-)
+    ExactDupEngine = registry_entry("engines", "exact_dup_engine", "ExactDupEngine")
 
-RuleEngine = None
-if rule_engine_mod:
-    RuleEngine = getattr(rule_engine_mod, "RuleEngine", None)
+    # Move Plans (sort --plan / apply), Run Checkpoints (resumable runs);
+    # Watcher and Profiler are looked up by the modes that use them
+    plan_mod = registry_entry("system", "move_plan")
+    checkpoint_mod = registry_entry("system", "checkpoint")
+    RunCheckpoint = getattr(checkpoint_mod, "RunCheckpoint", None)
+    _RESOLVED = True
+
+
+# Run-level log lines kept in memory (per-file records live in the report)
+LOG_KEEP = 1000
+PROGRESS_EVERY = 5000
+# Watch mode: index + report flushed at most this often (seconds)
+WATCH_FLUSH = 30.0
+# Resume: walk paths checked against the checkpoint in groups of
+WALK_BATCH = 256
+# Resume: newest journal entries checked against the checkpoint
+JOURNAL_SCAN = 10000
+# Checkpointed runs: moves started together after one checkpoint commit
+MOVE_GROUP = 256
+# Profiling off: span() hands out this shared no-op context
+NULL_SPAN = nullcontext()
 
 
 class SortEngine:
     engine_name = "sort_engine"
 
-    def __init__(self, simulated=True):
+    def __init__(self, simulated=True, workers=None, use_index=True, max_copies=4,
+                 dup_threshold=6, dedup=True, report=True, verbose=False,
+                 async_io=False, limits=None, checkpoint=True, plan=None,
+                 profile=False, pstats=None, chrome_trace=None):
+        resolve_engines()
+        # sort --plan: decisions go to a plan file, nothing is moved
+        simulated = simulated or bool(plan)
         self.simulated = simulated
-        self.logs = []
+        self.async_io = async_io
+        self.limits = limits or {}
+        self.verbose = verbose
+        self.logs = deque(maxlen=LOG_KEEP)
         self.rollback_stack = []
-        self.faces_engine = REGISTRY["engines"].get("faces_engine")
+        self.faces_engine = FacesEngine() if FacesEngine else None
         self.rule_engine = RuleEngine() if RuleEngine else None
+        self.rollback_engine = RollbackEngine() if RollbackEngine and not simulated else None
+        self.index = MetadataIndex() if MetadataIndex and use_index else None
+        self.names = NameRegistry()
+        # Folders being sorted (`path_keywords` match below them)
+        self.input_roots = []
+        self.mover = MoveEngine(max_inflight=max_copies, names=self.names)
+        self.metadata = MetadataService() if MetadataService else None
+        if self.metadata and not self.metadata.available:
+            self.metadata = None
+        keywords = self.rule_engine.content_keywords() if self.rule_engine else []
+        self.docs = None
+        if DocContentEngine:
+            self.docs = DocContentEngine(keywords or docs_mod.STUDY_KEYWORDS, index=self.index)
+        self.ocr = None
+        if OCREngine:
+            self.ocr = OCREngine(keywords or ocr_mod.STUDY_KEYWORDS, index=self.index)
+        self.near_dups = NearDupIndex.load(threshold=dup_threshold) if NearDupIndex and dedup else None
+        self.exact_dups = ExactDupEngine() if ExactDupEngine and dedup else None
+        # Default: the batched engines (faces / PDF / OCR) only fill their
+        # batches and process pools with several classifier workers feeding them
+        if workers is None:
+            workers = 0 if self.batched_engines() else 1
+        self.workers = workers
+        self.duplicates = {}
+        self.pipeline = None
+        self.run_id = new_run_id()
+        self.report = RunReport(self.run_id) if report else None
+        # Nothing to resume when nothing is moved (--simulate / --plan)
+        self.use_checkpoint = checkpoint and not simulated
+        self.checkpoint = None
+        self.restored = {}
+        self.plan_path = plan
+        self.plan = None
+        self.pending = {}
+        # Moves waiting for the checkpoint commit of their destination
+        self.held = []
+        self.held_since = 0.0
+        # src -> reserved dst of moves not finished yet (held or copying)
+        self.in_flight = {}
+        self.in_flight_dsts = set()
+        self.processed = 0
+        # Run Profiler; --pstats / --chrome-trace imply --profile
+        self.profiler = None
+        Profiler = (registry_entry("system", "profiler", "Profiler")
+                    if profile or pstats or chrome_trace else None)
+        if Profiler:
+            self.profiler = Profiler(pstats_path=pstats, trace_path=chrome_trace)
 
     # --------------------------------------------------------
     # Logging
@@ -55,6 +245,27 @@ class SortEngine:
         self.logs.append(entry)
         print(entry)
 
+    def log_file(self, msg):
+        """Per-file line: the run report has the record, printed only when verbose."""
+        if self.verbose:
+            self.log(msg)
+
+    def record(self, path, outcome, tags=None, rule=None, destination=None, trace=None):
+        if self.report:
+            self.report.add(path, outcome, tags, rule, destination, trace)
+
+    def progress(self):
+        self.processed += 1
+        if self.processed % PROGRESS_EVERY == 0:
+            if self.profiler:
+                self.log(f"Processed {self.processed} files ({self.profiler.rates()})")
+            else:
+                self.log(f"Processed {self.processed} files")
+
+    def span(self, name):
+        """Timed stage for the profiler, a shared no-op when profiling is off."""
+        return self.profiler.span(name) if self.profiler else NULL_SPAN
+
     def snapshot(self, file_path):
         self.rollback_stack.append({
             "file": str(file_path),
@@ -64,29 +275,205 @@ class SortEngine:
     # --------------------------------------------------------
     # Safe move
     # --------------------------------------------------------
-    def safe_move(self, src, dst):
+    def safe_move(self, src, dst, record=None):
+        """record: report fields (outcome, tags, rule, trace) written once the move is done."""
+        with self.span("move"):
+            return self._safe_move(src, dst, record)
+
+    def _safe_move(self, src, dst, record):
         self.snapshot(src)
 
+        # Free target name (name__N.ext on collision), reserved atomically;
+        # absolute, so journal, checkpoint and near-dup index agree on it
+        target = os.path.abspath(dst)
+        dst = self.names.reserve_path(target)
+
+        # Sorted images are near-dup originals from the moment their name is
+        # reserved (on_moved renames / drops the entry if the move changes)
+        if (self.near_dups is not None and record
+                and record["outcome"] in ("moved", "simulated")
+                and (record.get("tags") or {}).get("phash") is not None):
+            self.near_dups.add(record["tags"]["phash"], dst)
+
         if self.simulated:
-            self.log(f"[SIMULATED MOVE] {src} -> {dst}")
-            return True
+            self.log_file(f"[SIMULATED MOVE] {src} -> {dst}")
+            if record:
+                self.record(src, destination=dst, **record)
+                if self.plan:
+                    # Routed target: apply reserves a free name when it runs
+                    self.add_to_plan(src, target, **record)
+            if self.checkpoint:
+                self.checkpoint.moved(src, dst)
+            return dst
 
         try:
             os.makedirs(os.path.dirname(dst), exist_ok=True)
-            os.rename(src, dst)
-            self.log(f"[MOVE] {src} -> {dst}")
-            return True
         except Exception as e:
             self.log(f"[ERROR] Failed move: {e}")
-            return False
+            self.names.release(dst)
+            if self.near_dups is not None:
+                self.near_dups.remove(dst)
+            if record:
+                self.record(src, **dict(record, outcome="failed"))
+            return None
+
+        # Renames finish inline, large cross-device copies finish later
+        if record:
+            self.pending[src] = record
+        self.in_flight[src] = dst
+        self.in_flight_dsts.add(dst)
+        if not self.checkpoint:
+            self.mover.submit(src, dst, self.on_moved)
+            return dst
+
+        # A move only starts once its destination is committed, so a resume
+        # can always tell where it went: held until the group commit
+        self.checkpoint.moving(src, dst)
+        if not self.held:
+            self.held_since = time.monotonic()
+        self.held.append((src, dst))
+        if (len(self.held) >= MOVE_GROUP
+                or time.monotonic() - self.held_since >= self.checkpoint.flush_interval):
+            self.release_moves()
+        return dst
+
+    def release_moves(self):
+        """Commit the checkpoint group, then start the moves held for it."""
+        if not self.held:
+            return
+        held, self.held = self.held, []
+        self.checkpoint.flush()
+        for src, dst in held:
+            self.mover.submit(src, dst, self.on_moved)
+
+    def alive(self, path):
+        """Near-dup originals: on disk or still on their way (simulated: never moved)."""
+        return self.simulated or path in self.in_flight_dsts or os.path.exists(path)
+
+    def add_to_plan(self, src, dst, outcome, tags=None, rule=None, trace=None):
+        # "move" / "duplicate" / "near_dup": what apply will do
+        outcome = "move" if outcome == "simulated" else outcome
+        self.plan.add(src, dst, trace.size, trace.mtime_ns, rule, outcome,
+                      key=trace.key, phash=(tags or {}).get("phash"))
+
+    def on_moved(self, src, dst, error):
+        # Mover thread only (MoveEngine runs pool completions through poll());
+        # dst is the final name (re-suffixed if the target appeared meanwhile)
+        record = self.pending.pop(src, None)
+        reserved = self.in_flight.pop(src, None)
+        self.in_flight_dsts.discard(reserved)
+        kept = isinstance(error, SourceKept)
+        if self.near_dups is not None:
+            # Near-dup originals are added when the move is queued
+            if error and not kept:
+                self.near_dups.remove(reserved)
+            elif dst != reserved:
+                self.near_dups.rename(reserved, dst)
+        if kept:
+            # The copy is at dst and keeps its name; only the source is left over
+            self.log(f"[WARN] Copied, source kept: {src} -> {dst} ({error.strerror})")
+            if record:
+                record = dict(record, outcome="source_kept")
+        elif error:
+            self.log(f"[ERROR] Failed move: {error}")
+            self.names.release(dst)
+            if record:
+                self.record(src, destination=dst, **dict(record, outcome="failed"))
+            return
+
+        else:
+            self.log_file(f"[MOVE] {src} -> {dst}")
+        if record:
+            self.record(src, destination=dst, **record)
+        if self.checkpoint:
+            self.checkpoint.moved(src, dst)
+        if self.rollback_engine:
+            self.rollback_engine.record(src, dst)
+        if self.index and not kept:
+            self.index.relocate(src, dst)
 
     # --------------------------------------------------------
     # Extract tags + metadata
     # --------------------------------------------------------
-    def classify(self, file_path):
-        tags = {}
+    def classify(self, file_path, trace=None):
+        trace = trace or FileTrace(self.profiler)
+        with self.span("stat"):
+            st = Path(file_path).stat()
+        with self.span("base"):
+            tags = self.base_tags(file_path, st, trace)
+        if trace.cached:
+            return tags
+        ext = tags["ext"]
+
+        # EXIF date / camera from the file header
+        if exif_mod and ext in exif_mod.EXIF_EXT:
+            self.tag_exif(file_path, tags, trace)
+
+        # Camera / video info (optional), exiftool only when the header had none
+        if self.needs_metadata(tags):
+            self.tag_metadata(file_path, tags, trace)
+
+        # Faces (optional), batched on the engine's own process pool
+        if self.needs_faces(tags):
+            self.tag_faces(file_path, tags, trace)
+
+        # PDF / OCR keywords (optional), cached by content hash
+        if self.needs_keywords(tags):
+            self.tag_keywords(file_path, tags, trace)
+
+        # Perceptual hash for near-duplicate detection
+        if self.needs_phash(tags):
+            self.tag_phash(file_path, tags, trace)
+
+        if self.index:
+            with self.span("index"):
+                self.index.put(file_path, st, tags=tags, category=tags["type"])
+
+        return tags
+
+    async def classify_async(self, file_path, res, trace=None):
+        """classify() on the async pipeline: each stage awaits its resource class."""
+        trace = trace or FileTrace(self.profiler)
+        with self.span("stat"):
+            st = await res.disk(os.stat, file_path)
+        with self.span("base"):
+            tags = await res.disk(self.base_tags, file_path, st, trace)
+        if trace.cached:
+            return tags
+        ext = tags["ext"]
+
+        if exif_mod and ext in exif_mod.EXIF_EXT:
+            await res.disk(self.tag_exif, file_path, tags, trace)
+        if self.needs_metadata(tags):
+            await self.tag_metadata_async(file_path, tags, trace, res)
+        if self.needs_faces(tags):
+            await res.cpu(self.tag_faces, file_path, tags, trace)
+        if self.needs_keywords(tags):
+            await res.cpu(self.tag_keywords, file_path, tags, trace)
+        if self.needs_phash(tags):
+            await res.cpu(self.tag_phash, file_path, tags, trace)
+
+        if self.index:
+            with self.span("index"):
+                await res.disk(self.index.put, file_path, st, tags, tags["type"])
+
+        return tags
+
+    def base_tags(self, file_path, st, trace):
+        """Indexed tags when the file is unchanged (trace.cached), else ext / type / date."""
         ext = Path(file_path).suffix.lower()
+        trace.size = st.st_size
+        trace.mtime_ns = st.st_mtime_ns
 
+        # Unchanged since last run -> reuse the indexed tags
+        if self.index:
+            cached = self.index.get(file_path, st)
+            if cached and cached["tags"].get("ext") == ext:
+                if not self.needs_enrichment(cached["tags"]):
+                    trace.cached = True
+                    return cached["tags"]
+
+        tags = {}
         tags["ext"] = ext
 
         # Image/video detection
@@ -98,60 +485,654 @@ class SortEngine:
             tags["type"] = "other"
 
         # Timestamp
-        ts = datetime.fromtimestamp(Path(file_path).stat().st_mtime)
+        ts = datetime.fromtimestamp(st.st_mtime)
         tags["year"] = ts.year
         tags["month"] = ts.strftime("%m")
         tags["day"] = ts.strftime("%d")
+        return tags
 
-        # Faces (optional)
-        if self.faces_engine:
-            try:
-                mod = self.faces_engine
-                if hasattr(mod, "detect_faces"):
-                    tags["faces"] = mod.detect_faces(file_path)
-            except Exception as e:
-                self.log(f"[WARN] Face engine failed: {e}")
+    # --------------------------------------------------------
+    # Extractor stages (tags updated in place)
+    # --------------------------------------------------------
+    def tag_exif(self, file_path, tags, trace):
+        with trace.stage("exif"):
+            tags.update(exif_mod.exif_tags(file_path))
 
-        return tags
+    def tag_metadata(self, file_path, tags, trace):
+        try:
+            with trace.stage("metadata"):
+                for key, value in self.metadata.tags(str(file_path), tags["type"]).items():
+                    tags.setdefault(key, value)
+        except Exception as e:
+            self.log(f"[WARN] Metadata service failed: {e}")
+
+    async def tag_metadata_async(self, file_path, tags, trace, res):
+        # exiftool requests join the service's shared batch without parking a
+        # thread; ffprobe runs as an asyncio subprocess under the tools limit
+        ffprobe = self.metadata.ffprobe
+        try:
+            with trace.stage("metadata"):
+                meta = {}
+                future = self.metadata.submit_exif(str(file_path))
+                if future is not None:
+                    meta = await asyncio.wrap_future(future)
+                info = {}
+                if tags["type"] == "video" and ffprobe:
+                    result = await res.exec(ffprobe.command(file_path), timeout=ffprobe.timeout)
+                    info = ffprobe.parse(*result) if result else {}
+            for key, value in metadata_mod.sorter_tags(meta, info).items():
+                tags.setdefault(key, value)
+        except Exception as e:
+            self.log(f"[WARN] Metadata service failed: {e}")
+
+    def tag_faces(self, file_path, tags, trace):
+        try:
+            with trace.stage("faces"):
+                tags["faces"] = self.faces_engine.faces(file_path)
+            if tags["faces"]:
+                tags["person"] = tags["faces"][0]
+        except Exception as e:
+            self.log(f"[WARN] Face engine failed: {e}")
+
+    def tag_keywords(self, file_path, tags, trace):
+        try:
+            with trace.stage("keywords"):
+                if self.docs is not None and tags["ext"] in docs_mod.DOC_EXT:
+                    result = self.docs.scan(file_path)
+                else:
+                    # None: the gate decided this is a photo
+                    result = self.ocr.scan(file_path, tags)
+            tags["keywords"] = result["keywords"] if result else []
+        except Exception as e:
+            self.log(f"[WARN] Content engine failed: {e}")
+
+    def tag_phash(self, file_path, tags, trace):
+        with trace.stage("phash"):
+            tags["phash"] = self.cpu_call(near_dup_mod.image_hash, str(file_path))
+
+    def needs_metadata(self, tags):
+        return self.metadata is not None and (
+            tags["type"] == "video" or (tags["type"] == "image" and "camera" not in tags))
+
+    def needs_enrichment(self, tags):
+        """Cached tags from a run without an optional engine -> classify again."""
+        return self.needs_phash(tags) or self.needs_faces(tags) or self.needs_keywords(tags)
+
+    def needs_phash(self, tags):
+        return (self.near_dups is not None and "phash" not in tags
+                and tags.get("ext") in near_dup_mod.IMAGE_EXT)
+
+    def needs_faces(self, tags):
+        return (self.faces_engine is not None and "faces" not in tags
+                and tags.get("ext") in faces_mod.IMAGE_EXT)
+
+    def needs_keywords(self, tags):
+        if "keywords" in tags:
+            return False
+        ext = tags.get("ext")
+        return ((self.docs is not None and ext in docs_mod.DOC_EXT) or
+                (self.ocr is not None and ext in ocr_mod.IMAGE_EXT))
+
+    def batched_engines(self):
+        return [e for e in (self.faces_engine, self.docs, self.ocr) if e is not None]
+
+    def set_producers(self, n):
+        """How many classifier threads feed the batched engines (their linger rule)."""
+        for engine in self.batched_engines():
+            engine.producers = n
+
+    def cpu_call(self, fn, *args):
+        """CPU-heavy work goes to the pipeline's process pool when running."""
+        if self.pipeline:
+            return self.pipeline.cpu_call(fn, *args)
+        return fn(*args)
 
     # --------------------------------------------------------
     # Apply rules + expand templates
     # --------------------------------------------------------
+    FALLBACK_TARGET = "sorted/other/{year}/{month}/"
+    DUPLICATE_TARGET = "sorted/duplicates/{year}/{month}/"
+    PEOPLE_TARGET = "sorted/people/{person}/{year}/"
+
     def expand_target(self, template, tags):
-        for key, value in tags.items():
-            template = template.replace(f"{{{key}}}", str(value))
-        return template
+        # Parsed once per template string, then cached
+        return compile_template(template)(tags)
 
-    def resolve_destination(self, tags, file_name):
+    def target_dir(self, template, tags):
+        with self.span("template"):
+            return intern_dir(self.expand_target(template, tags))
+
+    def route(self, tags, file_name, path=""):
+        """(destination, name of the rule that decided it)."""
         # 1) Try RuleEngine
         if self.rule_engine:
-            target = self.rule_engine.evaluate(tags)
-            if target:
-                return Path(self.expand_target(target, tags)) / file_name
+            with self.span("rules"):
+                rule = self.rule_engine.match(tags, name=file_name, path=path)
+            if rule is not None and rule.get("target"):
+                dst = self.target_dir(rule["target"], tags) / file_name
+                return dst, rule.get("name", "?")
+
+        # 2) Photos of a known person
+        if tags.get("person"):
+            return self.target_dir(self.PEOPLE_TARGET, tags) / file_name, "[people]"
+
+        # 3) Fallback – timeline sort
+        return self.target_dir(self.FALLBACK_TARGET, tags) / file_name, "[fallback]"
+
+    def resolve_destination(self, tags, file_name, path=""):
+        return self.route(tags, file_name, path)[0]
+
+    # --------------------------------------------------------
+    # Pipeline stages
+    # --------------------------------------------------------
+    def rel_path(self, file):
+        """Path below its input folder, from the separator on (what `path_keywords` see)."""
+        path = os.path.abspath(file)
+        for root in self.input_roots:
+            if path.startswith(root + os.sep):
+                return path[len(root):]
+        return path
+
+    def walk(self, input_folder, skip=()):
+        # Streaming scandir walk, same selection as rglob("*.*")
+        yield from iter_files(input_folder, skip=skip, match=has_suffix)
+
+    def process_file(self, file):
+        """Classifier stage (worker thread): tags, destination, rule, timings."""
+        trace = FileTrace(self.profiler)
+        try:
+            result = self.restore(file, trace)
+            if result is None:
+                tags = self.classify(file, trace)
+                dst, rule = self.route(tags, file.name, self.rel_path(file))
+                trace.finish()
+                if self.checkpoint:
+                    self.checkpoint.classified(file, trace.size, trace.mtime_ns, tags, dst, rule)
+                result = tags, dst, rule, trace
+            if self.plan:
+                trace.key = plan_mod.content_key(file, trace.size)
+            return result
+        except Exception as e:
+            self.log(f"[ERROR] Failed to classify {file}: {e}")
+            self.record(file, "error", trace=trace)
+            return None
+
+    async def process_file_async(self, file, res):
+        """Classifier stage on the async pipeline."""
+        trace = FileTrace(self.profiler)
+        try:
+            result = await res.disk(self.restore, file, trace)
+            if result is None:
+                tags = await self.classify_async(file, res, trace)
+                dst, rule = self.route(tags, file.name, self.rel_path(file))
+                trace.finish()
+                if self.checkpoint:
+                    self.checkpoint.classified(file, trace.size, trace.mtime_ns, tags, dst, rule)
+                result = tags, dst, rule, trace
+            if self.plan:
+                trace.key = await res.disk(plan_mod.content_key, file, trace.size)
+            return result
+        except Exception as e:
+            self.log(f"[ERROR] Failed to classify {file}: {e}")
+            self.record(file, "error", trace=trace)
+            return None
+
+    def restore(self, file, trace):
+        """Result from the checkpoint of a resumed run, if the file is unchanged since."""
+        row = self.restored.pop(str(file), None) if self.restored else None
+        if row is None or row["tags"] is None:
+            return None
+        try:
+            st = os.stat(file)
+        except OSError:
+            return None
+        if (st.st_size, st.st_mtime_ns) != (row["size"], row["mtime_ns"]):
+            return None
+        trace.size = st.st_size
+        trace.mtime_ns = st.st_mtime_ns
+        trace.cached = True
+        trace.finish()
+        return row["tags"], Path(row["dst"]), row["rule"], trace
+
+    def move_file(self, file, result):
+        """Mover stage (single thread): keeps moves + rollback ordered."""
+        self.progress()
+        if result is None:
+            return
+        tags, dst, rule, trace = result
+        record = {"tags": tags, "rule": rule, "trace": trace}
+        if self.profiler:
+            self.profiler.file_done(trace.size)
 
-        # 2) Fallback – timeline sort
-        fallback = f"sorted/other/{tags['year']}/{tags['month']}/"
-        return Path(fallback) / file_name
+        original = self.duplicates.get(str(file))
+        if original:
+            self.log_file(f"[DUPLICATE] {file} == {original}")
+            self.move_duplicate(file, tags, dict(record, outcome="duplicate"))
+            return
+
+        # Near-duplicate check runs here so "first seen wins" follows walk order
+        phash = tags.get("phash") if self.near_dups is not None else None
+        if phash is not None:
+            with self.span("near_dup"):
+                # Originals that are gone (rolled back, deleted) don't count
+                match = self.near_dups.closest(phash, alive=self.alive)
+            if match:
+                original, distance = match
+                self.log_file(f"[NEAR-DUP] {file} ~ {original} ({distance} bits)")
+                self.move_duplicate(file, tags, dict(record, outcome="near_dup"))
+                return
+
+        outcome = "simulated" if self.simulated else "moved"
+        self.safe_move(str(file), str(dst), dict(record, outcome=outcome))
+
+    def move_duplicate(self, file, tags, record=None):
+        dst = self.target_dir(self.DUPLICATE_TARGET, tags) / file.name
+        self.safe_move(str(file), str(dst), record)
+
+    def find_duplicates(self, input_folder):
+        """Exact-dup pre-pass: sizes from one scandir walk, hashes only for collisions."""
+        def sizes():
+            for entry in iter_entries(input_folder, match=has_suffix):
+                try:
+                    yield entry.path, entry.stat().st_size
+                except OSError:
+                    continue
+
+        self.duplicates = self.exact_dups.find(sizes())
+        self.log(f"Exact duplicates: {self.exact_dups.stats()}")
+
+    def close(self, completed=False):
+        """Finish pending moves, stop helper processes, flush index + report + checkpoint."""
+        with self.span("move_wait"):
+            self.release_moves()
+            self.mover.close()
+        if self.metadata:
+            self.metadata.close()
+        if self.faces_engine:
+            self.faces_engine.close()
+        if self.docs:
+            self.docs.close()
+            self.log(f"Documents: {self.docs.stats()}")
+        if self.ocr:
+            self.ocr.close()
+            self.log(f"OCR: {self.ocr.stats()}")
+        if not self.simulated:
+            self.log(f"Moves: {self.mover.summary()}")
+        if self.rollback_engine:
+            self.rollback_engine.close()
+        if self.index:
+            self.index.flush()
+            self.log(f"Metadata index: {self.index.stats()}")
+        if self.near_dups is not None:
+            if not self.simulated:
+                self.near_dups.save()
+            self.log(f"Near-duplicate index: {len(self.near_dups)} hashes")
+        if self.report:
+            self.report.close()
+            self.log(f"Run report: {self.report.path} ({self.report.rows} files)")
+        if self.plan:
+            self.plan.close()
+            self.log(f"Move plan: {self.plan.path} ({self.plan.rows} moves)")
+            self.plan = None
+        if self.checkpoint:
+            if completed:
+                self.checkpoint.finish()
+            else:
+                self.log(f"Checkpoint: {self.checkpoint.counts()} "
+                         f"(resume with: omni.py sort --resume {self.run_id})")
+            self.checkpoint.close()
+            self.checkpoint = None
+        if self.profiler:
+            for path in self.profiler.stop():
+                self.log(f"Profile written: {path}")
+            self.profiler.print_summary()
+
+    # --------------------------------------------------------
+    # Checkpoints / resume
+    # --------------------------------------------------------
+    def open_checkpoint(self, input_folder):
+        self.checkpoint = RunCheckpoint(self.run_id)
+        self.checkpoint.start(input_folder, self.simulated)
+        if self.rollback_engine:
+            self.rollback_engine.on_flush = self.checkpoint.journaled
+        self.log(f"Run id: {self.run_id}")
+
+    def open_resume(self, run_id):
+        """Checkpoint of an unfinished run -> its input folder (None if it can't resume)."""
+        if RunCheckpoint is None:
+            self.log("[ERROR] Checkpoint module not loaded.")
+            return None
+        if self.simulated:
+            self.log("[ERROR] Simulated runs keep no checkpoint, resume a real run.")
+            return None
+        if run_id == "latest":
+            run_id = checkpoint_mod.latest_unfinished()
+            if run_id is None:
+                self.log("[ERROR] No unfinished run to resume.")
+                return None
+
+        checkpoint = RunCheckpoint(run_id)
+        info = checkpoint.info()
+        error = None
+        if info is None:
+            error = f"[ERROR] Unknown run id: {run_id}"
+        elif info["finished"]:
+            error = f"[ERROR] Run {run_id} already completed ({info['finished']})."
+        elif info["simulated"]:
+            # Left by an older version that checkpointed simulated runs
+            error = f"[ERROR] Run {run_id} was simulated, nothing to resume."
+        if error:
+            self.log(error)
+            checkpoint.close()
+            return None
+
+        self.run_id = run_id
+        self.checkpoint = checkpoint
+        if self.rollback_engine:
+            self.rollback_engine.on_flush = checkpoint.journaled
+        resumes = checkpoint.resumed()
+        if self.report:
+            self.report = RunReport(f"{run_id}-r{resumes}")
+        self.log(f"Resuming run {run_id} (resume #{resumes}): {checkpoint.counts()}")
+        self.reconcile()
+        return info["input"]
+
+    def reconcile(self):
+        """Settle what the interrupted run left half-done before sorting on."""
+        checkpoint = self.checkpoint
+
+        # Near-duplicate hashes of files already sorted (index is saved at close only)
+        if self.near_dups is not None:
+            for row in checkpoint.moved_rows():
+                phash = (row["tags"] or {}).get("phash")
+                if phash is not None and row["final"]:
+                    self.near_dups.add(phash, os.path.abspath(row["final"]))
+
+        if self.simulated:
+            return
+
+        # The journal is fsynced on its own schedule: moves it has from this
+        # run count even if their checkpoint update was lost
+        journal = {}
+        started = checkpoint.info()["started"]
+        if self.rollback_engine and self.rollback_engine.log_file.exists():
+            for entry in self.rollback_engine.load_reversed():
+                if entry.get("timestamp", "") < started or len(journal) >= JOURNAL_SCAN:
+                    break
+                journal.setdefault(entry.get("before"), entry.get("after"))
+        for src, final in journal.items():
+            checkpoint.journaled_move(src, final)
+
+        # Moves started but never confirmed
+        finished = 0
+        for row in checkpoint.interrupted():
+            src, final = row["path"], row["final"]
+            if not os.path.exists(final):
+                continue  # never happened: sorted again
+            if os.path.exists(src):
+                # Copy completed, source not removed yet -> only if identical
+                if (os.path.getsize(src) != os.path.getsize(final)
+                        or full_digest(src) != full_digest(final)):
+                    continue
+                os.unlink(src)
+            checkpoint.moved(src, final)
+            finished += 1
+        if finished:
+            self.log(f"[RESUME] {finished} interrupted move(s) completed")
+
+        # Moved, but the journal entry never reached the disk
+        missing = [(row["path"], row["final"]) for row in checkpoint.unjournaled()]
+        if missing and self.rollback_engine:
+            for src, final in missing:
+                self.rollback_engine.record(src, final)
+            self.log(f"[RESUME] {len(missing)} rollback entr(ies) re-journaled")
+
+    def checkpointed_walk(self, input_folder, resuming=False):
+        """Unfinished files of the checkpoint first, then the tree not discovered yet."""
+        checkpoint = self.checkpoint
+        if resuming:
+            for row in checkpoint.pending():
+                if row["state"] == checkpoint_mod.CLASSIFIED:
+                    self.restored[row["path"]] = row
+                yield Path(row["path"])
+            if checkpoint.info()["walked"]:
+                return
+
+        # Files sorted before the interruption have left the tree already
+        batch = []
+        for path in self.walk(input_folder):
+            batch.append(path)
+            if len(batch) >= WALK_BATCH:
+                yield from self.discover(batch, resuming)
+                batch = []
+        yield from self.discover(batch, resuming)
+        checkpoint.walk_done()
+
+    def discover(self, paths, resuming):
+        new = self.checkpoint.unknown(paths) if resuming else [str(p) for p in paths]
+        self.checkpoint.discovered(new)
+        return [Path(p) for p in new]
+
+    # --------------------------------------------------------
+    # Move plans
+    # --------------------------------------------------------
+    def apply(self, plan_path):
+        """
+        Execute a plan from `sort --plan` without classifying: unchanged
+        sources only, free names reserved in the target folders as they are now.
+        """
+        try:
+            header, records = plan_mod.read_plan(plan_path)
+        except plan_mod.PlanError as e:
+            self.log(f"[ERROR] {e}")
+            return
+        self.log(f"Applying plan {plan_path} (run {header.get('run_id')}, "
+                 f"created {header.get('created')}, simulated={self.simulated})")
+
+        skipped = {"missing": 0, "changed": 0}
+        completed = False
+        try:
+            for rec in records:
+                self.progress()
+                src = rec["src"]
+                trace = FileTrace()
+                try:
+                    st = os.stat(src)
+                except OSError:
+                    skipped["missing"] += 1
+                    self.record(src, "missing", rule=rec["rule"], trace=trace)
+                    continue
+                trace.size = st.st_size
+                trace.mtime_ns = st.st_mtime_ns
+                trace.cached = True
+                trace.finish()
+                if (st.st_size, st.st_mtime_ns) != (rec["size"], rec["mtime_ns"]):
+                    # Changed since the plan was made: its decision may be stale
+                    skipped["changed"] += 1
+                    self.log_file(f"[CHANGED] {src}, skipped")
+                    self.record(src, "changed", rule=rec["rule"], trace=trace)
+                    continue
+
+                outcome = rec["outcome"]
+                if outcome not in ("duplicate", "near_dup"):
+                    outcome = "simulated" if self.simulated else "moved"
+                tags = {"phash": rec["phash"]} if "phash" in rec else {}
+                self.safe_move(src, rec["dst"], {"outcome": outcome, "tags": tags,
+                                                 "rule": rec["rule"], "trace": trace})
+            completed = True
+        finally:
+            self.close(completed)
+
+        if skipped["missing"] or skipped["changed"]:
+            self.log(f"Plan: {skipped['changed']} changed, {skipped['missing']} missing "
+                     f"source(s) skipped")
+        return self.logs, self.rollback_stack
+
+    # --------------------------------------------------------
+    # Watch mode
+    # --------------------------------------------------------
+    def target_roots(self):
+        """Fixed leading folders of every destination template (never watched)."""
+        templates = [self.FALLBACK_TARGET, self.DUPLICATE_TARGET, self.PEOPLE_TARGET]
+        if self.rule_engine:
+            templates += [r.get("target") for r in self.rule_engine.rules
+                          if isinstance(r.get("target"), str)]
+        roots = set()
+        for template in templates:
+            fixed = []
+            for part in Path(template).parts:
+                if "{" in part:
+                    break
+                fixed.append(part)
+            root = Path(*fixed) if fixed else None
+            if root is not None and root != Path(root.anchor):
+                roots.add(root.resolve())
+        return roots
+
+    def watch(self, input_folders, settle=None, poll=False, interval=None, existing=False,
+              stop=None):
+        """Sort files as they arrive: micro-batches from the Watcher through the pipeline."""
+        Watcher = registry_entry("system", "watcher", "Watcher")
+        if Watcher is None:
+            self.log("[ERROR] Watcher module not loaded.")
+            return
+
+        folders = [Path(f) for f in input_folders]
+        self.input_roots = [os.path.abspath(f) for f in folders]
+        missing = [str(f) for f in folders if not f.is_dir()]
+        if missing:
+            self.log(f"[ERROR] Input folder missing: {', '.join(missing)}")
+            return
+
+        options = {"poll": poll, "existing": existing}
+        if settle is not None:
+            options["settle"] = settle
+        if interval is not None:
+            options["interval"] = interval
+
+        cpu_workers = 0
+        if self.near_dups is not None:
+            cpu_workers = os.cpu_count() or 1
+
+        watcher = Watcher(folders, skip=self.target_roots(), **options)
+        self.log(f"Watching {len(folders)} folder(s), {watcher.watched} directories "
+                 f"({watcher.mode}, simulated={self.simulated})")
+        last_flush = time.monotonic()
+
+        with SortPipeline(self.workers, cpu_workers=cpu_workers) as pipeline:
+            self.pipeline = pipeline
+            self.set_producers(pipeline.workers)
+            try:
+                for batch in watcher.batches(stop):
+                    if self.exact_dups:
+                        # Duplicates within the batch; earlier arrivals are already sorted
+                        self.duplicates = self.exact_dups.find(self.sizes(batch))
+                    pipeline.run(batch, self.process_file, self.move_file)
+                    # Large copies of this batch that finished meanwhile
+                    self.mover.poll()
+                    self.log(f"[WATCH] {len(batch)} file(s) sorted")
+
+                    if time.monotonic() - last_flush >= WATCH_FLUSH:
+                        last_flush = time.monotonic()
+                        if self.index:
+                            self.index.flush()
+                        if self.report:
+                            self.report.flush()
+            except KeyboardInterrupt:
+                self.log("Watch stopped.")
+            finally:
+                watcher.close()
+                self.pipeline = None
+                self.close()
+
+        return self.logs, self.rollback_stack
+
+    @staticmethod
+    def sizes(paths):
+        for p in paths:
+            try:
+                yield str(p), os.stat(p).st_size
+            except OSError:
+                continue
 
     # --------------------------------------------------------
     # Main entry
     # --------------------------------------------------------
-    def run(self, input_folder):
+    def run(self, input_folder=None, resume=None):
+        """resume: run id of an interrupted run ("latest" = newest unfinished)."""
         self.log(f"SortEngine Phase 6 started (simulated={self.simulated})")
 
+        if resume:
+            input_folder = self.open_resume(resume)
+            if input_folder is None:
+                return
+
         input_folder = Path(input_folder)
+        self.input_roots = [os.path.abspath(input_folder)]
         if not input_folder.exists():
             self.log("[ERROR] Input folder missing.")
+            if self.checkpoint:
+                self.checkpoint.close()
+                self.checkpoint = None
             return
 
-        for file in input_folder.rglob("*.*"):
-            if file.is_dir():
-                continue
+        if not resume and self.use_checkpoint and RunCheckpoint:
+            self.open_checkpoint(input_folder)
+        if self.plan_path:
+            self.plan = plan_mod.PlanWriter(self.plan_path, self.run_id, input_folder)
+        if self.profiler:
+            self.profiler.start()
 
-            tags = self.classify(file)
-            dst = self.resolve_destination(tags, file.name)
+        if self.exact_dups:
+            if resume:
+                # Decided before the interruption; originals may have moved since
+                self.duplicates = self.checkpoint.load_duplicates()
+            else:
+                with self.span("exact_dups"):
+                    self.find_duplicates(input_folder)
+                if self.checkpoint:
+                    self.checkpoint.save_duplicates(self.duplicates)
 
-            self.safe_move(str(file), str(dst))
+        paths = self.walk(input_folder)
+        if self.checkpoint:
+            paths = self.checkpointed_walk(input_folder, resuming=bool(resume))
+        if self.profiler:
+            paths = self.profiler.iter_timed("walk", paths)
+
+        cpu_workers = 0
+        if self.near_dups is not None:
+            cpu_workers = os.cpu_count() or 1
+
+        move = self.move_file
+        if self.async_io:
+            pipeline = AsyncSortPipeline(self.limits, cpu_workers=cpu_workers)
+            classify = self.process_file_async
+        else:
+            pipeline = SortPipeline(self.workers, cpu_workers=cpu_workers)
+            classify = self.process_file
+        if self.profiler:
+            # --pstats: worker / mover threads get their own cProfile (the
+            # async executors are not covered, only the event loop)
+            move = self.profiler.profiled(move)
+            if not self.async_io:
+                classify = self.profiler.profiled(classify)
+
+        with pipeline:
+            self.pipeline = pipeline
+            if self.async_io:
+                self.set_producers(pipeline.limits["cpu"])
+                self.log("Async pipeline limits: " +
+                         ", ".join(f"{k}={v}" for k, v in pipeline.limits.items()))
+            else:
+                self.set_producers(pipeline.workers)
+                self.log(f"Pipeline workers: {pipeline.workers}")
+            completed = False
+            try:
+                pipeline.run(paths, classify, move)
+                completed = True
+            finally:
+                self.pipeline = None
+                self.close(completed)
 
         self.log("SortEngine Phase 6 completed.")
         return self.logs, self.rollback_stack
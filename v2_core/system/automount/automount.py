@@ -1,67 +1,279 @@
 ﻿"""
-InteliOmniSorter - Automount V3 (Fixed Root)
+InteliOmniSorter - Automount V4 (Cached Registry)
+
+- Discovers engines / plugins / system modules from their REGISTER block
+- REGISTER is read with ast, modules are NOT executed during discovery
+- Discovery results are cached per file (path + mtime + size)
+- Modules are imported lazily on first registry access
+- mount_all() is memoized, engines may call it at import time safely
 """
 
+import ast
+import json
+import os
+import sys
+import threading
 import importlib.util
+from collections.abc import MutableMapping
 from pathlib import Path
 
 # Correct root: CleanRoot/
 ROOT = Path(__file__).resolve().parents[3]
 
+CACHE_FILE = ROOT / "v2_core" / "temp" / "automount_cache.json"
+CACHE_VERSION = 1
+
+SECTIONS = {
+    "engines": ("engines", ["__init__.py", "automount.py"]),
+    "plugins": ("plugins", ["__init__.py"]),
+    "system": ("system", ["__init__.py", "automount.py"]),
+}
+
+_REGISTRY = None
+_MOUNT_LOCK = threading.RLock()
+
+
+def module_name_for(path):
+    """Dotted import name for a file under ROOT (v2_core.engines.x.y)."""
+    path = Path(path).resolve()
+    try:
+        rel = path.relative_to(ROOT).with_suffix("")
+    except ValueError:
+        return path.stem
+    return ".".join(rel.parts)
+
+
 def load_module(path):
+    """
+    Execute a module file once. The module is registered in sys.modules
+    under its dotted name, so a later `import v2_core...` returns the
+    same object instead of a second copy.
+    """
+    name = module_name_for(path)
+    if name in sys.modules:
+        return sys.modules[name]
+
     print(f"[AutoMount] Loading: {path}")
-    spec = importlib.util.spec_from_file_location(path.stem, path)
+    spec = importlib.util.spec_from_file_location(name, path)
     module = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(module)
+    sys.modules[name] = module
+    try:
+        spec.loader.exec_module(module)
+    except BaseException:
+        sys.modules.pop(name, None)
+        raise
     return module
 
-def mount_all():
-    base = ROOT / "v2_core"
 
-    registry = {
-        "engines": {},
-        "plugins": {},
-        "system": {}
-    }
+def read_register(path):
+    """
+    Return the literal REGISTER dict of a module without executing it.
+    Returns None when the module has no REGISTER, or "dynamic" when
+    REGISTER exists but is not a plain literal.
+    """
+    try:
+        source = Path(path).read_text(encoding="utf-8-sig")
+        tree = ast.parse(source, filename=str(path))
+    except (OSError, SyntaxError, ValueError) as e:
+        print(f"[AutoMount] Cannot parse {path}: {e}")
+        return None
 
-    print(f"[AutoMount] Root = {ROOT}")
-    print(f"[AutoMount] Base = {base}")
+    for node in tree.body:
+        if isinstance(node, ast.Assign):
+            targets = node.targets
+        elif isinstance(node, ast.AnnAssign) and node.value is not None:
+            targets = [node.target]
+        else:
+            continue
 
-    # ---- LOAD ENGINES ----
-    engines_dir = base / "engines"
-    print(f"[AutoMount] Scanning engines: {engines_dir}")
+        if any(isinstance(t, ast.Name) and t.id == "REGISTER" for t in targets):
+            try:
+                value = ast.literal_eval(node.value)
+            except ValueError:
+                return "dynamic"
+            if isinstance(value, dict) and "name" in value:
+                return value
+            return "dynamic"
 
-    if engines_dir.exists():
-        for file in engines_dir.rglob("*.py"):
-            if file.name in ["__init__.py", "automount.py"]:
-                continue
-            mod = load_module(file)
-            if hasattr(mod, "REGISTER"):
-                name = mod.REGISTER["name"]
-                print(f"[AutoMount] Engine registered: {name}")
-                registry["engines"][name] = mod
-    else:
-        print(f"[ERROR] Engines path does NOT exist: {engines_dir}")
-
-    # ---- LOAD PLUGINS ----
-    plugins_dir = base / "plugins"
-    if plugins_dir.exists():
-        for file in plugins_dir.rglob("*.py"):
-            if file.name == "__init__.py":
-                continue
-            mod = load_module(file)
-            if hasattr(mod, "REGISTER"):
-                registry["plugins"][mod.REGISTER['name']] = mod
-
-    # ---- LOAD SYSTEM MODULES ----
-    system_dir = base / "system"
-    if system_dir.exists():
-        for file in system_dir.rglob("*.py"):
-            if file.name in ["__init__.py", "automount.py"]:
+    return None
+
+
+# --------------------------------------------------------
+# Lazy registry section
+# --------------------------------------------------------
+class LazyRegistry(MutableMapping):
+    """
+    name -> module mapping. Holds only file paths until an entry is
+    touched, then imports the module and keeps it.
+    """
+
+    def __init__(self):
+        self._paths = {}
+        self._modules = {}
+        self._meta = {}
+
+    def add(self, name, path, meta=None):
+        self._paths[name] = Path(path)
+        self._meta[name] = meta or {}
+
+    def path_of(self, name):
+        return self._paths.get(name)
+
+    def meta(self, name):
+        return self._meta.get(name, {})
+
+    def is_loaded(self, name):
+        return name in self._modules
+
+    def __getitem__(self, name):
+        mod = self._modules.get(name)
+        if mod is not None:
+            return mod
+
+        path = self._paths[name]
+        with _MOUNT_LOCK:
+            mod = self._modules.get(name)
+            if mod is None:
+                mod = load_module(path)
+                self._modules[name] = mod
+        return mod
+
+    def __setitem__(self, name, module):
+        self._modules[name] = module
+        if name not in self._paths and getattr(module, "__file__", None):
+            self._paths[name] = Path(module.__file__)
+
+    def __delitem__(self, name):
+        self._paths.pop(name, None)
+        self._meta.pop(name, None)
+        self._modules.pop(name, None)
+
+    def __contains__(self, name):
+        return name in self._paths or name in self._modules
+
+    def __iter__(self):
+        return iter(dict.fromkeys([*self._paths, *self._modules]))
+
+    def __len__(self):
+        return len(set(self._paths) | set(self._modules))
+
+    def __repr__(self):
+        state = {n: ("loaded" if n in self._modules else "lazy") for n in self}
+        return f"LazyRegistry({state})"
+
+
+# --------------------------------------------------------
+# Discovery cache
+# --------------------------------------------------------
+def load_cache():
+    try:
+        with open(CACHE_FILE, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+    if data.get("version") != CACHE_VERSION or data.get("root") != str(ROOT):
+        return {}
+    return data.get("modules", {})
+
+
+def save_cache(modules):
+    data = {"version": CACHE_VERSION, "root": str(ROOT), "modules": modules}
+    tmp = CACHE_FILE.with_suffix(".tmp")
+    try:
+        CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp, CACHE_FILE)
+    except (OSError, TypeError, ValueError) as e:
+        print(f"[AutoMount] Could not write registry cache: {e}")
+
+
+def scan_section(directory, skip, cache, fresh):
+    """
+    Collect (path, register) for every module in directory. Uses the cache
+    entry when mtime and size are unchanged, otherwise parses the file.
+    Returns (found, number of files that had to be parsed).
+    """
+    parsed = 0
+    found = []
+
+    for file in sorted(directory.rglob("*.py")):
+        if file.name in skip:
+            continue
+
+        try:
+            st = file.stat()
+        except OSError:
+            continue
+
+        key = file.relative_to(ROOT).as_posix()
+        entry = cache.get(key)
+        if entry and entry["mtime_ns"] == st.st_mtime_ns and entry["size"] == st.st_size:
+            register = entry["register"]
+        else:
+            register = read_register(file)
+            parsed += 1
+
+        fresh[key] = {
+            "mtime_ns": st.st_mtime_ns,
+            "size": st.st_size,
+            "register": register,
+        }
+        if register is not None:
+            found.append((file, register))
+
+    return found, parsed
+
+
+def mount_all(refresh=False):
+    """
+    Build (or return the memoized) registry:
+        {"engines": LazyRegistry, "plugins": LazyRegistry, "system": LazyRegistry}
+    refresh=True forces a rescan of the module tree.
+    """
+    global _REGISTRY
+
+    with _MOUNT_LOCK:
+        if _REGISTRY is not None and not refresh:
+            return _REGISTRY
+
+        base = ROOT / "v2_core"
+        print(f"[AutoMount] Root = {ROOT}")
+        print(f"[AutoMount] Base = {base}")
+
+        cache = {} if refresh else load_cache()
+        fresh = {}
+        parsed = 0
+        registry = {section: LazyRegistry() for section in SECTIONS}
+
+        for section, (folder, skip) in SECTIONS.items():
+            directory = base / folder
+            if not directory.exists():
+                if section == "engines":
+                    print(f"[ERROR] Engines path does NOT exist: {directory}")
                 continue
-            mod = load_module(file)
-            if hasattr(mod, "REGISTER"):
-                registry["system"][mod.REGISTER['name']] = mod
 
-    print("[AutoMount] DONE.")
-    return registry
+            found, n = scan_section(directory, skip, cache, fresh)
+            parsed += n
+
+            for file, register in found:
+                if register == "dynamic":
+                    # REGISTER is computed at import time, so execute it now
+                    mod = load_module(file)
+                    register = getattr(mod, "REGISTER", None)
+                    if not register:
+                        continue
+                    registry[section][register["name"]] = mod
+                else:
+                    registry[section].add(register["name"], file, register)
+
+                if section == "engines":
+                    print(f"[AutoMount] Engine registered: {register['name']}")
+
+        if parsed or fresh.keys() != cache.keys():
+            save_cache(fresh)
+
+        print(f"[AutoMount] DONE. ({parsed} parsed, {len(fresh) - parsed} cached)")
+        _REGISTRY = registry
+        return registry
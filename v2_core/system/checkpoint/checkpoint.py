@@ -0,0 +1,331 @@
+"""
+InteliOmniSorter - Run Checkpoints
+
+Persistent work queue for one sort run, so a crashed / killed run can be
+resumed (`omni.py sort --resume <run-id>`):
+- per-file state: discovered -> classified -> moved -> journaled
+- classified rows keep tags, route destination and rule: a resumed run
+  moves them without classifying again (if size / mtime are unchanged)
+- the final destination goes into the group commit, and the sorter only
+  starts a move once that group is committed (moves start in groups), so
+  interrupted moves can be told apart from files that were never moved
+- exact-duplicate decisions are stored once, not recomputed
+- SQLite in the repository root (not the cwd), writes grouped into one
+  commit per batch / interval (like the rollback journal)
+- rows of a finished run are dropped, the run row stays
+- simulated runs (--simulate / --plan) move nothing and keep no checkpoint
+
+Loaded automatically via Automount V2.
+"""
+
+REGISTER = {
+    "name": "checkpoint",
+    "type": "system"
+}
+
+import json
+import time
+import sqlite3
+import threading
+from pathlib import Path
+from datetime import datetime
+
+ROOT = Path(__file__).resolve().parents[3]
+
+DEFAULT_DB = "run_checkpoints.db"
+
+DISCOVERED = 0
+CLASSIFIED = 1
+MOVED = 2
+JOURNALED = 3
+
+STATE_NAMES = {DISCOVERED: "discovered", CLASSIFIED: "classified",
+               MOVED: "moved", JOURNALED: "journaled"}
+
+PAGE = 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    input TEXT,
+    simulated INTEGER,
+    started_ts TEXT,
+    finished_ts TEXT,
+    walked INTEGER DEFAULT 0,
+    resumes INTEGER DEFAULT 0,
+    files INTEGER DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS files (
+    run_id TEXT,
+    path TEXT,
+    seq INTEGER,
+    state INTEGER,
+    size INTEGER,
+    mtime_ns INTEGER,
+    tags_json TEXT,
+    dst TEXT,
+    rule TEXT,
+    final TEXT,
+    PRIMARY KEY (run_id, path)
+);
+CREATE INDEX IF NOT EXISTS idx_files_seq ON files(run_id, seq);
+CREATE TABLE IF NOT EXISTS duplicates (
+    run_id TEXT,
+    path TEXT,
+    original TEXT,
+    PRIMARY KEY (run_id, path)
+);
+"""
+
+
+def resolve_db(path=None):
+    """path, else the default; relative to ROOT, not the cwd."""
+    db_path = Path(path or DEFAULT_DB)
+    return db_path if db_path.is_absolute() else ROOT / db_path
+
+
+def list_runs(db_path=None):
+    """[{run_id, input, simulated, started, finished, resumes, files}] oldest first."""
+    db_path = resolve_db(db_path)
+    if not db_path.exists():
+        return []
+    conn = sqlite3.connect(str(db_path))
+    try:
+        rows = conn.execute(
+            "SELECT run_id, input, simulated, started_ts, finished_ts, resumes, files "
+            "FROM runs ORDER BY started_ts"
+        ).fetchall()
+    except sqlite3.Error:
+        return []
+    finally:
+        conn.close()
+    keys = ("run_id", "input", "simulated", "started", "finished", "resumes", "files")
+    return [dict(zip(keys, row)) for row in rows]
+
+
+def latest_unfinished(db_path=None):
+    runs = [r for r in list_runs(db_path) if not r["finished"] and not r["simulated"]]
+    return runs[-1]["run_id"] if runs else None
+
+
+class RunCheckpoint:
+    engine_name = "checkpoint"
+
+    def __init__(self, run_id, db_path=None, batch_size=500, flush_interval=1.0):
+        self.run_id = run_id
+        self.db_path = resolve_db(db_path)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self.ops = []
+        self.last_flush = time.monotonic()
+        self.lock = threading.Lock()
+
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+        row = self.conn.execute("SELECT MAX(seq) FROM files WHERE run_id=?",
+                                (run_id,)).fetchone()
+        self.seq = (row[0] + 1) if row and row[0] is not None else 0
+
+    # --------------------------------------------------------
+    # Run
+    # --------------------------------------------------------
+    def start(self, input_folder, simulated):
+        now = datetime.now().isoformat(timespec="seconds")
+        with self.lock:
+            self.conn.execute(
+                "INSERT INTO runs (run_id, input, simulated, started_ts) VALUES (?, ?, ?, ?)",
+                (self.run_id, str(Path(input_folder).resolve()), int(bool(simulated)), now),
+            )
+            self.conn.commit()
+
+    def info(self):
+        """Run row, None for an unknown run id."""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT input, simulated, started_ts, finished_ts, walked, resumes "
+                "FROM runs WHERE run_id=?",
+                (self.run_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        return {"input": row[0], "simulated": bool(row[1]), "started": row[2],
+                "finished": row[3], "walked": bool(row[4]), "resumes": row[5]}
+
+    def resumed(self):
+        """Count one more resume, return the new count."""
+        with self.lock:
+            self.conn.execute("UPDATE runs SET resumes = resumes + 1 WHERE run_id=?",
+                              (self.run_id,))
+            self.conn.commit()
+            return self.conn.execute("SELECT resumes FROM runs WHERE run_id=?",
+                                     (self.run_id,)).fetchone()[0]
+
+    def walk_done(self):
+        self.queue("UPDATE runs SET walked=1 WHERE run_id=?", (self.run_id,))
+        self.flush()
+
+    def finish(self):
+        """Run completed: drop the per-file rows, keep the run row."""
+        now = datetime.now().isoformat(timespec="seconds")
+        with self.lock:
+            self._flush_locked()
+            files = self.conn.execute("SELECT COUNT(*) FROM files WHERE run_id=?",
+                                      (self.run_id,)).fetchone()[0]
+            self.conn.execute("UPDATE runs SET finished_ts=?, files=? WHERE run_id=?",
+                              (now, files, self.run_id))
+            self.conn.execute("DELETE FROM files WHERE run_id=?", (self.run_id,))
+            self.conn.execute("DELETE FROM duplicates WHERE run_id=?", (self.run_id,))
+            self.conn.commit()
+
+    # --------------------------------------------------------
+    # Grouped writes
+    # --------------------------------------------------------
+    def queue(self, sql, params):
+        with self.lock:
+            self.ops.append((sql, params))
+            if (len(self.ops) >= self.batch_size
+                    or time.monotonic() - self.last_flush >= self.flush_interval):
+                self._flush_locked()
+
+    def _flush_locked(self):
+        if self.ops:
+            with self.conn:
+                for sql, params in self.ops:
+                    self.conn.execute(sql, params)
+            self.ops.clear()
+        self.last_flush = time.monotonic()
+
+    def flush(self):
+        with self.lock:
+            self._flush_locked()
+
+    def close(self):
+        with self.lock:
+            self._flush_locked()
+            self.conn.close()
+
+    # --------------------------------------------------------
+    # State transitions
+    # --------------------------------------------------------
+    def discovered(self, paths):
+        with self.lock:
+            rows = []
+            for path in paths:
+                rows.append((self.run_id, str(path), self.seq, DISCOVERED))
+                self.seq += 1
+            # Part of the same group commit as the other transitions
+            self.ops.extend(
+                ("INSERT OR IGNORE INTO files (run_id, path, seq, state) VALUES (?, ?, ?, ?)", r)
+                for r in rows
+            )
+            if len(self.ops) >= self.batch_size:
+                self._flush_locked()
+
+    def classified(self, path, size, mtime_ns, tags, dst, rule):
+        self.queue(
+            "UPDATE files SET state=?, size=?, mtime_ns=?, tags_json=?, dst=?, rule=? "
+            "WHERE run_id=? AND path=? AND state<?",
+            (CLASSIFIED, size, mtime_ns, json.dumps(tags, default=str), str(dst), rule,
+             self.run_id, str(path), CLASSIFIED),
+        )
+
+    def moving(self, path, final):
+        # Grouped like the rest; the caller starts the move after flush()
+        self.queue("UPDATE files SET final=? WHERE run_id=? AND path=?",
+                   (str(final), self.run_id, str(path)))
+
+    def moved(self, path, final):
+        self.queue("UPDATE files SET state=?, final=? WHERE run_id=? AND path=? AND state<?",
+                   (MOVED, str(final), self.run_id, str(path), MOVED))
+
+    def journaled_move(self, path, final):
+        """Found in the rollback journal: moved and journaled, whatever the row says."""
+        self.queue("UPDATE files SET state=?, final=? WHERE run_id=? AND path=? AND state<?",
+                   (JOURNALED, str(final), self.run_id, str(path), JOURNALED))
+
+    def journaled(self, paths):
+        for path in paths:
+            self.queue("UPDATE files SET state=? WHERE run_id=? AND path=?",
+                       (JOURNALED, self.run_id, str(path)))
+
+    # --------------------------------------------------------
+    # Exact duplicates
+    # --------------------------------------------------------
+    def save_duplicates(self, duplicates):
+        with self.lock:
+            self._flush_locked()
+            with self.conn:
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO duplicates (run_id, path, original) VALUES (?, ?, ?)",
+                    ((self.run_id, str(p), str(o)) for p, o in duplicates.items()),
+                )
+
+    def load_duplicates(self):
+        with self.lock:
+            rows = self.conn.execute("SELECT path, original FROM duplicates WHERE run_id=?",
+                                     (self.run_id,)).fetchall()
+        return dict(rows)
+
+    # --------------------------------------------------------
+    # Reading back (resume)
+    # --------------------------------------------------------
+    def _rows(self, where, params=()):
+        """Rows in discovery order, read page by page."""
+        last = -1
+        self.flush()
+        while True:
+            with self.lock:
+                page = self.conn.execute(
+                    "SELECT seq, path, state, size, mtime_ns, tags_json, dst, rule, final "
+                    f"FROM files WHERE run_id=? AND seq>? AND {where} ORDER BY seq LIMIT ?",
+                    (self.run_id, last, *params, PAGE),
+                ).fetchall()
+            if not page:
+                return
+            for seq, path, state, size, mtime_ns, tags, dst, rule, final in page:
+                yield {"path": path, "state": state, "size": size, "mtime_ns": mtime_ns,
+                       "tags": json.loads(tags) if tags else None, "dst": dst,
+                       "rule": rule, "final": final}
+            last = page[-1][0]
+
+    def pending(self):
+        """Files not moved yet."""
+        return self._rows("state<?", (MOVED,))
+
+    def interrupted(self):
+        """Moves that were started but not confirmed."""
+        return self._rows("state=? AND final IS NOT NULL", (CLASSIFIED,))
+
+    def unjournaled(self):
+        return self._rows("state=?", (MOVED,))
+
+    def moved_rows(self):
+        return self._rows("state>=?", (MOVED,))
+
+    def unknown(self, paths):
+        """The paths this run has not discovered yet."""
+        paths = [str(p) for p in paths]
+        if not paths:
+            return []
+        marks = ",".join("?" * len(paths))
+        with self.lock:
+            known = {row[0] for row in self.conn.execute(
+                f"SELECT path FROM files WHERE run_id=? AND path IN ({marks})",
+                (self.run_id, *paths),
+            )}
+        return [p for p in paths if p not in known]
+
+    def counts(self):
+        with self.lock:
+            self._flush_locked()
+            rows = self.conn.execute(
+                "SELECT state, COUNT(*) FROM files WHERE run_id=? GROUP BY state",
+                (self.run_id,),
+            ).fetchall()
+        return {STATE_NAMES.get(state, str(state)): n for state, n in rows}
@@ -0,0 +1,245 @@
+"""
+InteliOmniSorter - Metadata Index
+
+Persistent SQLite content index in the smartbrain.db `files` table:
+- database: SMARTBRAIN_DB (relative paths resolve against the repo root),
+  default v2_core/temp/smartbrain.db; point legacy smartbrain.py at the
+  same file (it reads SMARTBRAIN_DB too) and both use one `files` table
+- extends the table in place (adds stat key + tags columns)
+- shared rows: each side keeps its own columns (tags_json here; category /
+  hash / meta_json for legacy) and never clears the other's
+- key = (st_dev, st_ino, st_size, st_mtime_ns)
+- stores extracted tags, hashes and classification per file
+- re-runs only re-extract files whose key changed
+- extracted document text cached by content hash (`doc_text` table)
+
+Loaded automatically via Automount V2.
+"""
+
+REGISTER = {
+    "name": "metadata_index",
+    "type": "system"
+}
+
+import os
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from datetime import datetime
+
+ROOT = Path(__file__).resolve().parents[3]
+
+
+def resolve_db(path=None):
+    """path, else SMARTBRAIN_DB, else the default; relative to ROOT, not the cwd."""
+    db_path = Path(path or os.environ.get("SMARTBRAIN_DB") or "v2_core/temp/smartbrain.db")
+    return db_path if db_path.is_absolute() else ROOT / db_path
+
+
+# Faces Engine / Face Clusters keep their tables in the same database
+DEFAULT_DB = resolve_db()
+
+# Same base schema as legacy smartbrain.init_db()
+FILES_TABLE = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    path TEXT UNIQUE,
+    category TEXT,
+    hash TEXT,
+    person_id INTEGER,
+    created_ts TEXT,
+    device TEXT,
+    meta_json TEXT
+)
+"""
+
+# Content-addressed: copies / renamed files share one entry
+DOC_TEXT_TABLE = """
+CREATE TABLE IF NOT EXISTS doc_text (
+    content_hash TEXT PRIMARY KEY,
+    snippet TEXT,
+    keywords_json TEXT,
+    pages INTEGER,
+    status TEXT,
+    indexed_ts TEXT
+)
+"""
+
+INDEX_COLUMNS = {
+    "st_dev": "INTEGER",
+    "st_ino": "INTEGER",
+    "st_size": "INTEGER",
+    "st_mtime_ns": "INTEGER",
+    "tags_json": "TEXT",
+    "indexed_ts": "TEXT",
+}
+
+
+def stat_key(st):
+    return (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+def migrate(conn):
+    """Create / extend the files table in place (idempotent)."""
+    conn.execute(FILES_TABLE)
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(files)")}
+    for col, kind in INDEX_COLUMNS.items():
+        if col not in existing:
+            conn.execute(f"ALTER TABLE files ADD COLUMN {col} {kind}")
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_files_stat_key "
+        "ON files(st_dev, st_ino, st_size, st_mtime_ns)"
+    )
+    conn.execute(DOC_TEXT_TABLE)
+    conn.commit()
+
+
+class MetadataIndex:
+    engine_name = "metadata_index"
+
+    def __init__(self, db_path=DEFAULT_DB, batch_size=500):
+        db_path = resolve_db(db_path)
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.pending = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+        self.conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        migrate(self.conn)
+
+    # --------------------------------------------------------
+    # Lookup
+    # --------------------------------------------------------
+    def get(self, path, st=None):
+        """
+        Return {"path", "category", "hash", "device", "tags", "meta"} for an
+        unchanged file, or None when the file is new or was modified.
+        """
+        st = st or os.stat(path)
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT path, category, hash, device, tags_json, meta_json FROM files "
+                "WHERE st_dev=? AND st_ino=? AND st_size=? AND st_mtime_ns=? "
+                "ORDER BY id DESC LIMIT 1",
+                stat_key(st),
+            ).fetchone()
+
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+
+        return {
+            "path": row[0],
+            "category": row[1],
+            "hash": row[2] or None,
+            "device": row[3],
+            "tags": json.loads(row[4]) if row[4] else {},
+            "meta": json.loads(row[5]) if row[5] else {},
+        }
+
+    # --------------------------------------------------------
+    # Store
+    # --------------------------------------------------------
+    def put(self, path, st=None, tags=None, category=None, file_hash=None, device=None, meta=None):
+        st = st or os.stat(path)
+        now = datetime.now().isoformat(timespec="seconds")
+        with self.lock:
+            self.conn.execute(
+                """
+                INSERT INTO files(path, category, hash, device, meta_json, created_ts,
+                                  st_dev, st_ino, st_size, st_mtime_ns, tags_json, indexed_ts)
+                VALUES(?,?,?,?,?,?,?,?,?,?,?,?)
+                ON CONFLICT(path) DO UPDATE SET
+                    category=COALESCE(files.category, excluded.category),
+                    hash=COALESCE(NULLIF(excluded.hash, ''), files.hash),
+                    device=COALESCE(excluded.device, files.device),
+                    meta_json=COALESCE(excluded.meta_json, files.meta_json),
+                    st_dev=excluded.st_dev,
+                    st_ino=excluded.st_ino,
+                    st_size=excluded.st_size,
+                    st_mtime_ns=excluded.st_mtime_ns,
+                    tags_json=COALESCE(excluded.tags_json, files.tags_json),
+                    indexed_ts=excluded.indexed_ts
+                """,
+                (
+                    str(path), category, file_hash or "", device,
+                    json.dumps(meta) if meta else None, now,
+                    *stat_key(st),
+                    json.dumps(tags, default=str) if tags is not None else None,
+                    now,
+                ),
+            )
+            self._tick()
+
+    # --------------------------------------------------------
+    # Document text (keyed by content hash)
+    # --------------------------------------------------------
+    def get_text(self, content_hash):
+        """{"snippet", "keywords", "pages", "status"} or None."""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT snippet, keywords_json, pages, status FROM doc_text WHERE content_hash=?",
+                (content_hash,),
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "snippet": row[0] or "",
+            "keywords": json.loads(row[1]) if row[1] else [],
+            "pages": row[2] or 0,
+            "status": row[3],
+        }
+
+    def put_text(self, content_hash, snippet, keywords, pages, status="ok"):
+        now = datetime.now().isoformat(timespec="seconds")
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO doc_text(content_hash, snippet, keywords_json, pages, "
+                "status, indexed_ts) VALUES(?,?,?,?,?,?)",
+                (content_hash, snippet, json.dumps(keywords), pages, status, now),
+            )
+            self._tick()
+
+    def relocate(self, old_path, new_path):
+        """A rename keeps the stat key valid, only the path changes."""
+        with self.lock:
+            self.conn.execute("DELETE FROM files WHERE path=?", (str(new_path),))
+            self.conn.execute(
+                "UPDATE files SET path=? WHERE path=?", (str(new_path), str(old_path))
+            )
+            self._tick()
+
+    def _tick(self):
+        self.pending += 1
+        if self.pending >= self.batch_size:
+            self.conn.commit()
+            self.pending = 0
+
+    # --------------------------------------------------------
+    # Lifecycle
+    # --------------------------------------------------------
+    def flush(self):
+        with self.lock:
+            self.conn.commit()
+            self.pending = 0
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses}
+
+
+if __name__ == "__main__":
+    index = MetadataIndex()
+    print("Index:", index.db_path)
+    print(index.conn.execute("SELECT COUNT(*) FROM files").fetchone()[0], "files indexed")
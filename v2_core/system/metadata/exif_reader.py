@@ -0,0 +1,376 @@
+"""
+InteliOmniSorter - Header-only EXIF Reader
+
+Reads just the EXIF block, never decodes pixels:
+- JPEG (APP1), TIFF / DNG / RAW, HEIC / HEIF / AVIF (ISO-BMFF Exif item),
+  PNG (eXIf chunk), WebP (EXIF chunk)
+- one small read of the file head (HEAD), seeks to IFD offsets / values
+  beyond it only when needed
+- malformed or truncated data never raises: bad offsets, wrong tag types
+  and oversized values are skipped, the file yields what could be read
+- only the requested tags are decoded: date, make, model, orientation, GPS
+- file handle closed before returning
+
+Loaded automatically via Automount V2.
+"""
+
+REGISTER = {
+    "name": "exif_reader",
+    "type": "system"
+}
+
+import struct
+
+try:
+    from v2_core.system.metadata.metadata_service import camera_tag
+except ImportError:
+    from metadata_service import camera_tag
+
+# Head read in one go: container headers + the start of a JPEG APP1 segment
+HEAD = 4 * 1024
+# Largest tag value / HEIF meta box read (sane files stay far below)
+MAX_VALUE = 64 * 1024
+MAX_META = 1024 * 1024
+
+# IFD0
+TAG_MAKE = 0x010F
+TAG_MODEL = 0x0110
+TAG_ORIENTATION = 0x0112
+TAG_DATETIME = 0x0132
+TAG_EXIF_IFD = 0x8769
+TAG_GPS_IFD = 0x8825
+# Exif IFD
+TAG_DATETIME_ORIGINAL = 0x9003
+TAG_DATETIME_DIGITIZED = 0x9004
+# GPS IFD
+TAG_GPS_LAT_REF, TAG_GPS_LAT, TAG_GPS_LON_REF, TAG_GPS_LON = 1, 2, 3, 4
+
+IFD0_TAGS = {
+    TAG_MAKE: "Make",
+    TAG_MODEL: "Model",
+    TAG_ORIENTATION: "Orientation",
+    TAG_DATETIME: "DateTime",
+}
+EXIF_TAGS = {
+    TAG_DATETIME_ORIGINAL: "DateTimeOriginal",
+    TAG_DATETIME_DIGITIZED: "DateTimeDigitized",
+}
+
+# type -> (size, struct code)
+TYPES = {1: (1, "B"), 2: (1, "s"), 3: (2, "H"), 4: (4, "L"), 5: (8, "LL"),
+         7: (1, "B"), 9: (4, "l"), 10: (8, "ll")}
+
+# Sorter tags exif_tags() can set
+TAGS = ("year", "month", "day", "camera", "orientation", "gps")
+
+# Extensions worth a header read
+EXIF_EXT = {".jpg", ".jpeg", ".jpe", ".tif", ".tiff", ".dng", ".nef", ".cr2", ".arw",
+            ".heic", ".heif", ".avif", ".png", ".webp"}
+
+HEIF_BRANDS = {b"heic", b"heix", b"heim", b"heis", b"hevc", b"hevx",
+               b"mif1", b"msf1", b"avif", b"avis"}
+
+
+class Source:
+    """File head in memory, random reads beyond it via seek."""
+
+    def __init__(self, f, head=None):
+        self.f = f
+        self.buf = f.read(head or HEAD)
+
+    def read(self, offset, size):
+        end = offset + size
+        if end <= len(self.buf):
+            return self.buf[offset:end]
+        self.f.seek(offset)
+        return self.f.read(size)
+
+
+# --------------------------------------------------------
+# TIFF / IFD
+# --------------------------------------------------------
+def read_ifd(src, base, offset, endian, wanted):
+    """{tag: raw value} for the wanted tags of one IFD."""
+    raw = src.read(base + offset, 2)
+    if len(raw) < 2:
+        return {}
+    count = struct.unpack(endian + "H", raw)[0]
+    table = src.read(base + offset + 2, count * 12)
+
+    out = {}
+    for i in range(len(table) // 12):
+        tag, typ, n = struct.unpack_from(endian + "HHL", table, i * 12)
+        if tag not in wanted or typ not in TYPES:
+            continue
+        size, code = TYPES[typ]
+        length = size * n
+        if length > MAX_VALUE:
+            continue
+        if length <= 4:
+            data = table[i * 12 + 8:i * 12 + 8 + length]
+        else:
+            ptr = struct.unpack_from(endian + "L", table, i * 12 + 8)[0]
+            data = src.read(base + ptr, length)
+        if len(data) < length:
+            continue
+
+        if typ == 2:
+            out[tag] = data.split(b"\0", 1)[0].decode("utf-8", "replace").strip()
+        elif typ in (5, 10):
+            nums = struct.unpack(endian + code[0] * (2 * n), data)
+            out[tag] = [a / b if b else 0.0 for a, b in zip(nums[::2], nums[1::2])]
+        else:
+            values = struct.unpack(endian + code * n, data)
+            out[tag] = values[0] if n == 1 else list(values)
+    return out
+
+
+def gps_degrees(dms, ref):
+    if not isinstance(dms, list) or len(dms) < 3:
+        return None
+    value = dms[0] + dms[1] / 60 + dms[2] / 3600
+    return round(-value if ref in ("S", "W") else value, 6)
+
+
+def parse_tiff(src, base):
+    head = src.read(base, 8)
+    if len(head) < 8 or head[:2] not in (b"II", b"MM"):
+        return {}
+    endian = "<" if head[:2] == b"II" else ">"
+    if struct.unpack(endian + "H", head[2:4])[0] != 42:
+        return {}
+    ifd0 = struct.unpack(endian + "L", head[4:8])[0]
+
+    wanted = set(IFD0_TAGS) | {TAG_EXIF_IFD, TAG_GPS_IFD}
+    tags = read_ifd(src, base, ifd0, endian, wanted)
+    meta = {name: tags[tag] for tag, name in IFD0_TAGS.items() if tag in tags}
+
+    # Sub-IFD pointers must be a single offset (LONG / SHORT), not a list
+    if isinstance(tags.get(TAG_EXIF_IFD), int):
+        sub = read_ifd(src, base, tags[TAG_EXIF_IFD], endian, set(EXIF_TAGS))
+        meta.update({name: sub[tag] for tag, name in EXIF_TAGS.items() if tag in sub})
+
+    if isinstance(tags.get(TAG_GPS_IFD), int):
+        gps = read_ifd(src, base, tags[TAG_GPS_IFD], endian,
+                       {TAG_GPS_LAT_REF, TAG_GPS_LAT, TAG_GPS_LON_REF, TAG_GPS_LON})
+        lat = gps_degrees(gps.get(TAG_GPS_LAT), gps.get(TAG_GPS_LAT_REF))
+        lon = gps_degrees(gps.get(TAG_GPS_LON), gps.get(TAG_GPS_LON_REF))
+        if lat is not None and lon is not None:
+            meta["GPS"] = [lat, lon]
+    return meta
+
+
+# --------------------------------------------------------
+# Containers
+# --------------------------------------------------------
+def find_jpeg(src):
+    pos = 2
+    while True:
+        marker = src.read(pos, 4)
+        if len(marker) < 4 or marker[0] != 0xFF:
+            return None
+        kind = marker[1]
+        if kind in (0xDA, 0xD9):  # start of scan / end of image
+            return None
+        length = struct.unpack(">H", marker[2:4])[0]
+        if kind == 0xE1 and src.read(pos + 4, 6) == b"Exif\0\0":
+            return pos + 10
+        pos += 2 + length
+
+
+def find_png(src):
+    pos = 8
+    while True:
+        chunk = src.read(pos, 8)
+        if len(chunk) < 8:
+            return None
+        length, kind = struct.unpack(">L4s", chunk)
+        if kind == b"eXIf":
+            return pos + 8
+        if kind in (b"IDAT", b"IEND"):
+            return None
+        pos += 12 + length
+
+
+def find_webp(src):
+    pos = 12
+    while True:
+        chunk = src.read(pos, 8)
+        if len(chunk) < 8:
+            return None
+        kind, length = struct.unpack("<4sL", chunk)
+        if kind == b"EXIF":
+            start = pos + 8
+            # Some writers keep the JPEG-style prefix
+            return start + 6 if src.read(start, 6) == b"Exif\0\0" else start
+        pos += 8 + length + (length & 1)
+
+
+def iter_boxes(data, start=0, end=None):
+    end = len(data) if end is None else end
+    pos = start
+    while pos + 8 <= end:
+        size, kind = struct.unpack_from(">L4s", data, pos)
+        header = 8
+        if size == 1:
+            size = struct.unpack_from(">Q", data, pos + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header:
+            return
+        yield kind, pos + header, pos + size
+        pos += size
+
+
+def read_uint(data, pos, size):
+    if size == 0:
+        return 0, pos
+    return int.from_bytes(data[pos:pos + size], "big"), pos + size
+
+
+def find_heif(src):
+    # Locate the top-level meta box
+    pos = 0
+    meta = None
+    while meta is None:
+        head = src.read(pos, 16)
+        if len(head) < 8:
+            return None
+        size, kind = struct.unpack(">L4s", head[:8])
+        header = 8
+        if size == 1:
+            size = struct.unpack(">Q", head[8:16])[0]
+            header = 16
+        if size < header:
+            return None
+        if kind == b"meta":
+            if size - header > MAX_META:
+                return None
+            meta = src.read(pos + header, size - header)
+        pos += size
+
+    exif_id = None
+    locations = {}
+    for kind, start, end in iter_boxes(meta, 4):  # meta is a full box
+        if kind == b"iinf":
+            version = meta[start]
+            p = start + 4
+            count, p = read_uint(meta, p, 2 if version == 0 else 4)
+            for ikind, istart, iend in iter_boxes(meta, p, end):
+                if ikind != b"infe" or meta[istart] < 2:
+                    continue
+                p = istart + 4
+                item_id, p = read_uint(meta, p, 2 if meta[istart] == 2 else 4)
+                item_type = meta[p + 2:p + 6]
+                if item_type == b"Exif":
+                    exif_id = item_id
+
+        elif kind == b"iloc":
+            version = meta[start]
+            p = start + 4
+            offset_size, length_size = meta[p] >> 4, meta[p] & 15
+            base_size, index_size = meta[p + 1] >> 4, meta[p + 1] & 15
+            p += 2
+            count, p = read_uint(meta, p, 2 if version < 2 else 4)
+            for _ in range(count):
+                item_id, p = read_uint(meta, p, 2 if version < 2 else 4)
+                if version in (1, 2):
+                    p += 2  # construction method
+                p += 2  # data reference index
+                base, p = read_uint(meta, p, base_size)
+                extents, p = read_uint(meta, p, 2)
+                first = None
+                for _ in range(extents):
+                    if version in (1, 2):
+                        _, p = read_uint(meta, p, index_size)
+                    offset, p = read_uint(meta, p, offset_size)
+                    _, p = read_uint(meta, p, length_size)
+                    if first is None:
+                        first = base + offset
+                locations[item_id] = first
+
+    offset = locations.get(exif_id) if exif_id is not None else None
+    if offset is None:
+        return None
+    # Exif item: 4-byte offset to the TIFF header, then the payload
+    skip = struct.unpack(">L", src.read(offset, 4))[0]
+    return offset + 4 + skip
+
+
+def find_exif(src):
+    """Offset of the TIFF header inside the file, or None."""
+    head = src.buf[:12]
+    if head[:2] == b"\xff\xd8":
+        return find_jpeg(src)
+    if head[:2] in (b"II", b"MM"):
+        return 0
+    if head[:8] == b"\x89PNG\r\n\x1a\n":
+        return find_png(src)
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return find_webp(src)
+    if head[4:8] == b"ftyp" and head[8:12] in HEIF_BRANDS:
+        return find_heif(src)
+    return None
+
+
+# --------------------------------------------------------
+# Public API
+# --------------------------------------------------------
+def read_exif(path):
+    """Make / Model / Orientation / DateTimeOriginal / DateTime / GPS, {} if none."""
+    try:
+        with open(path, "rb") as f:
+            src = Source(f)
+            base = find_exif(src)
+            if base is None:
+                return {}
+            return parse_tiff(src, base)
+    except (OSError, struct.error, IndexError, ValueError, TypeError, OverflowError):
+        # Malformed beyond what the parsers skip on their own
+        return {}
+
+
+def exif_date(meta):
+    """(year, month, day) from the EXIF date tags, or None."""
+    for key in ("DateTimeOriginal", "DateTimeDigitized", "DateTime"):
+        value = meta.get(key)
+        if not isinstance(value, str) or len(value) < 10:
+            continue
+        try:
+            year, month, day = int(value[0:4]), int(value[5:7]), int(value[8:10])
+        except ValueError:
+            continue
+        if year > 1900 and 1 <= month <= 12 and 1 <= day <= 31:
+            return year, month, day
+    return None
+
+
+def exif_tags(path):
+    """Sorter tags: year / month / day / camera / orientation / gps."""
+    meta = read_exif(path)
+    tags = {}
+    date = exif_date(meta)
+    if date:
+        tags["year"] = date[0]
+        tags["month"] = f"{date[1]:02d}"
+        tags["day"] = f"{date[2]:02d}"
+    camera = camera_tag(meta)
+    if camera:
+        tags["camera"] = camera
+    if isinstance(meta.get("Orientation"), int):
+        tags["orientation"] = meta["Orientation"]
+    if "GPS" in meta:
+        tags["gps"] = meta["GPS"]
+    return tags
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    paths = sys.argv[1:]
+    start = time.perf_counter()
+    for p in paths:
+        print(p, exif_tags(p))
+    print(f"ExifReader: {len(paths)} files in {time.perf_counter() - start:.3f}s")
@@ -0,0 +1,322 @@
+"""
+InteliOmniSorter - Metadata Service
+
+Long-lived metadata extractors:
+- one exiftool process in `-stay_open True -@ -` mode, requests from many
+  threads are coalesced into batches (many paths per -execute)
+- bounded pool of ffprobe workers (ffprobe has no persistent mode)
+- per-request timeouts; a hung exiftool is killed and restarted
+- camera tag ("Make Model") for the RuleEngine `camera` condition
+- non-blocking hooks for the async pipeline: exiftool requests as Futures,
+  ffprobe command / output parsing usable with asyncio subprocesses
+
+Tools come from SMARTBRAIN_EXIFTOOL / SMARTBRAIN_FFPROBE or PATH; the
+service is a no-op for a tool that is not installed.
+
+Loaded automatically via Automount V2.
+"""
+
+REGISTER = {
+    "name": "metadata_service",
+    "type": "system"
+}
+
+import os
+import json
+import queue
+import shutil
+import threading
+import subprocess
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
+
+DEFAULT_TIMEOUT = 8.0
+EXIF_BATCH = 64
+EXIF_LINGER = 0.005
+
+# Sorter tags sorter_tags() can set
+TAGS = ("camera", "duration", "v_codec")
+
+# Only what the sorter uses; keeps exiftool output small
+EXIF_TAGS = ["-DateTimeOriginal", "-CreateDate", "-Make", "-Model", "-Orientation"]
+
+FFPROBE_ARGS = ["-v", "error", "-show_entries",
+                "format=duration:stream=codec_name,codec_type,width,height",
+                "-of", "json"]
+
+_STOP = object()
+
+
+def find_tool(env, name):
+    cmd = os.environ.get(env) or name
+    return shutil.which(cmd) or (cmd if os.path.isfile(cmd) else None)
+
+
+def path_key(path):
+    return os.path.normcase(os.path.normpath(os.path.abspath(str(path))))
+
+
+def camera_tag(meta):
+    """'Make Model' without the make repeated (Canon Canon EOS 80D -> Canon EOS 80D)."""
+    make = str(meta.get("Make") or "").strip()
+    model = str(meta.get("Model") or "").strip()
+    if make and model.lower().startswith(make.lower()):
+        make = ""
+    return " ".join(p for p in (make, model) if p) or None
+
+
+def sorter_tags(meta, info):
+    """camera / duration / v_codec tags from exiftool + ffprobe output."""
+    tags = {}
+    camera = camera_tag(meta)
+    if camera:
+        tags["camera"] = camera
+    try:
+        tags["duration"] = round(float(info["duration"]), 2)
+    except (KeyError, TypeError, ValueError):
+        pass
+    if info.get("v_codec"):
+        tags["v_codec"] = info["v_codec"]
+    return tags
+
+
+# --------------------------------------------------------
+# exiftool -stay_open
+# --------------------------------------------------------
+class ExifTool:
+    """One persistent exiftool; get(path) is thread-safe and batched."""
+
+    def __init__(self, cmd, batch_size=EXIF_BATCH, timeout=DEFAULT_TIMEOUT,
+                 linger=EXIF_LINGER, tags=EXIF_TAGS):
+        self.cmd = cmd
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.linger = linger
+        self.tags = list(tags)
+
+        self.proc = None
+        self.seq = 0
+        self.restarts = 0
+        self.errors = 0
+        self.requests = queue.Queue()
+        self.reader = ThreadPoolExecutor(1, thread_name_prefix="omni-exif-read")
+        self.dispatcher = None
+        self.lock = threading.Lock()
+
+    # -------------------- process --------------------
+    def start(self):
+        self.proc = subprocess.Popen(
+            [self.cmd, "-stay_open", "True", "-@", "-"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+
+    def kill(self):
+        if self.proc:
+            try:
+                self.proc.kill()
+                self.proc.wait(timeout=2)
+            except Exception:
+                pass
+            self.proc = None
+
+    def read_until(self, marker):
+        lines = []
+        for line in iter(self.proc.stdout.readline, b""):
+            if line.strip() == marker:
+                return b"".join(lines)
+            lines.append(line)
+        raise EOFError("exiftool exited")
+
+    def execute(self, args):
+        """Send one -execute request, return stdout bytes (None on failure)."""
+        self.seq += 1
+        marker = b"{ready%d}" % self.seq
+        payload = "\n".join(args + [f"-execute{self.seq}", ""]).encode("utf-8")
+        try:
+            # Not startable (e.g. not executable) fails like a crash
+            if self.proc is None or self.proc.poll() is not None:
+                self.start()
+            self.proc.stdin.write(payload)
+            self.proc.stdin.flush()
+            return self.reader.submit(self.read_until, marker).result(self.timeout)
+        except (TimeoutError, EOFError, OSError):
+            # Hung or crashed -> restart on next request
+            self.kill()
+            self.restarts += 1
+            return None
+
+    def query(self, paths):
+        """{path_key: tags} for a batch of paths, None if exiftool failed."""
+        args = ["-j", "-charset", "filename=utf8", *self.tags, *map(str, paths)]
+        out = self.execute(args)
+        if out is None:
+            return None
+        if not out.strip():
+            return {}
+        try:
+            rows = json.loads(out.decode("utf-8", "replace"))
+        except ValueError:
+            return {}
+        if not isinstance(rows, list):
+            return {}
+        return {path_key(r.get("SourceFile", "")): r for r in rows if isinstance(r, dict)}
+
+    # -------------------- batching --------------------
+    def dispatch(self):
+        while True:
+            item = self.requests.get()
+            if item is _STOP:
+                return
+            batch = [item]
+            try:
+                while len(batch) < self.batch_size:
+                    item = self.requests.get(timeout=self.linger)
+                    if item is _STOP:
+                        self.requests.put(_STOP)
+                        break
+                    batch.append(item)
+            except queue.Empty:
+                pass
+
+            found = {}
+            try:
+                found = self.query([p for p, _ in batch])
+                if found is None and len(batch) > 1:
+                    # One bad file hung the batch -> retry the rest one by one
+                    found = {}
+                    for p, _ in batch:
+                        found.update(self.query([p]) or {})
+            except Exception:
+                # Never leave a caller waiting: the batch gets no tags
+                self.errors += 1
+                self.kill()
+            finally:
+                for p, future in batch:
+                    if not future.done():
+                        future.set_result((found or {}).get(path_key(p), {}))
+
+    def submit(self, path):
+        """Future with the tags for one file (asyncio callers wrap it)."""
+        with self.lock:
+            if self.dispatcher is None:
+                self.dispatcher = threading.Thread(target=self.dispatch,
+                                                   name="omni-exif", daemon=True)
+                self.dispatcher.start()
+        future = Future()
+        self.requests.put((path, future))
+        return future
+
+    def get(self, path):
+        """Tags for one file; concurrent callers share one exiftool request."""
+        return self.submit(path).result()
+
+    def close(self):
+        with self.lock:
+            if self.dispatcher:
+                self.requests.put(_STOP)
+                self.dispatcher.join()
+                self.dispatcher = None
+        if self.proc and self.proc.poll() is None:
+            try:
+                self.proc.stdin.write(b"-stay_open\nFalse\n")
+                self.proc.stdin.flush()
+                self.proc.wait(timeout=self.timeout)
+            except Exception:
+                pass
+        self.kill()
+        self.reader.shutdown(wait=False)
+
+
+# --------------------------------------------------------
+# ffprobe pool
+# --------------------------------------------------------
+class FFprobePool:
+    """At most `workers` ffprobe processes at once, each with a timeout."""
+
+    def __init__(self, cmd, workers=4, timeout=DEFAULT_TIMEOUT):
+        self.cmd = cmd
+        self.timeout = timeout
+        self.slots = threading.BoundedSemaphore(workers)
+        self.timeouts = 0
+
+    def command(self, path):
+        return [self.cmd, *FFPROBE_ARGS, str(path)]
+
+    def probe(self, path):
+        with self.slots:
+            try:
+                result = subprocess.run(
+                    self.command(path),
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.DEVNULL,
+                    timeout=self.timeout,
+                )
+            except subprocess.TimeoutExpired:
+                # run() already killed the hung probe
+                self.timeouts += 1
+                return {}
+            except OSError:
+                return {}
+        return self.parse(result.returncode, result.stdout)
+
+    @staticmethod
+    def parse(returncode, stdout):
+        """ffprobe JSON -> {"duration", "v_codec", "width", "height"}."""
+        if returncode != 0 or not stdout or not stdout.strip():
+            return {}
+        try:
+            data = json.loads(stdout)
+        except ValueError:
+            return {}
+
+        out = {"duration": data.get("format", {}).get("duration")}
+        for s in data.get("streams", []):
+            if s.get("codec_type") == "video":
+                out["v_codec"] = s.get("codec_name")
+                out["width"] = s.get("width")
+                out["height"] = s.get("height")
+                break
+        return out
+
+
+# --------------------------------------------------------
+# Service
+# --------------------------------------------------------
+class MetadataService:
+    engine_name = "metadata_service"
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, batch_size=EXIF_BATCH, ffprobe_workers=4,
+                 exiftool=None, ffprobe=None):
+        exiftool = exiftool or find_tool("SMARTBRAIN_EXIFTOOL", "exiftool")
+        ffprobe = ffprobe or find_tool("SMARTBRAIN_FFPROBE", "ffprobe")
+        self.exiftool = ExifTool(exiftool, batch_size, timeout) if exiftool else None
+        self.ffprobe = FFprobePool(ffprobe, ffprobe_workers, timeout) if ffprobe else None
+
+    @property
+    def available(self):
+        return self.exiftool is not None or self.ffprobe is not None
+
+    def exif(self, path):
+        return self.exiftool.get(path) if self.exiftool else {}
+
+    def probe(self, path):
+        return self.ffprobe.probe(path) if self.ffprobe else {}
+
+    def submit_exif(self, path):
+        """Future for exif(path), None without exiftool."""
+        return self.exiftool.submit(path) if self.exiftool else None
+
+    def tags(self, path, kind):
+        """Sorter tags for an image / video."""
+        return sorter_tags(self.exif(path), self.probe(path) if kind == "video" else {})
+
+    def close(self):
+        if self.exiftool:
+            self.exiftool.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,404 @@
+"""
+InteliOmniSorter - Move Engine
+
+Handles:
+- same-filesystem fast path (rename)
+- cross-device moves: streamed copy (copy_file_range / sendfile / buffered)
+  into an exclusively created temp file, verify, copy metadata, rename into
+  place, unlink source
+- never replaces an existing file: renames are no-replace (renameat2
+  RENAME_NOREPLACE, else link + unlink); a target that appeared since its
+  name was reserved is re-reserved through the Name Registry (next suffix)
+- bounded number of large copies in flight on a thread pool; their on_done
+  callbacks run on the submitting thread (poll / drain), never on the pool
+- a copy that was placed but whose source could not be removed is reported
+  as SourceKept ("copied, source kept"), not as a failed move
+- throughput counters (files, bytes, bytes/s)
+
+Loaded automatically via Automount V2.
+"""
+
+REGISTER = {
+    "name": "move_engine",
+    "type": "system"
+}
+
+import os
+import sys
+import queue
+import errno
+import ctypes
+import ctypes.util
+import shutil
+import hashlib
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+CHUNK = 8 * 1024 * 1024
+BUFFER = 1024 * 1024
+LARGE_FILE = 16 * 1024 * 1024
+
+# copy_file_range / sendfile not usable for this pair of files
+FALLBACK_ERRNOS = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EBADF,
+                   getattr(errno, "EOPNOTSUPP", errno.EINVAL),
+                   getattr(errno, "ENOTSUP", errno.EINVAL)}
+
+# renameat2(2)
+AT_FDCWD = -100
+RENAME_NOREPLACE = 1
+# renameat2 / RENAME_NOREPLACE not supported by this kernel / filesystem
+NOREPLACE_UNSUPPORTED = {errno.EINVAL, errno.ENOSYS,
+                         getattr(errno, "EOPNOTSUPP", errno.EINVAL),
+                         getattr(errno, "ENOTSUP", errno.EINVAL)}
+# No hard links on this filesystem (FAT, some network shares)
+NO_LINK_ERRNOS = {errno.EPERM, errno.ENOSYS, errno.EMLINK,
+                  getattr(errno, "EOPNOTSUPP", errno.EINVAL),
+                  getattr(errno, "ENOTSUP", errno.EINVAL)}
+# Target names re-reserved before giving up
+COLLISION_RETRIES = 100
+
+
+class SourceKept(OSError):
+    """Copied and placed at filename2, but the source could not be removed."""
+
+
+def _load_renameat2():
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        fn = libc.renameat2
+    except (OSError, AttributeError):
+        return None
+    fn.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_int, ctypes.c_char_p, ctypes.c_uint)
+    fn.restype = ctypes.c_int
+    return fn
+
+
+_renameat2 = _load_renameat2()
+
+
+def rename_noreplace(src, dst):
+    """Rename that never replaces dst: FileExistsError if it exists."""
+    if _renameat2 is not None:
+        if _renameat2(AT_FDCWD, os.fsencode(src), AT_FDCWD, os.fsencode(dst),
+                      RENAME_NOREPLACE) == 0:
+            return
+        err = ctypes.get_errno()
+        if err not in NOREPLACE_UNSUPPORTED:
+            raise OSError(err, os.strerror(err), src, None, dst)
+
+    if sys.platform == "win32":
+        # os.rename never replaces on Windows
+        os.rename(src, dst)
+        return
+
+    try:
+        os.link(src, dst)
+    except OSError as e:
+        if e.errno not in NO_LINK_ERRNOS:
+            raise
+        # Last resort: check right before the rename (small race window)
+        if os.path.lexists(dst):
+            raise FileExistsError(errno.EEXIST, os.strerror(errno.EEXIST), dst)
+        os.rename(src, dst)
+        return
+    os.unlink(src)
+
+
+def file_digest(path):
+    h = hashlib.blake2b()
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(BUFFER)
+            if not block:
+                break
+            h.update(block)
+    return h.digest()
+
+
+class MoveEngine:
+    engine_name = "move_engine"
+
+    def __init__(self, max_inflight=4, large_file=LARGE_FILE, verify="size", fsync=True,
+                 names=None):
+        self.max_inflight = max_inflight
+        self.large_file = large_file
+        self.verify = verify
+        self.fsync = fsync
+        # NameRegistry: re-reserves a target that turned out to exist on disk
+        self.names = names
+
+        self.pool = None
+        self.slots = threading.BoundedSemaphore(max_inflight)
+        self.futures = set()
+        # (on_done, src, dst, error) of finished pool copies, run by poll()
+        self.done = queue.Queue()
+        self.lock = threading.Lock()
+        self.dev_cache = {}
+
+        self.started = time.monotonic()
+        self.counters = {
+            "renamed": 0,
+            "copied": 0,
+            "kept": 0,
+            "failed": 0,
+            "collisions": 0,
+            "bytes_renamed": 0,
+            "bytes_copied": 0,
+            "copy_seconds": 0.0,
+        }
+
+    # --------------------------------------------------------
+    # Counters
+    # --------------------------------------------------------
+    def count(self, **deltas):
+        with self.lock:
+            for key, value in deltas.items():
+                self.counters[key] += value
+
+    def stats(self):
+        with self.lock:
+            c = dict(self.counters)
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        total = c["bytes_renamed"] + c["bytes_copied"]
+        c["elapsed"] = elapsed
+        c["bytes_per_s"] = total / elapsed
+        c["copy_bytes_per_s"] = c["bytes_copied"] / c["copy_seconds"] if c["copy_seconds"] else 0.0
+        return c
+
+    def summary(self):
+        s = self.stats()
+        mb = 1024 * 1024
+        collisions = f", {s['collisions']} re-named (target appeared)" if s["collisions"] else ""
+        kept = f" ({s['kept']} source(s) kept)" if s["kept"] else ""
+        return (f"{s['renamed']} renamed, {s['copied']} copied{kept}, {s['failed']} failed{collisions}, "
+                f"{(s['bytes_renamed'] + s['bytes_copied']) / mb:.1f} MB "
+                f"@ {s['bytes_per_s'] / mb:.1f} MB/s (copy {s['copy_bytes_per_s'] / mb:.1f} MB/s)")
+
+    # --------------------------------------------------------
+    # Device detection
+    # --------------------------------------------------------
+    def dir_device(self, directory):
+        dev = self.dev_cache.get(directory)
+        if dev is None:
+            dev = os.stat(directory).st_dev
+            self.dev_cache[directory] = dev
+        return dev
+
+    # --------------------------------------------------------
+    # No-replace placement
+    # --------------------------------------------------------
+    def place(self, path, dst):
+        """Rename path to dst without replacing anything; returns the final dst."""
+        for _ in range(COLLISION_RETRIES):
+            try:
+                rename_noreplace(path, dst)
+                return dst
+            except FileExistsError:
+                # Created after the directory was listed (user, other program)
+                if self.names is None:
+                    raise
+                self.count(collisions=1)
+                dst = self.names.collided(dst)
+        raise FileExistsError(errno.EEXIST, "no free target name", dst)
+
+    # --------------------------------------------------------
+    # Copy engine
+    # --------------------------------------------------------
+    def copy_data(self, fsrc, fdst, size):
+        infd, outfd = fsrc.fileno(), fdst.fileno()
+        done = 0
+
+        if hasattr(os, "copy_file_range"):
+            try:
+                while done < size:
+                    n = os.copy_file_range(infd, outfd, min(CHUNK, size - done))
+                    if n == 0:
+                        break
+                    done += n
+            except OSError as e:
+                if e.errno not in FALLBACK_ERRNOS:
+                    raise
+            if done >= size:
+                return done
+
+        # file -> file sendfile is Linux only
+        if hasattr(os, "sendfile") and sys.platform.startswith("linux"):
+            try:
+                os.lseek(outfd, done, os.SEEK_SET)
+                while done < size:
+                    n = os.sendfile(outfd, infd, done, min(CHUNK, size - done))
+                    if n == 0:
+                        break
+                    done += n
+            except OSError as e:
+                if e.errno not in FALLBACK_ERRNOS:
+                    raise
+            if done >= size:
+                return done
+
+        # Buffered fallback (Windows, exotic filesystems)
+        fsrc.seek(done)
+        fdst.seek(done)
+        buf = bytearray(BUFFER)
+        view = memoryview(buf)
+        while True:
+            n = fsrc.readinto(buf)
+            if not n:
+                break
+            fdst.write(view[:n])
+            done += n
+        return done
+
+    def copy_move(self, src, dst, size):
+        """Cross-device move: copy -> verify -> metadata -> rename -> unlink. Returns dst."""
+        fd, tmp = tempfile.mkstemp(prefix=f".omni-{os.path.basename(dst)}.",
+                                   suffix=".part", dir=os.path.dirname(dst) or ".")
+        start = time.monotonic()
+        try:
+            with open(src, "rb") as fsrc, os.fdopen(fd, "wb") as fdst:
+                copied = self.copy_data(fsrc, fdst, size)
+                fdst.flush()
+                if self.fsync:
+                    os.fsync(fdst.fileno())
+
+            if copied != size or os.path.getsize(tmp) != size:
+                raise OSError(errno.EIO, f"size mismatch after copy ({copied} != {size})", src)
+            if self.verify == "hash" and file_digest(src) != file_digest(tmp):
+                raise OSError(errno.EIO, "checksum mismatch after copy", src)
+
+            shutil.copystat(src, tmp)
+            dst = self.place(tmp, dst)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+
+        seconds = time.monotonic() - start
+        try:
+            os.unlink(src)
+        except OSError as e:
+            # The copy is in place: not a failed move, the name stays taken
+            self.count(copied=1, kept=1, bytes_copied=size, copy_seconds=seconds)
+            raise SourceKept(e.errno, f"copied, source kept ({e.strerror})", src, None, dst)
+        self.count(copied=1, bytes_copied=size, copy_seconds=seconds)
+        return dst
+
+    # --------------------------------------------------------
+    # Public API
+    # --------------------------------------------------------
+    def move(self, src, dst):
+        """Synchronous move. Returns the final dst, raises OSError on failure."""
+        src, dst = os.fspath(src), os.fspath(dst)
+        try:
+            st = os.stat(src)
+            same_dev = st.st_dev == self.dir_device(os.path.dirname(dst) or ".")
+            if same_dev:
+                try:
+                    dst = self.place(src, dst)
+                    self.count(renamed=1, bytes_renamed=st.st_size)
+                    return dst
+                except OSError as e:
+                    if e.errno != errno.EXDEV:
+                        raise
+            return self.copy_move(src, dst, st.st_size)
+        except SourceKept:
+            raise
+        except OSError:
+            self.count(failed=1)
+            raise
+
+    def submit(self, src, dst, on_done=None):
+        """
+        Move src -> dst. Renames and small copies run inline; large
+        cross-device copies run on the pool (at most max_inflight at once).
+        on_done(src, dst, error) is called when the move finished, with the
+        final dst (a new suffix if the target appeared on disk meanwhile),
+        always on this (the submitting) thread: pool copies report through
+        poll(), which every submit() and drain() runs first.
+        """
+        self.poll()
+        src, dst = os.fspath(src), os.fspath(dst)
+        try:
+            st = os.stat(src)
+            large = (st.st_size >= self.large_file and
+                     st.st_dev != self.dir_device(os.path.dirname(dst) or "."))
+        except OSError as e:
+            self.count(failed=1)
+            if on_done:
+                on_done(src, dst, e)
+            return None
+
+        if not large:
+            error = None
+            try:
+                dst = self.move(src, dst)
+            except SourceKept as e:
+                error, dst = e, e.filename2
+            except OSError as e:
+                error = e
+            if on_done:
+                on_done(src, dst, error)
+            return None
+
+        self.slots.acquire()
+        if self.pool is None:
+            self.pool = ThreadPoolExecutor(self.max_inflight, thread_name_prefix="omni-copy")
+
+        def run():
+            error = None
+            final = dst
+            try:
+                final = self.move(src, dst)
+            except SourceKept as e:
+                error, final = e, e.filename2
+            except OSError as e:
+                error = e
+            finally:
+                self.slots.release()
+            self.done.put((on_done, src, final, error))
+
+        future = self.pool.submit(run)
+        with self.lock:
+            self.futures.add(future)
+        future.add_done_callback(self._forget)
+        return future
+
+    def _forget(self, future):
+        with self.lock:
+            self.futures.discard(future)
+
+    def poll(self):
+        """Run on_done of the pool copies that finished; returns how many."""
+        n = 0
+        while True:
+            try:
+                on_done, src, dst, error = self.done.get_nowait()
+            except queue.Empty:
+                return n
+            if on_done:
+                on_done(src, dst, error)
+            n += 1
+
+    def drain(self):
+        """Wait for all in-flight copies and run their on_done."""
+        while True:
+            with self.lock:
+                pending = list(self.futures)
+            if not pending:
+                self.poll()
+                return
+            for f in pending:
+                f.result()
+            self.poll()
+
+    def close(self):
+        self.drain()
+        if self.pool:
+            self.pool.shutdown(wait=True)
+            self.pool = None
@@ -0,0 +1,104 @@
+"""
+InteliOmniSorter - Destination Name Registry
+
+Collision-free target names without probing the filesystem:
+- each destination directory is listed once with os.scandir
+- taken names are tracked in memory and updated on every reservation
+- the next free "name__N.ext" suffix is handed out from a per-name counter
+- reservations are atomic (one lock), so concurrent workers never get
+  the same target
+- the listing is a snapshot: a name created later by someone else shows up
+  as a failed no-replace move, collided() re-lists and hands out the next one
+"""
+
+import os
+import threading
+
+SUFFIX_FORMAT = "{stem}__{n}{suffix}"
+
+
+def split_name(name):
+    stem, suffix = os.path.splitext(name)
+    return stem, suffix
+
+
+class DirNames:
+    __slots__ = ("taken", "counters")
+
+    def __init__(self, directory):
+        self.taken = set()
+        self.counters = {}
+        try:
+            with os.scandir(directory) as it:
+                for entry in it:
+                    self.taken.add(os.path.normcase(entry.name))
+        except OSError:
+            # Directory doesn't exist yet -> nothing taken
+            pass
+
+
+class NameRegistry:
+    def __init__(self):
+        self.dirs = {}
+        self.lock = threading.Lock()
+
+    def _dir(self, directory):
+        key = os.path.normcase(os.path.abspath(directory))
+        names = self.dirs.get(key)
+        if names is None:
+            names = DirNames(directory)
+            self.dirs[key] = names
+        return names
+
+    def reserve(self, directory, name):
+        """Return a free name in directory (name itself or name__N.ext) and mark it taken."""
+        directory = os.fspath(directory)
+        with self.lock:
+            return self._reserve(self._dir(directory), name)
+
+    def _reserve(self, names, name):
+        key = os.path.normcase(name)
+        if key not in names.taken:
+            names.taken.add(key)
+            return name
+
+        stem, suffix = split_name(name)
+        n = names.counters.get(key, 1)
+        while True:
+            candidate = SUFFIX_FORMAT.format(stem=stem, n=n, suffix=suffix)
+            ckey = os.path.normcase(candidate)
+            n += 1
+            if ckey not in names.taken:
+                names.taken.add(ckey)
+                names.counters[key] = n
+                return candidate
+
+    def reserve_path(self, path):
+        directory, name = os.path.split(os.fspath(path))
+        return os.path.join(directory, self.reserve(directory or ".", name))
+
+    def collided(self, path):
+        """
+        The reserved path exists on disk after all: re-list its directory
+        (keeping in-flight reservations) and reserve the next free name.
+        """
+        directory, name = os.path.split(os.fspath(path))
+        directory = directory or "."
+        with self.lock:
+            names = self._dir(directory)
+            names.taken |= DirNames(directory).taken
+            names.taken.add(os.path.normcase(name))
+            return os.path.join(directory, self._reserve(names, name))
+
+    def release(self, path):
+        """Give a reserved name back (the move failed)."""
+        directory, name = os.path.split(os.fspath(path))
+        with self.lock:
+            names = self.dirs.get(os.path.normcase(os.path.abspath(directory or ".")))
+            if names:
+                names.taken.discard(os.path.normcase(name))
+
+    def forget(self, directory):
+        """Drop a directory's cached listing (it will be re-scanned)."""
+        with self.lock:
+            self.dirs.pop(os.path.normcase(os.path.abspath(directory)), None)
@@ -0,0 +1,233 @@
+"""
+InteliOmniSorter - Move Plans
+
+Classification and moving as two separate steps:
+- `omni.py sort --plan out.plan` classifies (simulated, nothing moves) and
+  writes one JSON line per decision: src, dst, size, mtime, rule, outcome,
+  content key (size + BLAKE2 of the first / last 64 KiB); dst is the routed
+  destination, not a name__N reserved at plan time
+- `omni.py apply out.plan` executes it later without classifying again;
+  a source whose size / mtime changed since is skipped, free names are
+  reserved against the target folders as they are then
+- `omni.py plan-diff old.plan new.plan` shows what a rule change would do:
+  files whose destination / rule changed, grouped by rule; both plans are
+  sorted by src (in bounded runs spilled to temp files) and merge-joined,
+  never loaded whole
+- first line is a header (format version, run id, input, created)
+
+Loaded automatically via Automount V2.
+"""
+
+REGISTER = {
+    "name": "move_plan",
+    "type": "system"
+}
+
+import os
+import json
+import heapq
+import tempfile
+import threading
+from pathlib import Path
+from datetime import datetime
+from itertools import islice
+
+try:
+    from v2_core.engines.dedup.exact_dup_engine import edge_digest
+except ImportError:
+    from engines.dedup.exact_dup_engine import edge_digest
+
+PLAN_VERSION = 1
+
+# Plan records sorted in memory at a time (plan-diff); bigger plans are
+# sorted in runs of this size, spilled to temp files and merged
+SORT_CHUNK = 100_000
+
+
+def content_key(path, size):
+    """Cheap content identity: size + edge hash (no full read)."""
+    return f"{size:x}-{edge_digest(path, size).hex()}"
+
+
+class PlanError(Exception):
+    pass
+
+
+# --------------------------------------------------------
+# Writing
+# --------------------------------------------------------
+class PlanWriter:
+    def __init__(self, path, run_id, input_folder):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.handle = open(self.path, "w", encoding="utf-8")
+        self.lock = threading.Lock()
+        self.rows = 0
+        self.write({
+            "plan": PLAN_VERSION,
+            "run_id": run_id,
+            "input": str(Path(input_folder).resolve()),
+            "created": datetime.now().isoformat(timespec="seconds"),
+        })
+
+    def write(self, obj):
+        line = json.dumps(obj, separators=(",", ":"), ensure_ascii=False, default=str)
+        self.handle.write(line + "\n")
+
+    def add(self, src, dst, size, mtime_ns, rule, outcome, key=None, phash=None):
+        row = {"src": str(src), "dst": os.path.abspath(dst), "size": size,
+               "mtime_ns": mtime_ns, "rule": rule or "", "outcome": outcome, "key": key}
+        if phash is not None:
+            row["phash"] = phash
+        with self.lock:
+            self.write(row)
+            self.rows += 1
+
+    def close(self):
+        with self.lock:
+            if self.handle:
+                self.handle.close()
+                self.handle = None
+
+
+# --------------------------------------------------------
+# Reading
+# --------------------------------------------------------
+def read_plan(path):
+    """(header, iterator over move records); PlanError if this is not a plan file."""
+    path = Path(path)
+    try:
+        handle = open(path, "r", encoding="utf-8")
+    except OSError as e:
+        raise PlanError(f"cannot open plan {path}: {e}")
+    try:
+        header = json.loads(handle.readline() or "null")
+    except ValueError:
+        header = None
+    if not isinstance(header, dict) or header.get("plan") != PLAN_VERSION:
+        handle.close()
+        raise PlanError(f"{path} is not a version {PLAN_VERSION} move plan")
+
+    def records():
+        with handle:
+            for line in handle:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+
+    return header, records()
+
+
+def src_key(rec):
+    return rec["src"]
+
+
+def spill(block):
+    """Sorted run -> temp file (deleted on close), positioned for reading."""
+    handle = tempfile.TemporaryFile("w+", encoding="utf-8")
+    for rec in block:
+        handle.write(json.dumps(rec, separators=(",", ":"), ensure_ascii=False) + "\n")
+    handle.seek(0)
+    return handle
+
+
+def read_run(handle):
+    for line in handle:
+        yield json.loads(line)
+
+
+def sorted_records(records, chunk=SORT_CHUNK):
+    """records ordered by src, the last one per src, at most `chunk` in memory at a time."""
+    runs = []
+    try:
+        while True:
+            block = sorted(islice(records, chunk), key=src_key)
+            if not runs and len(block) < chunk:
+                merged = iter(block)
+                break
+            if not block:
+                merged = heapq.merge(*(read_run(h) for h in runs), key=src_key)
+                break
+            runs.append(spill(block))
+
+        # Sorting is stable: of equal sources the later record comes last
+        prev = None
+        for rec in merged:
+            if prev is not None and prev["src"] != rec["src"]:
+                yield prev
+            prev = rec
+        if prev is not None:
+            yield prev
+    finally:
+        for handle in runs:
+            handle.close()
+
+
+# --------------------------------------------------------
+# Diff
+# --------------------------------------------------------
+def diff_plans(old_path, new_path, chunk=SORT_CHUNK):
+    """Per-source comparison of two plans (sort-merge join on src)."""
+    _, old = read_plan(old_path)
+    _, new = read_plan(new_path)
+    old = sorted_records(old, chunk)
+    new = sorted_records(new, chunk)
+
+    changes = {"added": [], "removed": [], "moved": [], "content": []}
+    by_rule = {}
+    unchanged = old_count = new_count = 0
+    before = next(old, None)
+    rec = next(new, None)
+    while before is not None or rec is not None:
+        if rec is None or (before is not None and before["src"] < rec["src"]):
+            changes["removed"].append(before)
+            old_count += 1
+            before = next(old, None)
+            continue
+        if before is None or rec["src"] < before["src"]:
+            changes["added"].append(rec)
+            new_count += 1
+            rec = next(new, None)
+            continue
+
+        if before.get("key") and rec.get("key") and before["key"] != rec["key"]:
+            changes["content"].append(rec)
+        if before["dst"] != rec["dst"] or before["rule"] != rec["rule"]:
+            changes["moved"].append((before, rec))
+            transition = (before["rule"] or "-", rec["rule"] or "-")
+            by_rule[transition] = by_rule.get(transition, 0) + 1
+        else:
+            unchanged += 1
+        old_count += 1
+        new_count += 1
+        before = next(old, None)
+        rec = next(new, None)
+
+    return {
+        "old": old_count,
+        "new": new_count,
+        "unchanged": unchanged,
+        "changes": changes,
+        "by_rule": dict(sorted(by_rule.items(), key=lambda kv: -kv[1])),
+    }
+
+
+def print_diff(old_path, new_path, diff, top=10):
+    changes = diff["changes"]
+    print(f"[Plan diff] {Path(old_path).name} ({diff['old']}) -> "
+          f"{Path(new_path).name} ({diff['new']})")
+    print(f"  Unchanged : {diff['unchanged']}")
+    print(f"  Re-routed : {len(changes['moved'])}")
+    print(f"  Added     : {len(changes['added'])}, removed: {len(changes['removed'])}, "
+          f"content changed: {len(changes['content'])}")
+
+    if diff["by_rule"]:
+        print(f"\n  {'old rule':<30} {'new rule':<30} {'files':>8}")
+        for (old_rule, new_rule), n in list(diff["by_rule"].items())[:top]:
+            print(f"  {old_rule[:30]:<30} {new_rule[:30]:<30} {n:>8}")
+
+    if changes["moved"]:
+        print("\n  Re-routed files:")
+        for before, after in changes["moved"][:top]:
+            print(f"  {after['src']}")
+            print(f"    {before['dst']}  ->  {after['dst']}")
@@ -0,0 +1,269 @@
+"""
+InteliOmniSorter - Run Profiler
+
+Where the time of a sort run goes (`omni.py sort --profile`):
+- per-stage counters + latency histograms (log scale, 8 buckets per power
+  of two) with p50 / p95 / p99 / max: walk, stat, each extractor, rule
+  evaluation, template expansion, move
+- files/s and bytes/s gauges, also on the progress lines while running
+- optional cProfile of the run (main thread + classifier threads, merged
+  into one pstats dump)
+- optional Chrome trace (chrome://tracing / Perfetto) of the stage spans
+  per thread
+- async pipeline: a span is the time until the awaited call returned,
+  waiting for the resource class included
+
+Disabled, the sorter only pays a None check per hook.
+
+Loaded automatically via Automount V2.
+"""
+
+REGISTER = {
+    "name": "profiler",
+    "type": "system"
+}
+
+import json
+import math
+import time
+import pstats
+import cProfile
+import threading
+from pathlib import Path
+from contextlib import nullcontext
+
+# Returned by SortEngine.span() while profiling is off (reusable, no state)
+NULL_SPAN = nullcontext()
+
+SUB_BUCKETS = 8
+MAX_BUCKET = 40 * SUB_BUCKETS      # 2^40 us ~ 12 days
+TRACE_LIMIT = 1_000_000            # Chrome trace events kept
+
+
+def format_rate(n, seconds, unit=""):
+    rate = n / seconds if seconds > 0 else 0.0
+    for prefix in ("", "K", "M", "G"):
+        if rate < 1000 or prefix == "G":
+            return f"{rate:.1f} {prefix}{unit}/s"
+        rate /= 1000
+
+
+# --------------------------------------------------------
+# Histogram
+# --------------------------------------------------------
+class Histogram:
+    """Latencies in log-scale buckets (~9% wide), 1 us and up."""
+
+    __slots__ = ("counts", "n", "total", "max")
+
+    def __init__(self):
+        self.counts = {}
+        self.n = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        us = seconds * 1e6
+        bucket = 0 if us < 1 else min(int(math.log2(us) * SUB_BUCKETS) + 1, MAX_BUCKET)
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+        self.n += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, q):
+        """Upper edge of the bucket holding the q-th percentile, in seconds."""
+        if not self.n:
+            return 0.0
+        rank = q / 100 * self.n
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= rank:
+                upper = 2 ** (bucket / SUB_BUCKETS) / 1e6 if bucket else 1e-6
+                return min(upper, self.max)
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.n,
+            "total_s": self.total,
+            "mean_ms": self.total / self.n * 1000 if self.n else 0.0,
+            "p50_ms": self.percentile(50) * 1000,
+            "p95_ms": self.percentile(95) * 1000,
+            "p99_ms": self.percentile(99) * 1000,
+            "max_ms": self.max * 1000,
+        }
+
+
+# --------------------------------------------------------
+# Spans
+# --------------------------------------------------------
+class Span:
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.record(self.name, self.start, time.perf_counter() - self.start)
+
+
+# --------------------------------------------------------
+# Profiler
+# --------------------------------------------------------
+class Profiler:
+    engine_name = "profiler"
+
+    def __init__(self, pstats_path=None, trace_path=None):
+        self.pstats_path = Path(pstats_path) if pstats_path else None
+        self.trace_path = Path(trace_path) if trace_path else None
+
+        self.lock = threading.Lock()
+        self.stages = {}
+        self.counters = {}
+        self.files = 0
+        self.bytes = 0
+        self.t0 = time.perf_counter()
+        self.wall = None
+
+        self.events = [] if self.trace_path else None
+        self.threads = {}
+        self.dropped = 0
+
+        self.main_profile = None
+        self.thread_profiles = []
+        self.local = threading.local()
+
+    # -------------------- recording --------------------
+    def span(self, name):
+        return Span(self, name)
+
+    def record(self, name, start, seconds):
+        with self.lock:
+            hist = self.stages.get(name)
+            if hist is None:
+                hist = self.stages[name] = Histogram()
+            hist.add(seconds)
+            if self.events is not None:
+                self.trace_event(name, start, seconds)
+
+    def trace_event(self, name, start, seconds):
+        if len(self.events) >= TRACE_LIMIT:
+            self.dropped += 1
+            return
+        tid = threading.get_ident()
+        if tid not in self.threads:
+            self.threads[tid] = threading.current_thread().name
+        self.events.append({"name": name, "ph": "X", "pid": 1, "tid": tid,
+                            "ts": round((start - self.t0) * 1e6, 1),
+                            "dur": round(seconds * 1e6, 1)})
+
+    def count(self, name, n=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def file_done(self, size):
+        with self.lock:
+            self.files += 1
+            self.bytes += size or 0
+
+    def iter_timed(self, name, iterable):
+        """Time every next() of a (walk) iterator."""
+        it = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(it)
+            except StopIteration:
+                return
+            self.record(name, start, time.perf_counter() - start)
+            yield item
+
+    # -------------------- cProfile --------------------
+    def start(self):
+        self.t0 = time.perf_counter()
+        if self.pstats_path:
+            self.main_profile = cProfile.Profile()
+            self.main_profile.enable()
+
+    def profiled(self, fn):
+        """fn under a per-thread cProfile (classifier pool threads)."""
+        if not self.pstats_path:
+            return fn
+        main = threading.main_thread()
+
+        def wrapper(*args):
+            if threading.current_thread() is main:
+                return fn(*args)  # already covered by the main profile
+            profile = getattr(self.local, "profile", None)
+            if profile is None:
+                profile = self.local.profile = cProfile.Profile()
+                with self.lock:
+                    self.thread_profiles.append(profile)
+            profile.enable()
+            try:
+                return fn(*args)
+            finally:
+                profile.disable()
+
+        return wrapper
+
+    # -------------------- results --------------------
+    def rates(self):
+        seconds = (self.wall if self.wall is not None else time.perf_counter() - self.t0)
+        files = self.files / seconds if seconds > 0 else 0.0
+        return f"{files:.1f} files/s, {format_rate(self.bytes, seconds, 'B')}"
+
+    def stop(self):
+        """Stop the clock and write the optional pstats / Chrome trace files."""
+        self.wall = time.perf_counter() - self.t0
+        written = []
+        if self.main_profile:
+            self.main_profile.disable()
+            stats = pstats.Stats(self.main_profile)
+            for profile in self.thread_profiles:
+                stats.add(profile)
+            self.pstats_path.parent.mkdir(parents=True, exist_ok=True)
+            stats.dump_stats(str(self.pstats_path))
+            written.append(self.pstats_path)
+
+        if self.events is not None:
+            meta = [{"name": "thread_name", "ph": "M", "pid": 1, "tid": tid,
+                     "args": {"name": name}} for tid, name in self.threads.items()]
+            self.trace_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.trace_path, "w", encoding="utf-8") as f:
+                json.dump({"traceEvents": meta + self.events, "displayTimeUnit": "ms"}, f)
+            written.append(self.trace_path)
+        return written
+
+    def summary(self):
+        with self.lock:
+            stages = {name: h.summary() for name, h in self.stages.items()}
+            return {
+                "wall_s": self.wall,
+                "files": self.files,
+                "bytes": self.bytes,
+                "stages": dict(sorted(stages.items(), key=lambda kv: -kv[1]["total_s"])),
+                "counters": dict(self.counters),
+                "dropped_events": self.dropped,
+            }
+
+    def print_summary(self):
+        s = self.summary()
+        print(f"[Profile] {s['files']} files in {s['wall_s']:.2f}s: {self.rates()}")
+        print(f"  {'stage':<12} {'count':>9} {'total s':>9} {'mean ms':>9} "
+              f"{'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+        for name, h in s["stages"].items():
+            print(f"  {name:<12} {h['count']:>9} {h['total_s']:>9.2f} {h['mean_ms']:>9.3f} "
+                  f"{h['p50_ms']:>9.3f} {h['p95_ms']:>9.3f} {h['p99_ms']:>9.3f} "
+                  f"{h['max_ms']:>9.1f}")
+        if s["counters"]:
+            print("  Counters: " + ", ".join(f"{k} {v}" for k, v in s["counters"].items()))
+        if s["dropped_events"]:
+            print(f"  Chrome trace full: {s['dropped_events']} spans not recorded")
@@ -0,0 +1,350 @@
+"""
+InteliOmniSorter - Run Report
+
+Structured per-file decision records instead of one log line per file:
+- path, ext, type, size, matched rule, destination, outcome, cache hit,
+  total + per-extractor timings, tags (JSON)
+- buffered column-wise, written in batches:
+  Parquet (pyarrow) -> Arrow IPC (pyarrow without parquet) -> gzip CSV
+- one file per run under v2_core/temp/reports/<run_id>.*
+- aggregation for `omni.py report`: files / bytes per rule, type, ext,
+  outcome, slowest extractors, slowest files
+
+Loaded automatically via Automount V2.
+"""
+
+REGISTER = {
+    "name": "run_report",
+    "type": "system"
+}
+
+import csv
+import gzip
+import json
+import time
+import threading
+from pathlib import Path
+from datetime import datetime
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError:
+    pa = None
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:
+    pq = None
+
+ROOT = Path(__file__).resolve().parents[3]
+REPORT_DIR = ROOT / "v2_core" / "temp" / "reports"
+
+BATCH = 10000
+
+# Extractor stages timed by SortEngine.classify
+STAGES = ("exif", "metadata", "faces", "keywords", "phash")
+
+# column -> type ("str" / "int" / "float" / "bool")
+COLUMNS = {
+    "path": "str",
+    "ext": "str",
+    "type": "str",
+    "size": "int",
+    "rule": "str",
+    "destination": "str",
+    "outcome": "str",
+    "cached": "bool",
+    "t_total": "float",
+    **{f"t_{stage}": "float" for stage in STAGES},
+    "tags": "str",
+}
+
+EXTENSIONS = {"parquet": ".parquet", "arrow": ".arrow", "csv": ".csv.gz"}
+
+
+def format_bytes(n):
+    for unit in ("B", "KB", "MB", "GB", "TB"):
+        if n < 1024 or unit == "TB":
+            return f"{n:.1f} {unit}" if unit != "B" else f"{n} B"
+        n /= 1024
+
+
+def new_run_id():
+    return datetime.now().strftime("%Y%m%d-%H%M%S-%f")[:-3]
+
+
+# --------------------------------------------------------
+# Per-file timings
+# --------------------------------------------------------
+class _Stage:
+    __slots__ = ("trace", "name", "start")
+
+    def __init__(self, trace, name):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.start
+        self.trace.stages[self.name] = self.trace.stages.get(self.name, 0.0) + seconds * 1000
+        if self.trace.profiler is not None:
+            self.trace.profiler.record(self.name, self.start, seconds)
+
+
+class FileTrace:
+    """What classify() did for one file: stage timings, cache hit, size."""
+
+    __slots__ = ("stages", "cached", "size", "mtime_ns", "key", "start", "total", "profiler")
+
+    def __init__(self, profiler=None):
+        self.stages = {}
+        self.cached = False
+        self.size = 0
+        self.mtime_ns = 0
+        self.key = None
+        self.start = time.perf_counter()
+        self.total = None
+        # sort --profile: stage timings also go to the run profiler
+        self.profiler = profiler
+
+    def stage(self, name):
+        return _Stage(self, name)
+
+    def finish(self):
+        """Stop the clock (time spent waiting for the mover is not counted)."""
+        self.total = (time.perf_counter() - self.start) * 1000
+        if self.profiler is not None:
+            self.profiler.record("classify", self.start, self.total / 1000)
+
+    def elapsed(self):
+        if self.total is None:
+            self.finish()
+        return self.total
+
+
+# --------------------------------------------------------
+# Writers
+# --------------------------------------------------------
+def _arrow_schema():
+    types = {"str": pa.string(), "int": pa.int64(), "float": pa.float64(), "bool": pa.bool_()}
+    return pa.schema([(name, types[kind]) for name, kind in COLUMNS.items()])
+
+
+class ArrowWriter:
+    def __init__(self, path, parquet):
+        self.schema = _arrow_schema()
+        if parquet:
+            self.writer = pq.ParquetWriter(str(path), self.schema, compression="zstd")
+        else:
+            self.writer = pa.ipc.new_file(str(path), self.schema)
+
+    def write(self, columns):
+        table = pa.Table.from_pydict(columns, schema=self.schema)
+        self.writer.write_table(table)
+
+    def close(self):
+        self.writer.close()
+
+
+class CSVWriter:
+    def __init__(self, path):
+        self.handle = gzip.open(path, "wt", encoding="utf-8", newline="", compresslevel=6)
+        self.writer = csv.writer(self.handle)
+        self.writer.writerow(COLUMNS)
+
+    def write(self, columns):
+        self.writer.writerows(zip(*(columns[name] for name in COLUMNS)))
+
+    def close(self):
+        self.handle.close()
+
+
+def pick_format(preferred=None):
+    if preferred:
+        return preferred
+    if pq is not None:
+        return "parquet"
+    if pa is not None:
+        return "arrow"
+    return "csv"
+
+
+# --------------------------------------------------------
+# Report
+# --------------------------------------------------------
+class RunReport:
+    """Append-only decision records for one run, flushed every `batch_size` rows."""
+
+    def __init__(self, run_id=None, report_dir=REPORT_DIR, batch_size=BATCH, fmt=None):
+        self.run_id = run_id or new_run_id()
+        self.format = pick_format(fmt)
+        self.path = Path(report_dir) / f"{self.run_id}{EXTENSIONS[self.format]}"
+        self.batch_size = batch_size
+
+        self.columns = {name: [] for name in COLUMNS}
+        self.pending = 0
+        self.rows = 0
+        self.writer = None
+        self.lock = threading.Lock()
+
+    def add(self, path, outcome, tags=None, rule=None, destination=None, trace=None):
+        tags = tags or {}
+        row = {
+            "path": str(path),
+            "ext": tags.get("ext") or Path(str(path)).suffix.lower(),
+            "type": tags.get("type", ""),
+            "size": trace.size if trace else 0,
+            "rule": rule or "",
+            "destination": str(destination) if destination else "",
+            "outcome": outcome,
+            "cached": bool(trace and trace.cached),
+            "t_total": round(trace.elapsed(), 3) if trace else 0.0,
+            "tags": json.dumps(tags, default=str, separators=(",", ":")),
+        }
+        stages = trace.stages if trace else {}
+        for stage in STAGES:
+            row[f"t_{stage}"] = round(stages.get(stage, 0.0), 3)
+
+        with self.lock:
+            for name, value in row.items():
+                self.columns[name].append(value)
+            self.pending += 1
+            self.rows += 1
+            if self.pending >= self.batch_size:
+                self._flush()
+
+    def _flush(self):
+        if not self.pending:
+            return
+        if self.writer is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            if self.format == "csv":
+                self.writer = CSVWriter(self.path)
+            else:
+                self.writer = ArrowWriter(self.path, self.format == "parquet")
+        self.writer.write(self.columns)
+        self.columns = {name: [] for name in COLUMNS}
+        self.pending = 0
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def close(self):
+        with self.lock:
+            self._flush()
+            if self.writer:
+                self.writer.close()
+                self.writer = None
+
+
+# --------------------------------------------------------
+# Reading + aggregation
+# --------------------------------------------------------
+def list_reports(report_dir=REPORT_DIR):
+    """Report files, oldest first."""
+    report_dir = Path(report_dir)
+    if not report_dir.exists():
+        return []
+    files = [p for p in report_dir.iterdir()
+             if any(p.name.endswith(ext) for ext in EXTENSIONS.values())]
+    return sorted(files, key=lambda p: p.name)
+
+
+def find_report(run=None, report_dir=REPORT_DIR):
+    """Path for a run id / file path, or the latest report."""
+    if run and Path(run).is_file():
+        return Path(run)
+    reports = list_reports(report_dir)
+    if run:
+        reports = [p for p in reports if p.name.startswith(run)]
+    return reports[-1] if reports else None
+
+
+def read_report(path):
+    """{column: list} for a report file."""
+    path = Path(path)
+    name = path.name
+    if name.endswith(".parquet"):
+        if pq is None:
+            raise RuntimeError("pyarrow is needed to read Parquet reports")
+        return pq.read_table(str(path)).to_pydict()
+    if name.endswith(".arrow"):
+        if pa is None:
+            raise RuntimeError("pyarrow is needed to read Arrow reports")
+        with pa.ipc.open_file(str(path)) as reader:
+            return reader.read_all().to_pydict()
+
+    convert = {"str": str, "int": int, "float": float, "bool": lambda v: v == "True"}
+    columns = {col: [] for col in COLUMNS}
+    with gzip.open(path, "rt", encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        casts = [convert[COLUMNS.get(col, "str")] for col in header]
+        for row in reader:
+            for col, cast, value in zip(header, casts, row):
+                columns.setdefault(col, []).append(cast(value))
+    return columns
+
+
+def group_by(columns, key):
+    """{value: {"files", "bytes"}} sorted by file count."""
+    groups = {}
+    for value, size in zip(columns[key], columns["size"]):
+        g = groups.setdefault(value or "-", {"files": 0, "bytes": 0})
+        g["files"] += 1
+        g["bytes"] += size or 0
+    return dict(sorted(groups.items(), key=lambda kv: -kv[1]["files"]))
+
+
+def extractor_stats(columns):
+    """Per stage: files that ran it, total / mean / max ms."""
+    out = {}
+    for stage in STAGES:
+        times = [t for t in columns.get(f"t_{stage}", []) if t]
+        if times:
+            out[stage] = {"files": len(times), "total_ms": sum(times),
+                          "mean_ms": sum(times) / len(times), "max_ms": max(times)}
+    return dict(sorted(out.items(), key=lambda kv: -kv[1]["total_ms"]))
+
+
+def slowest(columns, top=10):
+    rows = sorted(zip(columns["t_total"], columns["path"]), reverse=True)
+    return rows[:top]
+
+
+def summarize(columns, by="rule", top=10):
+    return {
+        "files": len(columns["path"]),
+        "bytes": sum(columns["size"]),
+        "cached": sum(1 for c in columns["cached"] if c),
+        "outcomes": group_by(columns, "outcome"),
+        "groups": group_by(columns, by),
+        "extractors": extractor_stats(columns),
+        "slowest": slowest(columns, top),
+    }
+
+
+def print_summary(path, summary, by="rule", top=10):
+    print(f"[Report] {path.name}")
+    print(f"  Files   : {summary['files']} ({format_bytes(summary['bytes'])}), "
+          f"{summary['cached']} from the index")
+    print("  Outcome : " + ", ".join(f"{k} {v['files']}" for k, v in summary["outcomes"].items()))
+
+    print(f"\n  {'by ' + by:<40} {'files':>8} {'bytes':>12}")
+    for value, g in list(summary["groups"].items())[:top]:
+        print(f"  {str(value)[:40]:<40} {g['files']:>8} {format_bytes(g['bytes']):>12}")
+
+    if summary["extractors"]:
+        print(f"\n  {'extractor':<12} {'files':>8} {'total s':>9} {'mean ms':>9} {'max ms':>9}")
+        for stage, s in summary["extractors"].items():
+            print(f"  {stage:<12} {s['files']:>8} {s['total_ms'] / 1000:>9.2f} "
+                  f"{s['mean_ms']:>9.2f} {s['max_ms']:>9.1f}")
+
+    if summary["slowest"]:
+        print(f"\n  {'slowest files':<60} {'ms':>9}")
+        for ms, path in summary["slowest"]:
+            print(f"  {path[-60:]:<60} {ms:>9.1f}")
@@ -3,10 +3,22 @@ InteliOmniSorter - Rollback Engine (Phase 7)
 
 Handles:
 - restoring moved files back to their original location
-- JSON rollback snapshots
+- append-only JSON Lines rollback journal (group commit)
 - safety checks
 - conflict detection
-- dry-run preview
+- dry-run preview (summary report)
+- planned, concurrent restores (see rollback_planner.py)
+
+Journal:
+- one JSON object per line, appended in batches
+- flushed + fsynced only at batch boundaries (batch_size / flush_interval)
+- read back as a stream (forwards or backwards), never loaded whole
+- legacy rollback_log.json (single JSON array, pre-journal versions) is
+  converted once into the journal when no journal exists yet, and kept as
+  rollback_log.json.migrated
+- optional on_flush callback: which moves are durable (run checkpoints)
+- after a rollback, the destinations it moved back are dropped from the
+  near-duplicate index (its entries are absolute destination paths)
 """
 
 REGISTER = {
@@ -16,40 +28,195 @@ REGISTER = {
 
 import os
 import json
+import time
+import threading
 from pathlib import Path
 from datetime import datetime
 
+try:
+    from v2_core.system.rollback.rollback_planner import RollbackPlan, print_report
+except ImportError:
+    from rollback_planner import RollbackPlan, print_report
+
+try:
+    from v2_core.engines.dedup.near_dup_engine import NearDupIndex
+except ImportError:
+    try:
+        from engines.dedup.near_dup_engine import NearDupIndex
+    except ImportError:
+        NearDupIndex = None
+
+DEFAULT_LOG = "rollback_log.jsonl"
+# Written by versions before the journal, next to it
+LEGACY_SUFFIX = ".json"
+READ_BLOCK = 64 * 1024
+
 
 class RollbackEngine:
     engine_name = "rollback_engine"
 
-    def __init__(self, log_file="rollback_log.json"):
+    def __init__(self, log_file=DEFAULT_LOG, batch_size=500, flush_interval=2.0, fsync=True):
         self.log_file = Path(log_file)
-        self.entries = []
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+
+        self.buffer = []
+        self.buffered = []
+        # on_flush(sources): called once their entries are on disk (run checkpoints)
+        self.on_flush = None
+        self.last_flush = time.monotonic()
+        self.handle = None
+        self.lock = threading.Lock()
+        self.recorded = 0
+
+    # --------------------------------------------------------
+    # Journal format detection
+    # --------------------------------------------------------
+    def is_legacy(self):
+        """Old rollback_log.json: a single JSON array rewritten on every move."""
+        try:
+            with open(self.log_file, "r", encoding="utf-8") as f:
+                head = f.read(64).lstrip()
+        except OSError:
+            return False
+        return head.startswith("[")
+
+    def load_legacy(self, path=None):
+        try:
+            with open(path or self.log_file, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception:
+            print("[Rollback] Failed to load rollback log.")
+            return []
+
+    def migrate_legacy(self):
+        """No journal yet but an old rollback_log.json: convert it once."""
+        legacy = self.log_file.with_suffix(LEGACY_SUFFIX)
+        if self.log_file.exists() or legacy == self.log_file or not legacy.exists():
+            return
+        entries = self.load_legacy(legacy)
+        tmp = self.log_file.with_name(self.log_file.name + ".tmp")
+        self.log_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(tmp, "w", encoding="utf-8") as f:
+            for entry in entries:
+                f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.log_file)
+        legacy.replace(legacy.with_name(legacy.name + ".migrated"))
+        print(f"[Rollback] Converted {legacy.name} ({len(entries)} entries) to {self.log_file.name}")
+
+    @staticmethod
+    def parse_line(line):
+        line = line.strip()
+        if not line:
+            return None
+        try:
+            return json.loads(line)
+        except ValueError:
+            # Torn last line after a crash -> ignore
+            return None
 
     # --------------------------------------------------------
-    # Load rollback entries
+    # Stream rollback entries
     # --------------------------------------------------------
     def load(self):
+        """Yield journal entries oldest -> newest."""
+        self.migrate_legacy()
         if not self.log_file.exists():
             print("[Rollback] No rollback log found.")
-            return []
+            return
 
-        try:
-            with open(self.log_file, "r", encoding="utf-8") as f:
-                self.entries = json.load(f)
-        except:
-            print("[Rollback] Failed to load rollback log.")
-            self.entries = []
+        if self.is_legacy():
+            yield from self.load_legacy()
+            return
 
-        return self.entries
+        with open(self.log_file, "r", encoding="utf-8") as f:
+            for line in f:
+                entry = self.parse_line(line)
+                if entry is not None:
+                    yield entry
+
+    def load_reversed(self):
+        """Yield journal entries newest -> oldest, reading blocks from the end."""
+        self.migrate_legacy()
+        if not self.log_file.exists():
+            print("[Rollback] No rollback log found.")
+            return
+
+        if self.is_legacy():
+            yield from reversed(self.load_legacy())
+            return
+
+        with open(self.log_file, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            pos = f.tell()
+            tail = b""
+
+            while pos > 0:
+                step = min(READ_BLOCK, pos)
+                pos -= step
+                f.seek(pos)
+                chunk = f.read(step) + tail
+                lines = chunk.split(b"\n")
+                # First piece may be a partial line, keep it for the next block
+                tail = lines.pop(0)
+                for raw in reversed(lines):
+                    entry = self.parse_line(raw.decode("utf-8"))
+                    if entry is not None:
+                        yield entry
+
+            if tail:
+                entry = self.parse_line(tail.decode("utf-8"))
+                if entry is not None:
+                    yield entry
 
     # --------------------------------------------------------
-    # Save rollback entries
+    # Group commit
     # --------------------------------------------------------
-    def save(self):
-        with open(self.log_file, "w", encoding="utf-8") as f:
-            json.dump(self.entries, f, indent=4)
+    def open_journal(self):
+        if self.handle is None:
+            self.migrate_legacy()
+            if self.is_legacy():
+                # Convert once, then keep appending lines
+                entries = self.load_legacy()
+                with open(self.log_file, "w", encoding="utf-8") as f:
+                    for entry in entries:
+                        f.write(json.dumps(entry) + "\n")
+            self.log_file.parent.mkdir(parents=True, exist_ok=True)
+            self.handle = open(self.log_file, "a", encoding="utf-8")
+        return self.handle
+
+    def flush(self):
+        with self.lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if self.buffer:
+            handle = self.open_journal()
+            handle.write("".join(self.buffer))
+            handle.flush()
+            if self.fsync:
+                os.fsync(handle.fileno())
+            self.buffer.clear()
+            if self.on_flush:
+                self.on_flush(self.buffered)
+            self.buffered = []
+        self.last_flush = time.monotonic()
+
+    def close(self):
+        with self.lock:
+            self._flush_locked()
+            if self.handle:
+                self.handle.close()
+                self.handle = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
 
     # --------------------------------------------------------
     # Add a rollback entry
@@ -60,41 +227,46 @@ class RollbackEngine:
             "after": str(dst_after),
             "timestamp": datetime.now().isoformat()
         }
-        self.entries.append(entry)
-        self.save()
+        line = json.dumps(entry) + "\n"
+
+        with self.lock:
+            self.buffer.append(line)
+            self.buffered.append(str(src_before))
+            self.recorded += 1
+            if (len(self.buffer) >= self.batch_size
+                    or time.monotonic() - self.last_flush >= self.flush_interval):
+                self._flush_locked()
 
     # --------------------------------------------------------
     # Perform rollback
     # --------------------------------------------------------
-    def rollback(self, dry_run=True):
-        self.load()
-
-        if not self.entries:
-            print("[Rollback] Nothing to rollback.")
-            return
+    def plan(self):
+        self.flush()
+        return RollbackPlan.from_entries(self.load_reversed())
 
-        print(f"[Rollback] Processing {len(self.entries)} items...")
+    def rollback(self, dry_run=True, workers=8):
+        plan = self.plan()
 
-        for item in reversed(self.entries):
-            src_before = Path(item["before"])
-            dst_after = Path(item["after"])
-
-            # If original location exists, skip
-            if dst_after.exists() and src_before.exists():
-                print(f"[SKIP] {dst_after} already exists.")
-                continue
-
-            if dry_run:
-                print(f"[PREVIEW] Would restore: {dst_after} -> {src_before}")
-                continue
-
-            # Ensure folder exists
-            os.makedirs(src_before.parent, exist_ok=True)
+        if not plan.entries:
+            print("[Rollback] Nothing to rollback.")
+            return None
 
-            try:
-                os.rename(dst_after, src_before)
-                print(f"[RESTORE] {dst_after} -> {src_before}")
-            except Exception as e:
-                print(f"[ERROR] Failed rollback: {e}")
+        print(f"[Rollback] Planned {plan.entries} items in {len(plan.chains)} chains...")
+        report = plan.execute(dry_run=dry_run, workers=workers)
+        print_report(report, dry_run)
+        if report["vacated"]:
+            self.prune_near_dups(report["vacated"])
+        return report
 
-        print("[Rollback] Completed.")
+    def prune_near_dups(self, vacated):
+        """Restored files no longer exist at their destination: forget their hashes."""
+        if NearDupIndex is None:
+            return
+        index = NearDupIndex.load()
+        before = len(index)
+        for path in vacated:
+            index.remove(os.path.abspath(path))
+        dropped = before - len(index)
+        if dropped:
+            index.save()
+            print(f"[Rollback] Near-duplicate index: {dropped} restored files removed")
@@ -0,0 +1,244 @@
+"""
+InteliOmniSorter - Rollback Planner
+
+Turns the rollback journal into an execution plan:
+- entries touching the same paths are grouped into chains
+  (a file moved twice, or a file moved onto another file's old location)
+- each chain is restored newest-first on one thread, so dependencies hold
+- independent chains run concurrently on a thread pool
+- all needed parent directories are created in one pass up front
+- files go back through the Move Engine: no-replace rename, or copy ->
+  verify -> rename -> unlink when the file was moved across devices; a
+  file that appeared at the original location is never overwritten
+- the result is a summary report (counts, conflicts, bytes), not a line per file
+"""
+
+import os
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from v2_core.system.mover.move_engine import MoveEngine, SourceKept
+except ImportError:
+    from system.mover.move_engine import MoveEngine, SourceKept
+
+MAX_LISTED = 20
+
+
+def new_report():
+    return {
+        "entries": 0,
+        "chains": 0,
+        "restored": 0,
+        "conflicts": 0,
+        "missing": 0,
+        "errors": 0,
+        "bytes": 0,
+        "dirs_created": 0,
+        "dirs_needed": 0,
+        "conflict_list": [],
+        "error_list": [],
+        # Destinations moved back (no longer exist), in full
+        "vacated": [],
+    }
+
+
+def merge_report(total, part):
+    for key in ("restored", "conflicts", "missing", "errors", "bytes"):
+        total[key] += part[key]
+    for key in ("conflict_list", "error_list"):
+        room = MAX_LISTED - len(total[key])
+        if room > 0:
+            total[key].extend(part[key][:room])
+    total["vacated"].extend(part["vacated"])
+
+
+class RollbackPlan:
+    """Chains of (before, after) moves, each chain ordered newest -> oldest."""
+
+    def __init__(self):
+        self.chains = []
+        self.entries = 0
+
+    # --------------------------------------------------------
+    # Build
+    # --------------------------------------------------------
+    @classmethod
+    def from_entries(cls, entries):
+        """entries: journal entries newest -> oldest (RollbackEngine.load_reversed)."""
+        moves = []
+        parent = []
+        owner = {}
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        for item in entries:
+            i = len(moves)
+            moves.append((item["before"], item["after"]))
+            parent.append(i)
+
+            # Union with every newer move that touched either path
+            for path in (item["before"], item["after"]):
+                j = owner.get(path)
+                if j is None:
+                    owner[path] = i
+                else:
+                    ri, rj = find(i), find(j)
+                    if ri != rj:
+                        parent[ri] = rj
+
+        groups = defaultdict(list)
+        for i in range(len(moves)):
+            groups[find(i)].append(moves[i])
+
+        plan = cls()
+        plan.entries = len(moves)
+        # moves were appended newest-first, so each chain keeps that order
+        plan.chains = list(groups.values())
+        return plan
+
+    def directories(self):
+        dirs = set()
+        for chain in self.chains:
+            for before, _ in chain:
+                dirs.add(os.path.dirname(before))
+        dirs.discard("")
+        return sorted(dirs)
+
+    # --------------------------------------------------------
+    # Execute / preview
+    # --------------------------------------------------------
+    def prepare_dirs(self, dry_run, report):
+        dirs = self.directories()
+        for d in dirs:
+            if os.path.isdir(d):
+                continue
+            report["dirs_needed"] += 1
+            if dry_run:
+                continue
+            try:
+                os.makedirs(d, exist_ok=True)
+                report["dirs_created"] += 1
+            except OSError as e:
+                report["errors"] += 1
+                if len(report["error_list"]) < MAX_LISTED:
+                    report["error_list"].append(f"mkdir {d}: {e}")
+
+    @staticmethod
+    def restore_chain(chain, dry_run, mover=None):
+        """
+        Restore one chain newest-first. `virtual` tracks paths this chain
+        already changed: path -> size when occupied, None when vacated.
+        """
+        report = new_report()
+        virtual = {}
+
+        for before, after in chain:
+            if after in virtual:
+                size = virtual[after]
+            else:
+                try:
+                    size = os.stat(after).st_size
+                except OSError:
+                    size = None
+
+            if before in virtual:
+                dst_exists = virtual[before] is not None
+            else:
+                dst_exists = os.path.lexists(before)
+
+            if size is None:
+                report["missing"] += 1
+                continue
+
+            if dst_exists:
+                report["conflicts"] += 1
+                if len(report["conflict_list"]) < MAX_LISTED:
+                    report["conflict_list"].append(f"{after} -> {before} (target exists)")
+                continue
+
+            kept = False
+            if not dry_run:
+                try:
+                    mover.move(after, before)
+                except SourceKept as e:
+                    # Restored, but the sorted copy is still there
+                    kept = True
+                    report["errors"] += 1
+                    if len(report["error_list"]) < MAX_LISTED:
+                        report["error_list"].append(f"{after} -> {before}: {e.strerror}")
+                except FileExistsError:
+                    # Created since the check above: left alone
+                    report["conflicts"] += 1
+                    if len(report["conflict_list"]) < MAX_LISTED:
+                        report["conflict_list"].append(f"{after} -> {before} (target exists)")
+                    continue
+                except OSError as e:
+                    report["errors"] += 1
+                    if len(report["error_list"]) < MAX_LISTED:
+                        report["error_list"].append(f"{after} -> {before}: {e}")
+                    continue
+
+            virtual[after] = size if kept else None
+            virtual[before] = size
+            report["restored"] += 1
+            report["bytes"] += size
+            if not dry_run and not kept:
+                report["vacated"].append(after)
+
+        return report
+
+    def execute(self, dry_run=True, workers=8):
+        report = new_report()
+        report["entries"] = self.entries
+        report["chains"] = len(self.chains)
+
+        self.prepare_dirs(dry_run, report)
+        mover = None if dry_run else MoveEngine()
+
+        if workers <= 1 or len(self.chains) <= 1:
+            for chain in self.chains:
+                merge_report(report, self.restore_chain(chain, dry_run, mover))
+            return report
+
+        with ThreadPoolExecutor(workers, thread_name_prefix="omni-rollback") as pool:
+            for part in pool.map(lambda c: self.restore_chain(c, dry_run, mover), self.chains):
+                merge_report(report, part)
+
+        return report
+
+
+def format_bytes(n):
+    for unit in ("B", "KB", "MB", "GB", "TB"):
+        if n < 1024 or unit == "TB":
+            return f"{n:.1f} {unit}" if unit != "B" else f"{n} B"
+        n /= 1024
+
+
+def print_report(report, dry_run):
+    mode = "PREVIEW" if dry_run else "APPLY"
+    rows = [
+        ("Journal entries", report["entries"]),
+        ("Independent chains", report["chains"]),
+        ("Would restore" if dry_run else "Restored",
+         f"{report['restored']} ({format_bytes(report['bytes'])})"),
+        ("Conflicts", report["conflicts"]),
+        ("Missing sources", report["missing"]),
+        ("Dirs to create", report["dirs_needed"]),
+    ]
+    if not dry_run:
+        rows.append(("Dirs created", report["dirs_created"]))
+        rows.append(("Errors", report["errors"]))
+
+    print(f"[Rollback] {mode} summary")
+    for label, value in rows:
+        print(f"  {label:<19}: {value}")
+
+    for line in report["conflict_list"]:
+        print(f"  [CONFLICT] {line}")
+    for line in report["error_list"]:
+        print(f"  [ERROR] {line}")
@@ -0,0 +1,171 @@
+"""
+InteliOmniSorter - Keyword Matcher
+
+Aho–Corasick automaton over groups of keywords: built once, then any text
+(file name, full path, PDF / OCR text) is scanned in a single pass no matter
+how many keywords there are. Each group is one bit, a scan returns the
+bitmask of every group with a hit (same bit layout as the compiled rule
+index). Matching is case-insensitive.
+
+Short keywords (up to WHOLE_WORD_MAX letters / digits, e.g. "age", "cls")
+only match as whole words: "age_2024.pdf" and "SOC 101" hit, "page" and
+"classes" don't. Longer keywords match anywhere, and an empty keyword
+matches every text (like `"" in text`).
+"""
+
+# Default content keywords when no rule defines any (legacy smartbrain list)
+STUDY_KEYWORDS = [
+    "unisa", "assignment", "ass1", "ass2", "ass3",
+    "exam", "portfolio",
+    "age", "anh", "soc", "dva", "cls",
+]
+
+WHOLE_WORD_MAX = 3
+
+
+def is_whole_word(word):
+    return len(word) <= WHOLE_WORD_MAX and word.isalnum()
+
+
+def bounded(text, start, end):
+    """text[start:end] is not part of a longer run of letters / digits."""
+    return ((start == 0 or not text[start - 1].isalnum())
+            and (end == len(text) or not text[end].isalnum()))
+
+
+def contains(text, word):
+    """Same test as KeywordMatcher for one keyword (text and word in lower case)."""
+    if not is_whole_word(word):
+        return word in text
+    start = text.find(word)
+    while start >= 0:
+        if bounded(text, start, start + len(word)):
+            return True
+        start = text.find(word, start + 1)
+    return False
+
+
+class KeywordMatcher:
+    """groups: {group: [keyword, ...]} or [(group, [keyword, ...]), ...]; group i = bit i."""
+
+    __slots__ = ("groups", "goto", "fail", "out", "terms", "whole", "words", "empty")
+
+    def __init__(self, groups=()):
+        items = groups.items() if isinstance(groups, dict) else groups
+        self.groups = []
+        self.goto = [{}]
+        self.out = [0]
+        self.terms = [()]
+        # (word, bit) of whole-word keywords ending in a state, checked per hit
+        self.whole = [()]
+        self.words = {}
+        # Groups with an empty keyword: a hit in every text
+        self.empty = 0
+
+        for bit, (group, keywords) in enumerate(items):
+            self.groups.append(group)
+            for keyword in keywords:
+                self._insert(str(keyword).lower(), 1 << bit)
+
+        self.fail = [0] * len(self.goto)
+        self._link()
+
+    def _insert(self, word, bit):
+        if not word:
+            self.empty |= bit
+            return
+        self.words[word] = self.words.get(word, 0) | bit
+        state = 0
+        for ch in word:
+            nxt = self.goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[state][ch] = nxt
+                self.goto.append({})
+                self.out.append(0)
+                self.terms.append(())
+                self.whole.append(())
+            state = nxt
+        if is_whole_word(word):
+            self.whole[state] += ((word, bit),)
+            return
+        self.out[state] |= bit
+        if word not in self.terms[state]:
+            self.terms[state] = (word,)
+
+    def _link(self):
+        # Breadth-first: fail links + outputs inherited along the fail chain
+        queue = list(self.goto[0].values())
+        head = 0
+        while head < len(queue):
+            state = queue[head]
+            head += 1
+            for ch, nxt in self.goto[state].items():
+                queue.append(nxt)
+                f = self.fail[state]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(ch, 0)
+                self.out[nxt] |= self.out[self.fail[nxt]]
+                self.terms[nxt] = self.terms[nxt] + self.terms[self.fail[nxt]]
+                self.whole[nxt] = self.whole[nxt] + self.whole[self.fail[nxt]]
+
+    def __len__(self):
+        return len(self.words)
+
+    def __bool__(self):
+        return bool(self.words or self.empty)
+
+    def mask(self, text):
+        """Bitmask of groups with at least one keyword in text."""
+        goto, fail, out, whole = self.goto, self.fail, self.out, self.whole
+        text = text.lower()
+        state = 0
+        found = self.empty
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            found |= out[state]
+            for word, bit in whole[state]:
+                if bounded(text, i + 1 - len(word), i + 1):
+                    found |= bit
+        return found
+
+    def scan(self, text):
+        """Every group with a hit, in definition order."""
+        return self.expand(self.mask(text))
+
+    def find(self, text):
+        """Matched keywords, in order of first occurrence."""
+        goto, fail, terms, whole = self.goto, self.fail, self.terms, self.whole
+        text = text.lower()
+        state = 0
+        found = {}
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for word in terms[state]:
+                found.setdefault(word)
+            for word, _ in whole[state]:
+                if bounded(text, i + 1 - len(word), i + 1):
+                    found.setdefault(word)
+        return list(found)
+
+    def lookup(self, words):
+        """Bitmask for already-matched keywords (e.g. cached `keywords` tags)."""
+        get = self.words.get
+        found = 0
+        for word in words:
+            found |= get(str(word).lower(), 0)
+        return found
+
+    def expand(self, mask):
+        groups = self.groups
+        out = []
+        while mask:
+            low = mask & -mask
+            out.append(groups[low.bit_length() - 1])
+            mask ^= low
+        return out
@@ -0,0 +1,128 @@
+"""
+InteliOmniSorter - Rule Engine microbenchmark
+
+Compares the compiled rule index against the interpreted ordered scan
+at 10, 1k and 100k rules, and checks both return the same target.
+
+Usage:
+    python v2_core/system/rules/rule_bench.py
+    python v2_core/system/rules/rule_bench.py --sizes 10 1000 --samples 500
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+if str(HERE) not in sys.path:
+    sys.path.insert(0, str(HERE))
+
+from rule_engine import RuleEngine
+
+TYPES = ["image", "video", "other"]
+EXTS = [".jpg", ".jpeg", ".png", ".heic", ".mp4", ".mov", ".avi", ".pdf", ".txt", ".zip"]
+CAMERAS = [f"Camera_{i}" for i in range(300)]
+FACES = [f"person_{i}" for i in range(2000)]
+WORDS = [f"kw{i:04d}" for i in range(5000)]
+FOLDERS = ["dev", "backup", "whatsapp", "unisa", "photos", "misc"]
+
+
+def make_rules(n, rng):
+    """Specific rules (per camera / per person), like a large real rule set."""
+    rules = []
+    for i in range(n):
+        rule = {"name": f"rule_{i}", "type": rng.choice(TYPES), "target": f"sorted/r{i}/{{year}}/"}
+        if rng.random() < 0.6:
+            rule["ext"] = rng.sample(EXTS, rng.randint(1, 3))
+        roll = rng.random()
+        if roll < 0.4:
+            rule["camera"] = rng.choice(CAMERAS)
+        elif roll < 0.8:
+            rule["faces"] = rng.sample(FACES, rng.randint(1, 4))
+        elif roll < 0.87:
+            rule["keywords"] = rng.sample(WORDS, rng.randint(1, 5))
+        elif roll < 0.93:
+            rule["content_keywords"] = rng.sample(WORDS[:200], rng.randint(1, 5))
+        else:
+            rule["path_keywords"] = [f"/{rng.choice(FOLDERS)}/"]
+        rules.append(rule)
+
+    # Generic catch-alls at the end, as in rules.json
+    rules.append({"name": "images", "type": "image", "target": "sorted/images/{year}/"})
+    rules.append({"name": "videos", "type": "video", "target": "sorted/videos/{year}/"})
+    return rules
+
+
+def make_tags(n, rng):
+    samples = []
+    for _ in range(n):
+        tags = {
+            "type": rng.choice(TYPES),
+            "ext": rng.choice(EXTS),
+            "year": 2024,
+            "month": "01",
+        }
+        if rng.random() < 0.5:
+            tags["camera"] = rng.choice(CAMERAS)
+        if rng.random() < 0.5:
+            tags["faces"] = rng.sample(FACES, rng.randint(0, 3))
+        if rng.random() < 0.2:
+            tags["keywords"] = rng.sample(WORDS[:200], 2)
+        name = f"{rng.choice(WORDS)}_scan{tags['ext']}"
+        path = f"/data/{rng.choice(FOLDERS)}/{name}"
+        samples.append((tags, name, path))
+    return samples
+
+
+def timed(fn, samples):
+    start = time.perf_counter()
+    results = [fn(*sample) for sample in samples]
+    return results, time.perf_counter() - start
+
+
+def bench(size, samples, seed=1):
+    rng = random.Random(seed)
+    engine = RuleEngine(config_path="__bench_no_rules__.json")
+    engine.rules = make_rules(size, rng)
+
+    start = time.perf_counter()
+    engine.compile()
+    compile_s = time.perf_counter() - start
+
+    tags = make_tags(samples, rng)
+    interpreted, t_interp = timed(engine.evaluate_interpreted, tags)
+    compiled, t_comp = timed(engine.evaluate, tags)
+
+    if interpreted != compiled:
+        bad = sum(a != b for a, b in zip(interpreted, compiled))
+        raise SystemExit(f"[Bench] MISMATCH at {size} rules: {bad}/{samples} results differ")
+
+    return {
+        "rules": size,
+        "samples": samples,
+        "compile_ms": compile_s * 1000,
+        "interp_us": t_interp / samples * 1e6,
+        "compiled_us": t_comp / samples * 1e6,
+        "speedup": t_interp / t_comp if t_comp else float("inf"),
+    }
+
+
+def main():
+    p = argparse.ArgumentParser(description="RuleEngine compiled vs interpreted")
+    p.add_argument("--sizes", type=int, nargs="+", default=[10, 1000, 100000])
+    p.add_argument("--samples", type=int, default=2000)
+    args = p.parse_args()
+
+    print(f"{'rules':>8} {'compile ms':>11} {'interp us':>11} {'compiled us':>12} {'speedup':>8}")
+    for size in args.sizes:
+        # Keep the interpreted side bounded at large rule counts
+        samples = min(args.samples, max(200, 2_000_000 // size))
+        r = bench(size, samples)
+        print(f"{r['rules']:>8} {r['compile_ms']:>11.1f} {r['interp_us']:>11.1f} "
+              f"{r['compiled_us']:>12.1f} {r['speedup']:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,8 +6,14 @@ Handles:
 - rule evaluation
 - multi-condition AND/OR rule groups
 - type-based, extension-based, face-based, EXIF-based rules
+- keyword rules: `keywords` (file name + matched document / OCR keywords)
+  and `path_keywords` (path below the input folder), one Aho–Corasick pass
+  per text; short keywords only match whole words (keywords.py);
+  `content_keywords` only looks at the document / OCR keywords
 - priority rules
 - fallback logic
+- compiled rule index (hash buckets + bitsets), same result as the ordered scan
+- target templates compiled + validated at load time
 
 Loaded automatically via Automount V2.
 """
@@ -20,6 +26,220 @@ REGISTER = {
 import json
 from pathlib import Path
 
+try:
+    from v2_core.system.rules.templates import compile_template, validate_template
+    from v2_core.system.rules.keywords import KeywordMatcher, contains
+except ImportError:
+    from templates import compile_template, validate_template
+    from keywords import KeywordMatcher, contains
+
+# Collections accepted as "any of" lists in rules / tags
+LIST_TYPES = (list, tuple, set, frozenset)
+
+
+def is_hashable(value):
+    try:
+        hash(value)
+        return True
+    except TypeError:
+        return False
+
+
+def lowest_bit(mask):
+    return (mask & -mask).bit_length() - 1
+
+
+def is_keyword_list(value):
+    return isinstance(value, LIST_TYPES) and all(isinstance(v, str) for v in value)
+
+
+def as_keywords(value):
+    return [value] if isinstance(value, str) else list(value)
+
+
+class CompiledRules:
+    """
+    Decision structure over an ordered rule list.
+
+    Every rule is one bit (bit i = rules[i]). For each condition we keep
+    value -> bitmask buckets plus a "wild" mask of rules that don't use
+    the condition. A file's candidates are the AND of the per-condition
+    masks; the lowest set bit is the first matching rule, exactly like
+    the ordered scan in RuleEngine.rule_matches.
+
+    Keyword conditions are one automaton per text field whose groups are
+    the rule bits themselves: one scan of the name / path yields the mask
+    of every keyword rule that hits.
+
+    Rules whose values can't be bucketed (e.g. "ext" given as a plain
+    string) are kept in `residual` and re-checked with the interpreter.
+    """
+
+    def __init__(self, rules, matcher):
+        self.source = rules
+        self.size = len(rules)
+        self.matcher = matcher
+        self.targets = [rule.get("target") for rule in rules]
+
+        self.type_bucket, self.type_wild = {}, 0
+        self.ext_bucket, self.ext_wild = {}, 0
+        self.camera_bucket, self.camera_wild = {}, 0
+        self.face_bucket, self.face_wild = {}, 0
+        self.keyword_wild, self.path_wild = 0, 0
+        self.content_bucket, self.content_wild = {}, 0
+        self.residual = 0
+        keyword_groups, path_groups = [], []
+
+        for i, rule in enumerate(rules):
+            bit = 1 << i
+            if not self._index(rule, bit):
+                # Not indexable: let every condition pass, check it by hand
+                self.residual |= bit
+                self.type_wild |= bit
+                self.ext_wild |= bit
+                self.camera_wild |= bit
+                self.face_wild |= bit
+                self.keyword_wild |= bit
+                self.path_wild |= bit
+                self.content_wild |= bit
+                keyword_groups.append((i, ()))
+                path_groups.append((i, ()))
+            else:
+                keyword_groups.append((i, rule.get("keywords", ())))
+                path_groups.append((i, rule.get("path_keywords", ())))
+
+        self.keywords = KeywordMatcher(keyword_groups)
+        self.path_keywords = KeywordMatcher(path_groups)
+
+    def _index(self, rule, bit):
+        t = rule.get("type")
+        ext = rule.get("ext")
+        faces = rule.get("faces")
+        camera = rule.get("camera")
+
+        if "type" in rule and not is_hashable(t):
+            return False
+        if "ext" in rule and not (isinstance(ext, LIST_TYPES) and all(map(is_hashable, ext))):
+            return False
+        if "faces" in rule and not (isinstance(faces, LIST_TYPES) and all(map(is_hashable, faces))):
+            return False
+        if "camera" in rule and not is_hashable(camera):
+            return False
+        if "keywords" in rule and not is_keyword_list(rule["keywords"]):
+            return False
+        if "path_keywords" in rule and not is_keyword_list(rule["path_keywords"]):
+            return False
+        if "content_keywords" in rule and not is_keyword_list(rule["content_keywords"]):
+            return False
+
+        if "type" in rule:
+            self.type_bucket[t] = self.type_bucket.get(t, 0) | bit
+        else:
+            self.type_wild |= bit
+
+        if "ext" in rule:
+            for e in frozenset(ext):
+                self.ext_bucket[e] = self.ext_bucket.get(e, 0) | bit
+        else:
+            self.ext_wild |= bit
+
+        if "camera" in rule:
+            self.camera_bucket[camera] = self.camera_bucket.get(camera, 0) | bit
+        else:
+            self.camera_wild |= bit
+
+        if "faces" in rule:
+            for face in frozenset(faces):
+                self.face_bucket[face] = self.face_bucket.get(face, 0) | bit
+        else:
+            self.face_wild |= bit
+
+        if "keywords" not in rule:
+            self.keyword_wild |= bit
+        if "path_keywords" not in rule:
+            self.path_wild |= bit
+
+        if "content_keywords" in rule:
+            for word in frozenset(k.lower() for k in rule["content_keywords"]):
+                self.content_bucket[word] = self.content_bucket.get(word, 0) | bit
+        else:
+            self.content_wild |= bit
+
+        return True
+
+    def candidates(self, tags, name="", path=""):
+        """Bitmask of matching rules, or None if the tags can't use the index."""
+        t = tags.get("type")
+        camera = tags.get("camera")
+        detected = tags.get("faces", [])
+        ext = tags.get("ext", "")
+        found = tags.get("keywords", [])
+        if not (is_hashable(t) and is_hashable(camera) and isinstance(detected, LIST_TYPES)
+                and isinstance(ext, str) and isinstance(found, LIST_TYPES)):
+            return None
+
+        ext = ext.lower()
+
+        mask = self.type_bucket.get(t, 0) | self.type_wild
+        if not mask:
+            return 0
+        mask &= self.ext_bucket.get(ext, 0) | self.ext_wild
+        if not mask:
+            return 0
+        mask &= self.camera_bucket.get(camera, 0) | self.camera_wild
+        if not mask:
+            return 0
+
+        faces = self.face_wild
+        get = self.face_bucket.get
+        for face in detected:
+            if is_hashable(face):
+                faces |= get(face, 0)
+        mask &= faces
+        if not mask:
+            return 0
+
+        if mask & ~self.content_wild:
+            content = self.content_wild
+            for word in found:
+                content |= self.content_bucket.get(str(word).lower(), 0)
+            mask &= content
+            if not mask:
+                return 0
+
+        # Texts are only scanned if a remaining candidate needs them
+        if mask & ~self.keyword_wild:
+            mask &= (self.keyword_wild | self.keywords.mask(name or "")
+                     | self.keywords.lookup(found))
+        if mask & ~self.path_wild:
+            mask &= self.path_wild | self.path_keywords.mask(path or "")
+        return mask
+
+    def match(self, tags, name="", path=""):
+        """Index of the first matching rule, or None."""
+        mask = self.candidates(tags, name, path)
+        if mask is None:
+            return self.scan(tags, name, path)
+
+        while mask:
+            i = lowest_bit(mask)
+            bit = 1 << i
+            if not (self.residual & bit) or self.matcher(self.source[i], tags, name, path):
+                return i
+            mask ^= bit
+
+        return None
+
+    def evaluate(self, tags, name="", path=""):
+        i = self.match(tags, name, path)
+        return None if i is None else self.targets[i]
+
+    def scan(self, tags, name="", path=""):
+        for i, rule in enumerate(self.source):
+            if self.matcher(rule, tags, name, path):
+                return i
+        return None
+
 
 class RuleEngine:
     engine_name = "rule_engine"
@@ -27,6 +247,8 @@ class RuleEngine:
     def __init__(self, config_path="v2_core/config/rules.json"):
         self.config_path = Path(config_path)
         self.rules = self.load_rules()
+        self.compiled = None
+        self.compile()
 
     # --------------------------------------------------------
     # Load rules.json
@@ -37,16 +259,33 @@ class RuleEngine:
             return []
 
         try:
-            with open(self.config_path, "r", encoding="utf-8") as f:
-                return json.load(f)
+            with open(self.config_path, "r", encoding="utf-8-sig") as f:
+                rules = json.load(f)
         except Exception as e:
             print("[RuleEngine] Failed to load rules:", e)
             return []
 
+        self.validate_targets(rules)
+        return rules
+
+    # --------------------------------------------------------
+    # Compile + validate target templates
+    # --------------------------------------------------------
+    def validate_targets(self, rules):
+        for rule in rules:
+            target = rule.get("target")
+            if not isinstance(target, str):
+                continue
+            compile_template(target)
+            unknown = validate_template(target)
+            if unknown:
+                names = ", ".join("{" + u + "}" for u in unknown)
+                print(f"[RuleEngine] Rule '{rule.get('name', '?')}': unknown placeholder(s) {names}")
+
     # --------------------------------------------------------
     # Check if a rule matches extracted tags
     # --------------------------------------------------------
-    def rule_matches(self, rule, tags):
+    def rule_matches(self, rule, tags, name="", path=""):
         # Match type = image/video/etc.
         if "type" in rule:
             if rule["type"] != tags.get("type"):
@@ -70,15 +309,70 @@ class RuleEngine:
             if tags.get("camera") != rule["camera"]:
                 return False
 
+        # Match keywords in the file name or the document / OCR keywords
+        if "keywords" in rule:
+            words = [k.lower() for k in as_keywords(rule["keywords"])]
+            text = (name or "").lower()
+            found = {str(k).lower() for k in tags.get("keywords", [])}
+            if not any(contains(text, k) or k in found for k in words):
+                return False
+
+        # Match document / OCR keywords only
+        if "content_keywords" in rule:
+            found = {str(k).lower() for k in tags.get("keywords", [])}
+            if not any(k.lower() in found for k in as_keywords(rule["content_keywords"])):
+                return False
+
+        # Match keywords in the path below the input folder
+        if "path_keywords" in rule:
+            text = (path or "").lower()
+            if not any(contains(text, k.lower()) for k in as_keywords(rule["path_keywords"])):
+                return False
+
         return True
 
+    # --------------------------------------------------------
+    # Keywords the content engines (PDF / OCR) should look for
+    # --------------------------------------------------------
+    def content_keywords(self):
+        words = {}
+        for rule in self.rules:
+            for key in ("keywords", "content_keywords"):
+                if key in rule:
+                    for k in as_keywords(rule[key]):
+                        words.setdefault(str(k).lower())
+        return list(words)
+
+    # --------------------------------------------------------
+    # Compile rules into the decision index
+    # --------------------------------------------------------
+    def compile(self):
+        self.compiled = CompiledRules(self.rules, self.rule_matches)
+        return self.compiled
+
     # --------------------------------------------------------
     # Determine destination path for a file
     # --------------------------------------------------------
-    def evaluate(self, tags):
+    def current(self):
+        # Recompile if self.rules was replaced or edited in place
+        compiled = self.compiled
+        if compiled is None or compiled.source is not self.rules or compiled.size != len(self.rules):
+            compiled = self.compile()
+        return compiled
+
+    def evaluate(self, tags, name="", path=""):
+        # Rule priority: earlier rules win (lowest matching bit)
+        return self.current().evaluate(tags, name, path)
+
+    def match(self, tags, name="", path=""):
+        """First matching rule (dict), or None."""
+        i = self.current().match(tags, name, path)
+        return None if i is None else self.rules[i]
+
+    def evaluate_interpreted(self, tags, name="", path=""):
         # Rule priority: earlier rules win
         for rule in self.rules:
-            if self.rule_matches(rule, tags):
+            if self.rule_matches(rule, tags, name, path):
                 return rule.get("target")
 
         # Default fallback
@@ -0,0 +1,95 @@
+"""
+InteliOmniSorter - Destination Templates
+
+Rule targets like "sorted/images/{year}/{month}/" are parsed once into a
+CompiledTemplate (literal / field parts) and cached per target string.
+Unknown placeholders are reported when rules are loaded.
+Destination directories are interned so every file sharing a prefix
+reuses the same Path object.
+"""
+
+import re
+import threading
+from functools import lru_cache
+from pathlib import Path
+
+try:
+    from v2_core.system.metadata.exif_reader import TAGS as EXIF_TAGS
+    from v2_core.system.metadata.metadata_service import TAGS as SERVICE_TAGS
+except ImportError:
+    from system.metadata.exif_reader import TAGS as EXIF_TAGS
+    from system.metadata.metadata_service import TAGS as SERVICE_TAGS
+
+PLACEHOLDER = re.compile(r"\{([^{}]+)\}")
+
+# Tags SortEngine.classify can produce: its base tags, what the EXIF reader
+# and the Metadata Service declare, and the engine tags (Faces Engine ->
+# faces / person, Document / OCR Engine -> keywords, near-dup -> phash)
+BASE_TAGS = ("ext", "type", "year", "month", "day")
+ENGINE_TAGS = ("faces", "person", "keywords", "phash")
+KNOWN_TAGS = frozenset(BASE_TAGS + EXIF_TAGS + SERVICE_TAGS + ENGINE_TAGS)
+
+
+class CompiledTemplate:
+    """Callable: tags -> expanded string. Missing tags stay as {name}."""
+
+    __slots__ = ("template", "parts", "fields")
+
+    def __init__(self, template):
+        self.template = template
+        parts = []
+        pos = 0
+        for m in PLACEHOLDER.finditer(template):
+            if m.start() > pos:
+                parts.append((True, template[pos:m.start()]))
+            parts.append((False, m.group(1)))
+            pos = m.end()
+        if pos < len(template):
+            parts.append((True, template[pos:]))
+
+        self.parts = tuple(parts)
+        self.fields = tuple(dict.fromkeys(name for literal, name in parts if not literal))
+
+    def __call__(self, tags):
+        out = []
+        for literal, text in self.parts:
+            if literal:
+                out.append(text)
+            elif text in tags:
+                out.append(str(tags[text]))
+            else:
+                out.append("{" + text + "}")
+        return "".join(out)
+
+    def __repr__(self):
+        return f"CompiledTemplate({self.template!r})"
+
+
+@lru_cache(maxsize=None)
+def compile_template(template):
+    return CompiledTemplate(template)
+
+
+def validate_template(template, known=KNOWN_TAGS):
+    """Return the placeholders in template that no tag provides."""
+    return [name for name in compile_template(template).fields if name not in known]
+
+
+# --------------------------------------------------------
+# Interned destination directories
+# --------------------------------------------------------
+_DIRS = {}
+_DIRS_LOCK = threading.Lock()
+
+
+def intern_dir(path_str):
+    """Same directory string -> same Path object."""
+    p = _DIRS.get(path_str)
+    if p is None:
+        with _DIRS_LOCK:
+            p = _DIRS.setdefault(path_str, Path(path_str))
+    return p
+
+
+def interned_count():
+    return len(_DIRS)
@@ -0,0 +1,348 @@
+"""
+InteliOmniSorter - Inbox Watcher
+
+Continuous feed of new files for `omni.py watch`:
+- Linux: inotify through libc (ctypes, no extra package), one watch per
+  directory, new sub-directories are watched as they appear
+- elsewhere (or --poll): polling fallback that only re-lists directories
+  whose mtime changed, never the whole tree
+- debounce: a file is ready on close-write / moved-in, or once its size
+  and mtime stayed the same for `settle` seconds
+- partial downloads, hidden files and the sorter's own destination folders
+  are ignored
+- ready paths come out as micro-batches
+
+Loaded automatically via Automount V2.
+"""
+
+REGISTER = {
+    "name": "watcher",
+    "type": "system"
+}
+
+import os
+import sys
+import time
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+from pathlib import Path
+
+try:
+    from v2_core.system.scanner.scanner import SkipSet, has_suffix, norm
+except ImportError:
+    from system.scanner.scanner import SkipSet, has_suffix, norm
+
+SETTLE = 2.0
+INTERVAL = 0.5
+BATCH = 256
+
+# Written by browsers / editors / the Move Engine while a file is incomplete
+PARTIAL_SUFFIXES = (".part", ".partial", ".crdownload", ".download", ".tmp", ".swp", "~")
+
+# inotify(7)
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE |
+              IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+
+EVENT = struct.Struct("iIII")
+READ_SIZE = 64 * 1024
+
+
+def wanted(name):
+    """Same selection as the sort walk, minus incomplete / hidden files."""
+    return has_suffix(name) and not name.startswith(".") and not name.endswith(PARTIAL_SUFFIXES)
+
+
+# --------------------------------------------------------
+# Debounce
+# --------------------------------------------------------
+class Settler:
+    """Files seen but not finished yet: path -> (size, mtime_ns, unchanged since)."""
+
+    def __init__(self, settle=SETTLE):
+        self.settle = settle
+        self.pending = {}
+        self.ready = {}
+
+    def __len__(self):
+        return len(self.pending) + len(self.ready)
+
+    def touch(self, path):
+        """Written to: (re)start the settle clock."""
+        if path not in self.ready:
+            self.pending[path] = None
+
+    def done(self, path):
+        """Closed after writing / moved in complete: ready right away."""
+        self.pending.pop(path, None)
+        self.ready[path] = None
+
+    def discard(self, path):
+        self.pending.pop(path, None)
+        self.ready.pop(path, None)
+
+    def poll(self, now=None):
+        """Paths ready to sort, in the order they were first seen."""
+        now = time.monotonic() if now is None else now
+        for path, seen in list(self.pending.items()):
+            try:
+                st = os.stat(path)
+            except OSError:
+                del self.pending[path]
+                continue
+            state = (st.st_size, st.st_mtime_ns)
+            if seen is None or seen[:2] != state:
+                self.pending[path] = (*state, now)
+            elif now - seen[2] >= self.settle:
+                del self.pending[path]
+                self.ready[path] = None
+
+        out = [p for p in self.ready if os.path.isfile(p)]
+        self.ready.clear()
+        return out
+
+
+# --------------------------------------------------------
+# Backends
+# --------------------------------------------------------
+class Inotify:
+    """Recursive inotify watches; events go straight into the Settler."""
+
+    def __init__(self, settler, skip):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._add = libc.inotify_add_watch
+        self._add.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+        self._rm = libc.inotify_rm_watch
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, f"inotify_init1: {os.strerror(err)}")
+        self.settler = settler
+        self.skip = skip
+        self.dirs = {}      # wd -> directory
+        self.overflowed = False
+
+    def add_tree(self, root, existing=False):
+        """Watch root and every directory below it; existing=True also queues its files."""
+        stack = [os.fspath(root)]
+        while stack:
+            current = stack.pop()
+            if current in self.skip or not self.add(current):
+                continue
+            try:
+                with os.scandir(current) as it:
+                    for entry in it:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                stack.append(entry.path)
+                            elif existing and entry.is_file() and wanted(entry.name):
+                                self.settler.touch(entry.path)
+                        except OSError:
+                            continue
+            except OSError:
+                continue
+
+    def add(self, directory):
+        wd = self._add(self.fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            if err == errno.ENOSPC:
+                print(f"[WATCH] inotify watch limit reached, not watching {directory} "
+                      f"(raise fs.inotify.max_user_watches)")
+            return False
+        self.dirs[wd] = directory
+        return True
+
+    def wait(self, timeout):
+        try:
+            readable, _, _ = select.select([self.fd], [], [], timeout)
+        except InterruptedError:
+            return
+        if not readable:
+            return
+        while True:
+            try:
+                data = os.read(self.fd, READ_SIZE)
+            except BlockingIOError:
+                return
+            if not data:
+                return
+            self.dispatch(data)
+
+    def dispatch(self, data):
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT.unpack_from(data, offset)
+            offset += EVENT.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                self.overflowed = True
+                continue
+            if mask & (IN_IGNORED | IN_DELETE_SELF | IN_MOVE_SELF):
+                if mask & IN_IGNORED:
+                    self.dirs.pop(wd, None)
+                continue
+
+            directory = self.dirs.get(wd)
+            if directory is None or not name:
+                continue
+            path = os.path.join(directory, name)
+
+            if mask & IN_ISDIR:
+                # New / moved-in folder: watch it, its files may already be there
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    self.add_tree(path, existing=True)
+                continue
+            if not wanted(name):
+                continue
+            if mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+                self.settler.done(path)
+            elif mask & (IN_CREATE | IN_MODIFY | IN_ATTRIB):
+                self.settler.touch(path)
+
+    def rescan(self, roots):
+        """After a queue overflow events were lost: one pass to pick them up."""
+        self.overflowed = False
+        for root in roots:
+            self.add_tree(root, existing=True)
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class Poller:
+    """Fallback: stat every watched directory, re-list only the changed ones."""
+
+    def __init__(self, settler, skip, interval=1.0):
+        self.settler = settler
+        self.skip = skip
+        self.interval = interval
+        self.dirs = {}      # directory -> (mtime_ns, {file names})
+        self.overflowed = False
+
+    def add_tree(self, root, existing=False):
+        stack = [os.fspath(root)]
+        while stack:
+            current = stack.pop()
+            if current in self.skip or current in self.dirs:
+                continue
+            subdirs = self.list(current, existing)
+            if subdirs is not None:
+                stack.extend(subdirs)
+
+    def list(self, directory, existing):
+        """Refresh one directory; new files go to the settler. Returns new sub-directories."""
+        try:
+            mtime = os.stat(directory).st_mtime_ns
+            names, subdirs = set(), []
+            with os.scandir(directory) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirs.append(entry.path)
+                        elif entry.is_file():
+                            names.add(entry.name)
+                    except OSError:
+                        continue
+        except OSError:
+            self.dirs.pop(directory, None)
+            return None
+
+        known = self.dirs[directory][1] if directory in self.dirs else None
+        for name in names:
+            if wanted(name) and (existing if known is None else name not in known):
+                self.settler.touch(os.path.join(directory, name))
+        self.dirs[directory] = (mtime, names)
+        return [d for d in subdirs if d not in self.dirs]
+
+    def wait(self, timeout):
+        time.sleep(min(timeout, self.interval))
+        for directory, (mtime, _) in list(self.dirs.items()):
+            try:
+                changed = os.stat(directory).st_mtime_ns != mtime
+            except OSError:
+                self.dirs.pop(directory, None)
+                continue
+            if changed:
+                for sub in self.list(directory, existing=True) or ():
+                    self.add_tree(sub, existing=True)
+
+    def rescan(self, roots):
+        self.overflowed = False
+
+    def close(self):
+        self.dirs.clear()
+
+
+# --------------------------------------------------------
+# Watcher
+# --------------------------------------------------------
+class Watcher:
+    """
+    Micro-batches of finished files arriving under `roots`.
+    skip: directories never watched (e.g. the sort destinations).
+    """
+
+    def __init__(self, roots, skip=(), settle=SETTLE, poll=False, interval=INTERVAL,
+                 batch_size=BATCH, existing=False):
+        self.roots = [norm(r) for r in roots]
+        self.skip = skip if isinstance(skip, SkipSet) else SkipSet(skip)
+        self.settler = Settler(settle)
+        self.interval = interval
+        self.batch_size = batch_size
+
+        self.backend = None
+        if not poll and sys.platform.startswith("linux"):
+            try:
+                self.backend = Inotify(self.settler, self.skip)
+            except (OSError, AttributeError) as e:
+                print(f"[WATCH] inotify unavailable ({e}), polling instead")
+        if self.backend is None:
+            self.backend = Poller(self.settler, self.skip, interval=max(interval, 1.0))
+        self.mode = "inotify" if isinstance(self.backend, Inotify) else "poll"
+
+        for root in self.roots:
+            self.backend.add_tree(root, existing=existing)
+
+    @property
+    def watched(self):
+        return len(self.backend.dirs)
+
+    def batches(self, stop=None):
+        """Yield lists of Path objects until stop() is true (or forever)."""
+        while stop is None or not stop():
+            self.backend.wait(self.interval)
+            if self.backend.overflowed:
+                print("[WATCH] Event queue overflowed, rescanning watched folders")
+                self.backend.rescan(self.roots)
+            ready = self.settler.poll()
+            for i in range(0, len(ready), self.batch_size):
+                yield [Path(p) for p in ready[i:i + self.batch_size]]
+
+    def close(self):
+        self.backend.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()